@@ -0,0 +1,97 @@
+# app/api/compression.py
+import gzip
+import zlib
+
+from app.core.config import BROTLI_QUALITY, GZIP_LEVEL
+
+try:
+    import brotli
+except ImportError:  # Brotli is only offered when the brotli package is installed
+    brotli = None
+
+
+def supported_encodings():
+    """
+    Lists the content codings responses can be compressed with, in order of preference.
+
+    :return: List of content codings
+    """
+    return (["br"] if brotli is not None else []) + ["gzip"]
+
+
+def negotiate_encoding(accept_encoding):
+    """
+    Chooses the content coding of a response from the Accept-Encoding header of its request.
+
+    :param accept_encoding: Value of the Accept-Encoding header, or None
+    :return: 'br', 'gzip' or None to send the response uncompressed
+    """
+    if not accept_encoding:
+        return None
+
+    qualities = {}
+    for coding in accept_encoding.split(","):
+        name, *params = [part.strip() for part in coding.split(";")]
+        quality = 1.0
+        for param in params:
+            param_name, _, value = param.partition("=")
+            if param_name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.lower()] = quality
+
+    candidates = [(qualities.get(encoding, qualities.get("*", 0.0)), -position, encoding)
+                  for position, encoding in enumerate(supported_encodings())]
+    quality, _, encoding = max(candidates)
+    return encoding if quality > 0 else None
+
+
+def compress(body, encoding):
+    """
+    Compresses a response body.
+
+    :param body: Response body bytes
+    :param encoding: Content coding, as returned by negotiate_encoding
+    :return: Compressed body bytes
+    """
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    # A fixed mtime keeps the compressed bytes of a body identical across requests
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def compress_chunks(chunks, encoding):
+    """
+    Compresses a streamed response body chunk by chunk.
+
+    :param chunks: Iterable of response body chunks
+    :param encoding: Content coding, as returned by negotiate_encoding
+    :return: Generator of compressed chunks
+    """
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        compress_chunk, flush = compressor.process, compressor.finish
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        compress_chunk, flush = compressor.compress, compressor.flush
+    for chunk in chunks:
+        compressed = compress_chunk(chunk)
+        if compressed:
+            yield compressed
+    yield flush()
+
+
+def encoded_etag(etag, encoding, streamed=False):
+    """
+    Derives the ETag of the compressed representation of a response, which must differ from the ETag
+    of the uncompressed one. Bodies compressed chunk by chunk are not guaranteed to be byte for byte those
+    compressed at once, and are not with brotli, so they get an ETag of their own.
+
+    :param etag: Quoted ETag of the uncompressed response
+    :param encoding: Content coding
+    :param streamed: Whether the body is compressed by compress_chunks rather than compress
+    :return: Quoted ETag
+    """
+    return f'{etag[:-1]}-{encoding}{"-stream" if streamed else ""}"'
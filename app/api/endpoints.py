@@ -1,16 +1,326 @@
 # app/api/endpoints.py
-from fastapi import APIRouter, HTTPException, Depends
+import json
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+from shapely.errors import GEOSException
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
-from app.models import BuildingLimit, HeightPlateau, SplitBuildingLimit
-from app.tools import split_limits, store_processed_splits
-from app.core.config import get_db
+from app.models import BuildingLimit, HeightPlateau, Job, Project, SplitBuildingLimit
+from app.tools import CoverageError, VersionConflict, claim_versions, features_from_geojson, geometries_from_wkb, \
+    geometry_columns, parse_geojson, query_bbox_neighbours, split_cache_key, split_geometries, split_record, \
+    store_new_projects, store_processed_splits, stored_features, validate_plateaus
+from app.api.compression import compress, compress_chunks, encoded_etag, negotiate_encoding
+from app.api.pagination import FeatureWindow, feature_window, load_window, refine_bbox, window_statement
+from app.api.mvt import MAX_ZOOM, MVT_MEDIA_TYPE, encode_tile, tile_bounds
+from app.api.formats import GEOJSON_MEDIA_TYPE, RECORD_COLUMNS, WKB_MEDIA_TYPE, encode_arrow, encode_wkb_records, \
+    negotiate_format, supported_media_types
+from app.api.responses import FEATURE_COLLECTION_SUFFIX, NO_DATA_BODY, FastJSONResponse, feature_collection_body, \
+    feature_collection_prefix, feature_fragments
+from app.core.cache import etag_matches, project_revision, response_cache
+from app.core.coalescing import update_coalescer
+from app.core.config import COMPRESSION_MIN_SIZE, IMPORT_BATCH_SIZE, JOB_THRESHOLD, SPLIT_CACHE_GRID, \
+    SPLIT_RETRY_AFTER, STREAM_BATCH_SIZE, STREAM_THRESHOLD, TILE_BUFFER, TILE_EXTENT, SessionLocal, get_db
+from app.core.executor import SplitQueueFull, split_executor
+from app.core.jobs import job_runner
+from app.core.metrics import phase, record_counts, render_metrics
+from app.core.split_cache import split_cache
+from app.core.tile_cache import tile_cache
 
 router = APIRouter()
 
 
+def building_limit_feature(limit):
+    """
+    Builds the members of the GeoJSON feature of a stored building limit, other than its type and geometry.
+
+    :param limit: BuildingLimit object
+    :return: GeoJSON feature members
+    """
+    return {
+        "id": limit.id,
+        "version": limit.version,
+        "name": limit.name
+    }
+
+
+def height_plateau_feature(plateau):
+    """
+    Builds the members of the GeoJSON feature of a stored height plateau, other than its type and geometry.
+
+    :param plateau: HeightPlateau object
+    :return: GeoJSON feature members
+    """
+    return {
+        "properties": {
+            "elevation": plateau.elevation
+        },
+        "id": plateau.id,
+        "version": plateau.version,
+        "name": plateau.name
+    }
+
+
+def split_feature(split):
+    """
+    Builds the members of the GeoJSON feature of a stored split building limit, other than its type and geometry.
+
+    :param split: SplitBuildingLimit object
+    :return: GeoJSON feature members
+    """
+    return {
+        "properties": {
+            "elevation": split.elevation,
+            "building_limit_id": split.building_limit_id,
+            "height_plateau_id": split.height_plateau_id
+        },
+        "id": split.id,
+        "version": split.version
+    }
+
+
+def stream_feature_collection(project_id, key, model, to_feature, window=None):
+    """
+    Writes the FeatureCollection of a project resource incrementally, loading rows in batches.
+
+    Uses its own database session, since the response is sent after the request handler has returned.
+
+    :param project_id: Unique project identifier
+    :param key: Key of the FeatureCollection in the response
+    :param model: Mapped model class of the resource
+    :param to_feature: Function building the GeoJSON feature members of a row
+    :param window: Unlimited FeatureWindow of the features to write, or None for all
+    :return: Generator of response body chunks
+    """
+    db = SessionLocal()
+    try:
+        statement = window_statement(select(model), model, project_id, window or FeatureWindow()) \
+            .execution_options(yield_per=STREAM_BATCH_SIZE)
+        separator = feature_collection_prefix(key)
+        for rows in db.scalars(statement).partitions():
+            rows = refine_bbox(rows, window.bbox if window else None)
+            if not rows:
+                continue
+            yield separator + b",".join(feature_fragments(rows, to_feature))
+            separator = b","
+
+        if separator == b",":
+            yield FEATURE_COLLECTION_SUFFIX
+        else:
+            yield NO_DATA_BODY
+    finally:
+        db.close()
+
+
+def feature_collection_response(request, db, project_id, key, model, count, to_feature, stream, window=None):
+    """
+    Serves the FeatureCollection of a project resource.
+
+    Answers If-None-Match with 304 when the client copy is current, serves cached bodies, and otherwise
+    builds the response, streaming it when requested or when the project is larger than the threshold.
+    Clients may ask for length-prefixed WKB records or an Arrow IPC stream instead of GeoJSON through the
+    Accept header, which are built from the stored WKB without decoding it. Bodies above the compression
+    threshold are compressed as negotiated through Accept-Encoding, and cached compressed.
+
+    Windows of features, within a bounding box or one page at a time, are built for every request, not
+    cached, and link to their next page in a Link header and, for GeoJSON, a 'next_cursor' member.
+
+    :param request: Incoming request
+    :param db: Database session
+    :param project_id: Unique project identifier
+    :param key: Key of the FeatureCollection in the response, also used as the cached resource type
+    :param model: Mapped model class of the resource
+    :param count: Name of the Project column counting the features of the resource
+    :param to_feature: Function building the GeoJSON feature members of a row
+    :param stream: Whether to stream the response, or None to decide by the number of features
+    :param window: FeatureWindow of the features to serve, or None for all
+    :return: Response with an ETag header
+    """
+    media_type = negotiate_format(request.headers.get("accept"))
+    if media_type is None:
+        raise HTTPException(status_code=406, detail=f"Supported formats: {', '.join(supported_media_types())}")
+    resource = key if media_type == GEOJSON_MEDIA_TYPE else f"{key}:{media_type}"
+    if window is not None:
+        resource = f"{resource}?{window.key}"
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    headers = {"Vary": "Accept, Accept-Encoding"}
+
+    # Cached bodies and ETags follow the stored project revision, which every worker sees change
+    project = db.get(Project, project_id)
+    revision = project_revision(project)
+    etag = response_cache.etag(project_id, resource, revision)
+    current_etags = (etag, encoded_etag(etag, encoding), encoded_etag(etag, encoding, streamed=True)) \
+        if encoding else (etag,)
+    for current_etag in current_etags:
+        if etag_matches(request.headers.get("if-none-match"), current_etag):
+            return Response(status_code=304, headers={**headers, "ETag": current_etag})
+
+    # Pages are small and viewports rarely repeat, so windows are not cached. Unlimited GeoJSON windows may
+    # still be streamed on request
+    if window is not None and (window.limit is not None or not stream or media_type != GEOJSON_MEDIA_TYPE):
+        body, next_cursor = window_body(db, project_id, key, model, to_feature, media_type, window)
+        if next_cursor is not None:
+            headers["Link"] = f'<{request.url.include_query_params(cursor=next_cursor)}>; rel="next"'
+        if encoding and len(body) >= COMPRESSION_MIN_SIZE:
+            with phase("compress"):
+                body = compress(body, encoding)
+            headers.update({"ETag": encoded_etag(etag, encoding), "Content-Encoding": encoding})
+        return Response(body, media_type=media_type, headers={"ETag": etag, **headers})
+
+    # Compressed bodies are cached next to the uncompressed ones, under the same project revision
+    if encoding:
+        body = response_cache.get(project_id, f"{resource}:{encoding}", revision)
+        if body is not None:
+            return Response(body, media_type=media_type, headers={
+                **headers, "ETag": encoded_etag(etag, encoding), "Content-Encoding": encoding})
+
+    body = response_cache.get(project_id, resource, revision)
+    if body is None and media_type != GEOJSON_MEDIA_TYPE:
+        columns = RECORD_COLUMNS[model.__tablename__]
+        with phase("db_load"):
+            rows = db.execute(select(model.geometry, *[getattr(model, column) for column in columns])
+                              .where(model.project_id == project_id)
+                              .order_by(model.id)).all()
+        encode = encode_wkb_records if media_type == WKB_MEDIA_TYPE else encode_arrow
+        with phase("serialize"):
+            body = encode(rows, model, columns)
+        response_cache.put(project_id, resource, revision, body)
+    elif body is None:
+        if stream is None:
+            stream = project is not None and getattr(project, count) > STREAM_THRESHOLD
+        if stream:
+            chunks = stream_feature_collection(project_id, key, model, to_feature, window)
+            if encoding:
+                chunks = compress_chunks(chunks, encoding)
+                headers.update({"ETag": encoded_etag(etag, encoding, streamed=True), "Content-Encoding": encoding})
+            return StreamingResponse(chunks, media_type=media_type, headers={"ETag": etag, **headers})
+
+        with phase("db_load"):
+            rows = db.query(model).filter(model.project_id == project_id).order_by(model.id).all()
+        with phase("serialize"):
+            body = feature_collection_body(key, rows, to_feature)
+        response_cache.put(project_id, resource, revision, body)
+
+    if encoding and len(body) >= COMPRESSION_MIN_SIZE:
+        with phase("compress"):
+            body = compress(body, encoding)
+        response_cache.put(project_id, f"{resource}:{encoding}", revision, body)
+        headers.update({"ETag": encoded_etag(etag, encoding), "Content-Encoding": encoding})
+    return Response(body, media_type=media_type, headers={"ETag": etag, **headers})
+
+
+def window_body(db, project_id, key, model, to_feature, media_type, window):
+    """
+    Builds the response body of a window of the features of a project resource.
+
+    :param db: Database session
+    :param project_id: Unique project identifier
+    :param key: Key of the FeatureCollection in the response
+    :param model: Mapped model class of the resource
+    :param to_feature: Function building the GeoJSON feature members of a row
+    :param media_type: Negotiated media type of the response
+    :param window: FeatureWindow of the features to serve
+    :return: Tuple of the response body, and the cursor of the next page or None
+    """
+    if media_type == GEOJSON_MEDIA_TYPE:
+        with phase("db_load"):
+            rows, next_cursor = load_window(db.scalars, select(model), model, project_id, window)
+        with phase("serialize"):
+            return feature_collection_body(key, rows, to_feature, next_cursor), next_cursor
+
+    columns = RECORD_COLUMNS[model.__tablename__]
+    with phase("db_load"):
+        statement = select(model.geometry, *[getattr(model, column) for column in columns])
+        rows, next_cursor = load_window(db.execute, statement, model, project_id, window)
+    encode = encode_wkb_records if media_type == WKB_MEDIA_TYPE else encode_arrow
+    with phase("serialize"):
+        return encode(rows, model, columns), next_cursor
+
+
+def cached_split_features(building_limits, height_plateaus):
+    """
+    Splits building limits according to height plateaus, reusing the splits of earlier computations on the
+    same geometries. Validation and intersection only run on a cache miss, in the split executor.
+
+    :param building_limits: Features of the building limits
+    :param height_plateaus: Features of the height plateaus
+    :return: Splits, as returned by split_geometries
+    """
+    with phase("split_cache"):
+        try:
+            key, limit_order, plateau_order = split_cache_key(building_limits, height_plateaus, SPLIT_CACHE_GRID)
+        except GEOSException:
+            # Invalid geometries, e.g. self-intersecting polygons, cannot always be snapped to the grid. They are
+            # left to the validity check of split_geometries, which rejects them
+            key = None
+        splits = split_cache.get(key, limit_order, plateau_order) if key is not None else None
+    if splits is None:
+        # Covers the time spent waiting for and running in a split worker
+        with phase("split_compute"):
+            splits = split_executor.run(split_geometries, building_limits, height_plateaus)
+        if key is not None:
+            split_cache.put(key, limit_order, plateau_order, splits)
+    return splits
+
+
+def runs_as_job(job, *geojsons):
+    """
+    Decides whether a create or update runs as a background job.
+
+    :param job: Value of the 'job' query parameter, None to decide by the number of submitted features
+    :param geojsons: Submitted GeoJSON data, or None for absent ones
+    :return: True if the operation should run as a job
+    """
+    if job is not None:
+        return job
+    features = sum(len(geojson.get('features') or []) for geojson in geojsons if isinstance(geojson, dict))
+    return bool(JOB_THRESHOLD) and features > JOB_THRESHOLD
+
+
+def job_accepted(job_id):
+    """
+    Builds the response to an operation that was submitted as a background job.
+
+    :param job_id: ID of the job
+    :return: 202 response pointing at the status of the job
+    """
+    return FastJSONResponse(status_code=202, content={"job_id": job_id, "status": "queued"},
+                            headers={"Location": f"/jobs/{job_id}"})
+
+
+def job_outcome(operation):
+    """
+    Runs an operation on behalf of a job, and captures its outcome as a response would carry it.
+
+    :param operation: Function running the operation, returning its result or response, or raising HTTPException
+    :return: Tuple of the HTTP status code and the response body
+    """
+    try:
+        result = operation()
+    except HTTPException as e:
+        return e.status_code, {"detail": e.detail}
+    if isinstance(result, Response):
+        return result.status_code, json.loads(result.body)
+    return 200, result
+
+
+@job_runner.handler("create")
+def run_create_job(db, project_id, payload):
+    return job_outcome(lambda: create_project(db, project_id, payload['building_limits'],
+                                              payload['height_plateaus']))
+
+
+@job_runner.handler("update")
+def run_update_job(db, project_id, payload):
+    return job_outcome(lambda: update_project(db, project_id, payload['building_limits'],
+                                              payload['height_plateaus'], payload['incremental']))
+
+
 @router.post("/create-project")
 def create_building_limit_splits(project_id: int, building_limits: dict, height_plateaus: dict,
-                                 db: Session = Depends(get_db)):
+                                 job: Optional[bool] = None, db: Session = Depends(get_db)):
     """
     Creates a new project with building limits and height plateaus,
      splits the limits based on the plateaus and stores everything.
@@ -18,136 +328,376 @@ def create_building_limit_splits(project_id: int, building_limits: dict, height_
     :param project_id: Unique project identifier
     :param building_limits: GeoJSON data for building limits
     :param height_plateaus: GeoJSON data for height plateaus
+    :param job: Run as a background job, None to run submissions of more than JOB_THRESHOLD features as jobs
     :param db: Database session
-    :return: Success message
+    :return: Success message, or 202 with the ID of the job
+    """
+    if runs_as_job(job, building_limits, height_plateaus):
+        return job_accepted(job_runner.enqueue(db, "create", project_id, {"building_limits": building_limits,
+                                                                          "height_plateaus": height_plateaus}))
+    return create_project(db, project_id, building_limits, height_plateaus)
+
+
+def create_project(db, project_id, building_limits, height_plateaus):
+    """
+    Creates a new project, see create_building_limit_splits, in one transaction.
+
+    :param db: Database session
+    :param project_id: Unique project identifier
+    :param building_limits: GeoJSON data for building limits
+    :param height_plateaus: GeoJSON data for height plateaus
+    :return: Success message, or the 422 response of a coverage error; raises HTTPException on other errors
     """
     try:
         # Check if project exists
-        existing_limits = db.query(BuildingLimit).filter(BuildingLimit.project_id == project_id).all()
-        existing_plateaus = db.query(HeightPlateau).filter(HeightPlateau.project_id == project_id).all()
-
-        if existing_limits or existing_plateaus:
+        if db.get(Project, project_id) is not None:
             raise HTTPException(status_code=409,
                                 detail="Project with this ID already has data. Consider updating instead of creating new data.")
 
-        # Perform the split operation and get the original dataframes
-        split_gdf, building_limits_gdf, height_plateaus_gdf = split_limits(building_limits, height_plateaus)
-
-        # Persist the original building limits and height plateaus
-        for feature in building_limits['features']:
-            new_limit = BuildingLimit(project_id=project_id, geometry=feature['geometry'])
-            db.add(new_limit)
-
-        for feature in height_plateaus['features']:
-            new_plateau = HeightPlateau(project_id=project_id, geometry=feature['geometry'],
-                                        elevation=feature['properties']['elevation'])
-            db.add(new_plateau)
-        db.commit()  # Commit to get the generated IDs
+        # Perform the split operation, whose geometry validation is left to split_geometries on a cache miss
+        limit_features = features_from_geojson(building_limits, check_validity=False)
+        plateau_features = features_from_geojson(height_plateaus, check_validity=False)
+        splits = cached_split_features(limit_features, plateau_features)
+        record_counts(features=len(limit_features) + len(plateau_features), splits=len(splits))
 
-        # Retrieve the IDs after committing
-        stored_limits = db.query(BuildingLimit).filter_by(project_id=project_id).all()
-        stored_plateaus = db.query(HeightPlateau).filter_by(project_id=project_id).all()
-
-        store_processed_splits(db, split_gdf, project_id, stored_limits, stored_plateaus)
+        # Persist the original building limits and height plateaus, along with their splits, in one transaction
+        plateau_elevations = [feature['properties']['elevation'] for feature in height_plateaus['features']]
+        store_new_projects(db, [(project_id, splits, limit_features, plateau_features, plateau_elevations)])
+        with phase("db_commit"):
+            db.commit()
+        response_cache.invalidate(project_id)
+        tile_cache.invalidate(project_id)
 
         return {"message": "Successfully split and stored the results"}
+    except SplitQueueFull as e:
+        db.rollback()
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(SPLIT_RETRY_AFTER)})
+    except CoverageError as e:
+        db.rollback()
+        return FastJSONResponse(status_code=422, content={"detail": str(e), "gaps": e.gaps})
     except ValueError as e:
         db.rollback()
         raise HTTPException(status_code=422, detail=str(e))
+    except HTTPException:
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
 
 
+def import_project_batch(db, batch, imported_ids):
+    """
+    Splits and stores a batch of bulk import records, computing the splits in parallel and storing all
+    successful records of the batch in one transaction.
+
+    :param db: Database session
+    :param batch: List of (line number, record JSON text) tuples
+    :param imported_ids: Set of project IDs imported so far, updated in place
+    :return: List of per-record result dictionaries
+    """
+    try:
+        with phase("split_compute"):
+            records = split_executor.map(split_record, [line for _, line in batch])
+    except SplitQueueFull as e:
+        return [{"line": line_number, "project_id": None, "status": "failed", "detail": str(e)}
+                for line_number, _ in batch]
+
+    project_ids = [project_id for project_id, project, _ in records if project is not None]
+    existing_ids = {project_id for project_id, in db.query(Project.id).filter(Project.id.in_(project_ids))}
+
+    results, projects = [], []
+    for (line_number, _), (project_id, project, error) in zip(batch, records):
+        if project is not None and (project_id in existing_ids or project_id in imported_ids):
+            project, error = None, "Project with this ID already has data."
+        if project is None:
+            results.append({"line": line_number, "project_id": project_id, "status": "failed", "detail": error})
+        else:
+            imported_ids.add(project_id)
+            projects.append(project)
+            results.append({"line": line_number, "project_id": project_id, "status": "created"})
+
+    if projects:
+        try:
+            store_new_projects(db, projects)
+            with phase("db_commit"):
+                db.commit()
+        except Exception as e:
+            db.rollback()
+            for result in results:
+                if result["status"] == "created":
+                    result.update(status="failed", detail=str(e))
+        else:
+            for project in projects:
+                response_cache.invalidate(project[0])
+                tile_cache.invalidate(project[0])
+            record_counts(features=sum(len(project[2]) + len(project[3]) for project in projects),
+                          splits=sum(len(project[1]) for project in projects))
+
+    return results
+
+
+@router.post("/import-projects")
+async def import_projects(request: Request, db: Session = Depends(get_db)):
+    """
+    Creates many projects from a newline-delimited JSON stream of {project_id, building_limits, height_plateaus}
+    records. Records are read incrementally and processed in batches, and each record succeeds or fails
+    on its own.
+
+    :param request: Incoming request, with one JSON record per line in its body
+    :param db: Database session
+    :return: Number of created and failed projects, and the result of every record
+    """
+    results, batch, imported_ids = [], [], set()
+    line_number, pending = 0, b""
+
+    async for chunk in request.stream():
+        *lines, pending = (pending + chunk).split(b"\n")
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                batch.append((line_number, line))
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                results += await run_in_threadpool(import_project_batch, db, batch, imported_ids)
+                batch = []
+
+    if pending.strip():
+        batch.append((line_number + 1, pending))
+    if batch:
+        results += await run_in_threadpool(import_project_batch, db, batch, imported_ids)
+
+    created = sum(result["status"] == "created" for result in results)
+    return {"created": created, "failed": len(results) - created, "results": results}
+
+
 @router.put("/update-project")
 def update_building_limit_splits(project_id: int, building_limits: dict = None, height_plateaus: dict = None,
+                                 incremental: bool = True, job: Optional[bool] = None,
                                  db: Session = Depends(get_db)):
     """
     Updates existing building limits and height plateaus for a project, then recomputes the splits.
 
+    In incremental mode, only the building limits whose bounding box touches the old or new geometry of a
+    changed feature are split again, against the height plateaus around them. All other splits are kept.
+
+    When coalescing is enabled, updates of the same project that arrive within the coalescing window and edit
+    different features are applied as one update, see run_project_updates.
+
     :param project_id: Unique project identifier
     :param building_limits: GeoJSON data for building limits (optional)
     :param height_plateaus: GeoJSON data for height plateaus (optional)
+    :param incremental: Recompute only the splits around the changed features instead of the whole project
+    :param job: Run as a background job, None to run submissions of more than JOB_THRESHOLD features as jobs
     :param db: Database session
-    :return: Success message
+    :return: Success message with the number of kept, replaced and added splits, and the new versions of the
+     submitted features, or 202 with the ID of the job
     """
     if not building_limits and not height_plateaus:
         return {"message": "No new data provided"}
-    try:
-        # Check if the project exists
-        existing_limits = db.query(BuildingLimit).filter(BuildingLimit.project_id == project_id).first()
-        existing_plateaus = db.query(HeightPlateau).filter(HeightPlateau.project_id == project_id).first()
+    if runs_as_job(job, building_limits, height_plateaus):
+        return job_accepted(job_runner.enqueue(db, "update", project_id, {
+            "building_limits": building_limits, "height_plateaus": height_plateaus, "incremental": incremental}))
+    if not update_coalescer.window:
+        return update_project(db, project_id, building_limits, height_plateaus, incremental)
 
-        if not existing_limits and not existing_plateaus:
-            raise HTTPException(status_code=404, detail="Project with this ID does not exist.")
+    keys = {(name, feature.get('id')) for name, geojson in (("building_limits", building_limits),
+                                                           ("height_plateaus", height_plateaus))
+            if geojson for feature in geojson.get('features', [])}
+    return update_coalescer.submit(project_id, (building_limits, height_plateaus, incremental), keys,
+                                   lambda updates: run_project_updates(db, project_id, updates))
 
-        # Delete old splits
-        db.query(SplitBuildingLimit).filter(SplitBuildingLimit.project_id == project_id).delete()
-        db.commit()
 
-        # Prepare updates
+def merge_feature_collections(geojsons):
+    """
+    Merges the features of GeoJSON FeatureCollections.
+
+    :param geojsons: List of GeoJSON FeatureCollections, or None for absent ones
+    :return: GeoJSON FeatureCollection, or None if all are absent
+    """
+    geojsons = [geojson for geojson in geojsons if geojson]
+    if not geojsons:
+        return None
+    return {"type": "FeatureCollection",
+            "features": [feature for geojson in geojsons for feature in geojson['features']]}
+
+
+def run_project_updates(db, project_id, updates):
+    """
+    Applies a batch of coalesced updates of a project. The updates are merged into one, so the splits are
+    computed once for the merged state, and every caller gets the merged split counts and the new versions
+    of its own features. If the merged update fails, e.g. because one of them conflicts or is invalid, the
+    updates are applied one by one, so each caller gets its own outcome.
+
+    :param db: Database session
+    :param project_id: Unique project identifier
+    :param updates: List of (building_limits, height_plateaus, incremental) tuples of updates that edit
+     different features
+    :return: List of (result, exception) tuples, positionally matching updates
+    """
+    if len(updates) > 1:
+        try:
+            result = update_project(db, project_id,
+                                    merge_feature_collections([update[0] for update in updates]),
+                                    merge_feature_collections([update[1] for update in updates]),
+                                    all(update[2] for update in updates))
+        except HTTPException:
+            result = None
+        if isinstance(result, dict):
+            outcomes = []
+            for building_limits, height_plateaus, _ in updates:
+                versions = {}
+                for name, geojson in (("building_limits", building_limits), ("height_plateaus", height_plateaus)):
+                    submitted = {feature.get('id') for feature in geojson['features']} if geojson else set()
+                    versions[name] = {feature_id: version for feature_id, version in result["versions"][name].items()
+                                      if feature_id in submitted}
+                outcomes.append(({**result, "versions": versions, "coalesced": len(updates)}, None))
+            return outcomes
+
+    outcomes = []
+    for building_limits, height_plateaus, incremental in updates:
+        try:
+            outcomes.append((update_project(db, project_id, building_limits, height_plateaus, incremental), None))
+        except HTTPException as e:
+            outcomes.append((None, e))
+    return outcomes
+
+
+def update_project(db, project_id, building_limits, height_plateaus, incremental):
+    """
+    Applies an update of a project, see update_building_limit_splits, in one transaction.
+
+    :param db: Database session
+    :param project_id: Unique project identifier
+    :param building_limits: GeoJSON data for building limits, or None
+    :param height_plateaus: GeoJSON data for height plateaus, or None
+    :param incremental: Recompute only the splits around the changed features instead of the whole project
+    :return: Success message with the number of kept, replaced and added splits, and the new versions of the
+     submitted features, or the 422 response of a coverage error; raises HTTPException on other errors
+    """
+    try:
+        # Lock the project row, so concurrent updates of the project, even of disjoint features, rewrite the
+        # splits of overlapping neighbourhoods one after the other rather than from each other's uncommitted
+        # features. SQLite, which has no row locks, serializes writers anyway
+        project = db.get(Project, project_id, with_for_update=True)
+        if project is None:
+            raise HTTPException(status_code=404, detail="Project with this ID does not exist.")
+
+        # Claim every submitted feature still at the submitted version before any geometry is parsed or
+        # split, so conflicting updates are rejected without wasted work
+        limits_by_id, plateaus_by_id = {}, {}
         if building_limits:
-            limit_ids = [feature['id'] for feature in building_limits['features']]
-            limit_versions = {feature['id']: feature['version'] for feature in building_limits['features']}
-            limits_to_update = db.query(BuildingLimit).filter(
+            limits_by_id = {limit.id: limit for limit in db.query(BuildingLimit).filter(
                 BuildingLimit.project_id == project_id,
-                BuildingLimit.id.in_(limit_ids)
-            ).all()
-
-            # Check for version conflicts and apply updates
-            for limit in limits_to_update:
-                if limit_versions[limit.id] != limit.version:
-                    raise HTTPException(status_code=409,
-                                        detail=f"Conflict detected: The building limit with ID {limit.id} has been modified by another user.")
-                for feature in building_limits['features']:
-                    if feature['id'] == limit.id:
-                        limit.geometry = feature['geometry']
-                        limit.version += 1
-
+                BuildingLimit.id.in_([feature['id'] for feature in building_limits['features']])
+            )}
+            claim_versions(db, BuildingLimit, "building limit",
+                           [(feature['id'], feature['version']) for feature in building_limits['features']
+                            if feature['id'] in limits_by_id])
         if height_plateaus:
-            plateau_ids = [feature['id'] for feature in height_plateaus['features']]
-            plateau_versions = {feature['id']: feature['version'] for feature in height_plateaus['features']}
-            plateaus_to_update = db.query(HeightPlateau).filter(
+            plateaus_by_id = {plateau.id: plateau for plateau in db.query(HeightPlateau).filter(
                 HeightPlateau.project_id == project_id,
-                HeightPlateau.id.in_(plateau_ids)
-            ).all()
-
-            # Check for version conflicts and apply updates
-            for plateau in plateaus_to_update:
-                if plateau_versions[plateau.id] != plateau.version:
-                    raise HTTPException(status_code=409,
-                                        detail=f"Conflict detected: The height plateau with ID {plateau.id} has been modified by another user.")
-                for feature in height_plateaus['features']:
-                    if feature['id'] == plateau.id:
-                        plateau.geometry = feature['geometry']
-                        plateau.elevation = feature['properties']['elevation']
-                        plateau.version += 1
-
-        db.commit()
-
-        # Recompute the split building limits
-        updated_limits = db.query(BuildingLimit).filter_by(project_id=project_id).all()
-        updated_plateaus = db.query(HeightPlateau).filter_by(project_id=project_id).all()
-
-        limits_geojson = {
-            "type": "FeatureCollection",
-            "features": [{"type": "Feature", "geometry": limit.geometry, "properties": {}} for limit in updated_limits]
-        }
-        plateaus_geojson = {
-            "type": "FeatureCollection",
-            "features": [
-                {"type": "Feature", "geometry": plateau.geometry, "properties": {"elevation": plateau.elevation}} for
-                plateau in updated_plateaus]
-        }
-
-        split_gdf, building_limits_gdf, height_plateaus_gdf = split_limits(limits_geojson, plateaus_geojson)
-
-        store_processed_splits(db, split_gdf, project_id, updated_limits, updated_plateaus)
+                HeightPlateau.id.in_([feature['id'] for feature in height_plateaus['features']])
+            )}
+            claim_versions(db, HeightPlateau, "height plateau",
+                           [(feature['id'], feature['version']) for feature in height_plateaus['features']
+                            if feature['id'] in plateaus_by_id])
+
+        # Apply the updates, keeping the old and new geometry of changed features
+        changed_geometries = []
+        if building_limits:
+            submitted = parse_geojson(building_limits)
+            rows = []
+            for feature, geometry, columns in zip(building_limits['features'], submitted,
+                                                  geometry_columns(submitted)):
+                limit = limits_by_id.get(feature['id'])
+                if limit is None:
+                    continue
+                rows.append({"id": limit.id, **columns})
+                if columns['geometry'] != limit.geometry:
+                    changed_geometries += [geometries_from_wkb([limit])[0], geometry]
+            if rows:
+                db.execute(update(BuildingLimit), rows)
 
-        return {"message": "Update and recompute successful"}
+        if height_plateaus:
+            submitted = parse_geojson(height_plateaus)
+            rows = []
+            for feature, geometry, columns in zip(height_plateaus['features'], submitted,
+                                                  geometry_columns(submitted)):
+                plateau = plateaus_by_id.get(feature['id'])
+                if plateau is None:
+                    continue
+                elevation = feature['properties']['elevation']
+                rows.append({"id": plateau.id, "elevation": elevation, **columns})
+                if columns['geometry'] != plateau.geometry or elevation != plateau.elevation:
+                    changed_geometries += [geometries_from_wkb([plateau])[0], geometry]
+            if rows:
+                db.execute(update(HeightPlateau), rows)
+
+        # Find the neighbourhood of the changes whose splits need to be recomputed
+        with phase("db_load"):
+            if incremental:
+                limits = query_bbox_neighbours(db, BuildingLimit, project_id, changed_geometries)
+                plateaus = query_bbox_neighbours(db, HeightPlateau, project_id,
+                                                 list(geometries_from_wkb(limits)) + changed_geometries)
+            else:
+                limits = db.query(BuildingLimit).filter_by(project_id=project_id).order_by(
+                    BuildingLimit.id).populate_existing().all()
+                plateaus = db.query(HeightPlateau).filter_by(project_id=project_id).order_by(
+                    HeightPlateau.id).populate_existing().all()
+
+        splits = db.query(SplitBuildingLimit).filter(SplitBuildingLimit.project_id == project_id)
+        replaced = added = 0
+        if limits:
+            # Recompute the split building limits
+            new_splits = cached_split_features(stored_features(limits), stored_features(plateaus))
+
+            if incremental:
+                splits = splits.filter(SplitBuildingLimit.building_limit_id.in_([limit.id for limit in limits]))
+            replaced = splits.delete(synchronize_session=False)
+
+            store_processed_splits(db, new_splits, project_id,
+                                   [limit.id for limit in limits],
+                                   [plateau.id for plateau in plateaus],
+                                   [plateau.elevation for plateau in plateaus])
+            added = len(new_splits)
+        elif plateaus:
+            # Changed plateaus away from every building limit still must not overlap their neighbours
+            validate_plateaus(stored_features(plateaus))
+
+        kept = project.split_count - replaced
+        db.execute(update(Project).where(Project.id == project_id).values(
+            version=Project.version + 1, split_count=Project.split_count - replaced + added))
+        with phase("db_commit"):
+            db.commit()
+        record_counts(features=sum(len(geojson['features']) for geojson in (building_limits, height_plateaus)
+                                   if geojson),
+                      splits=added)
+        response_cache.invalidate(project_id)
+        tile_cache.invalidate(project_id)
+
+        versions = {
+            "building_limits": {feature['id']: feature['version'] + 1 for feature in building_limits['features']
+                                if feature['id'] in limits_by_id} if building_limits else {},
+            "height_plateaus": {feature['id']: feature['version'] + 1 for feature in height_plateaus['features']
+                                if feature['id'] in plateaus_by_id} if height_plateaus else {},
+        }
+        return {"message": "Update and recompute successful",
+                "splits": {"kept": kept, "replaced": replaced, "added": added}, "versions": versions}
+    except VersionConflict as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
+    except SplitQueueFull as e:
+        db.rollback()
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(SPLIT_RETRY_AFTER)})
+    except CoverageError as e:
+        db.rollback()
+        return FastJSONResponse(status_code=422, content={"detail": str(e), "gaps": e.gaps})
     except ValueError as e:
         db.rollback()
         raise HTTPException(status_code=422, detail=str(e))
+    except HTTPException:
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
@@ -163,107 +713,204 @@ def delete_project(project_id: int, db: Session = Depends(get_db)):
     :return: Success message
     """
     try:
-        existing_limits = db.query(BuildingLimit).filter(BuildingLimit.project_id == project_id).all()
-        existing_plateaus = db.query(HeightPlateau).filter(HeightPlateau.project_id == project_id).all()
-
-        if not existing_limits and not existing_plateaus:
+        # Locked first, like updates do, so a delete and an update of the project cannot deadlock
+        project = db.get(Project, project_id, with_for_update=True)
+        if project is None:
             raise HTTPException(status_code=404, detail="Project with this ID does not exist.")
 
         db.query(SplitBuildingLimit).filter(SplitBuildingLimit.project_id == project_id).delete()
         db.query(BuildingLimit).filter(BuildingLimit.project_id == project_id).delete()
         db.query(HeightPlateau).filter(HeightPlateau.project_id == project_id).delete()
+        db.delete(project)
 
-        db.commit()
+        with phase("db_commit"):
+            db.commit()
+        response_cache.invalidate(project_id)
+        tile_cache.invalidate(project_id)
 
         return {"message": f"Project ID: {project_id} and all associated data have been successfully deleted."}
+    except HTTPException:
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/building-limits/{project_id}")
-def get_building_limits(project_id: int, db: Session = Depends(get_db)):
+def get_building_limits(project_id: int, request: Request, stream: Optional[bool] = None,
+                        bbox: Optional[str] = None, limit: Optional[int] = None, cursor: Optional[str] = None,
+                        db: Session = Depends(get_db)):
     """
     Retrieves building limits for a specific project.
 
     :param project_id: Unique project identifier
+    :param request: Incoming request, checked for If-None-Match
+    :param stream: Stream the response, by default only for projects above the stream threshold
+    :param bbox: Only serve the features intersecting this 'minx,miny,maxx,maxy' bounding box
+    :param limit: Serve at most this many features, linking to the next page
+    :param cursor: Cursor of the page to serve, as linked from the previous page
     :param db: Database session
     :return: GeoJSON of building limits or a message if no data is found
     """
-    limits = db.query(BuildingLimit).filter(BuildingLimit.project_id == project_id).all()
-    if limits:
-        return {"building_limits": {
-                "type": "FeatureCollection",
-                "features": [
-                    {
-                        "type": "Feature",
-                        "geometry": limit.geometry,
-                        "id": limit.id,
-                        "version": limit.version,
-                        "name": limit.name
-                    }
-                    for limit in limits
-                ]
-            }}
-    return {"message": "No data found"}
+    try:
+        window = feature_window(bbox, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return feature_collection_response(request, db, project_id, "building_limits", BuildingLimit,
+                                       "building_limit_count", building_limit_feature, stream, window)
 
 
 @router.get("/height-plateaus/{project_id}")
-def get_height_plateaus(project_id: int, db: Session = Depends(get_db)):
+def get_height_plateaus(project_id: int, request: Request, stream: Optional[bool] = None,
+                        bbox: Optional[str] = None, limit: Optional[int] = None, cursor: Optional[str] = None,
+                        db: Session = Depends(get_db)):
     """
     Retrieves height plateaus for a specific project.
 
     :param project_id: Unique project identifier
+    :param request: Incoming request, checked for If-None-Match
+    :param stream: Stream the response, by default only for projects above the stream threshold
+    :param bbox: Only serve the features intersecting this 'minx,miny,maxx,maxy' bounding box
+    :param limit: Serve at most this many features, linking to the next page
+    :param cursor: Cursor of the page to serve, as linked from the previous page
     :param db: Database session
     :return: GeoJSON of height plateaus or a message if no data is found
     """
-    plateaus = db.query(HeightPlateau).filter(HeightPlateau.project_id == project_id).all()
-    if plateaus:
-        return {"height_plateaus": {
-            "type": "FeatureCollection",
-            "features": [
-                {
-                    "type": "Feature",
-                    "geometry": plateau.geometry,
-                    "properties": {
-                        "elevation": plateau.elevation
-                    },
-                    "id": plateau.id,
-                    "version": plateau.version,
-                    "name": plateau.name
-                }
-                for plateau in plateaus
-            ]
-        }}
-    return {"message": "No data found"}
+    try:
+        window = feature_window(bbox, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return feature_collection_response(request, db, project_id, "height_plateaus", HeightPlateau,
+                                       "height_plateau_count", height_plateau_feature, stream, window)
 
 
 @router.get("/split-building-limits/{project_id}")
-def get_split_building_limits(project_id: int, db: Session = Depends(get_db)):
+def get_split_building_limits(project_id: int, request: Request, stream: Optional[bool] = None,
+                              bbox: Optional[str] = None, limit: Optional[int] = None, cursor: Optional[str] = None,
+                              db: Session = Depends(get_db)):
     """
     Retrieves split building limits for a specific project.
 
     :param project_id: Unique project identifier
+    :param request: Incoming request, checked for If-None-Match
+    :param stream: Stream the response, by default only for projects above the stream threshold
+    :param bbox: Only serve the features intersecting this 'minx,miny,maxx,maxy' bounding box
+    :param limit: Serve at most this many features, linking to the next page
+    :param cursor: Cursor of the page to serve, as linked from the previous page
     :param db: Database session
     :return: GeoJSON of split building limits or a message if no data is found
     """
-    splits = db.query(SplitBuildingLimit).filter(SplitBuildingLimit.project_id == project_id).all()
-    if splits:
-        return {"building_limits_splits": {
-            "type": "FeatureCollection",
-            "features": [
-                {
-                    "type": "Feature",
-                    "geometry": split.geometry,
-                    "properties": {
-                        "elevation": split.elevation,
-                        "building_limit_id": split.building_limit_id,
-                        "height_plateau_id": split.height_plateau_id
-                    },
-                    "id": split.id,
-                    "version": split.version
-                }
-                for split in splits
-            ]
-        }}
-    return {"message": "No data found"}
+    try:
+        window = feature_window(bbox, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return feature_collection_response(request, db, project_id, "building_limits_splits", SplitBuildingLimit,
+                                       "split_count", split_feature, stream, window)
+
+
+@router.get("/tiles/{project_id}/{z}/{x}/{y}.mvt")
+def get_tile(project_id: int, z: int, x: int, y: int, request: Request, db: Session = Depends(get_db)):
+    """
+    Retrieves a Mapbox vector tile of a project, in the Web Mercator tiling scheme, with a layer each of its
+    building limits, height plateaus and split building limits. Features carry their ID, version and, where
+    they have them, elevation and source building limit and height plateau IDs as attributes.
+
+    Geometries are clipped to the tile and a buffer around it and snapped to the tile grid. Tiles are cached
+    by project revision, and answered with 204 when no feature is drawn in them.
+
+    :param project_id: Unique project identifier
+    :param z: Zoom level
+    :param x: Tile column
+    :param y: Tile row, counted from the north
+    :param request: Incoming request, checked for If-None-Match
+    :param db: Database session
+    :return: Vector tile response
+    """
+    if not (0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=422, detail="Tile coordinates out of range.")
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    headers = {"Vary": "Accept-Encoding"}
+
+    # The ETag follows the stored project revision, which every worker sees change, like the tile cache key
+    project = db.get(Project, project_id)
+    if project is None:
+        raise HTTPException(status_code=404, detail="Project with this ID does not exist.")
+    revision = project_revision(project)
+    etag = response_cache.etag(project_id, f"tiles/{z}/{x}/{y}", revision)
+    for current_etag in (etag, encoded_etag(etag, encoding)) if encoding else (etag,):
+        if etag_matches(request.headers.get("if-none-match"), current_etag):
+            return Response(status_code=304, headers={**headers, "ETag": current_etag})
+
+    body = tile_cache.get(project_id, revision, z, x, y)
+    if body is None:
+        window = FeatureWindow(bbox=tile_bounds(z, x, y, TILE_BUFFER / TILE_EXTENT))
+        layers = []
+        with phase("db_load"):
+            for model in (BuildingLimit, HeightPlateau, SplitBuildingLimit):
+                columns = RECORD_COLUMNS[model.__tablename__]
+                statement = select(model.geometry, *[getattr(model, column) for column in columns])
+                rows = db.execute(window_statement(statement, model, project_id, window)).all()
+                layers.append((model.__tablename__, rows, columns))
+        with phase("serialize"):
+            body = encode_tile(layers, z, x, y, TILE_EXTENT, TILE_BUFFER)
+        tile_cache.put(project_id, revision, z, x, y, body)
+
+    if not body:
+        return Response(status_code=204, headers={**headers, "ETag": etag})
+    if encoding and len(body) >= COMPRESSION_MIN_SIZE:
+        with phase("compress"):
+            body = compress(body, encoding)
+        headers.update({"ETag": encoded_etag(etag, encoding), "Content-Encoding": encoding})
+    return Response(body, media_type=MVT_MEDIA_TYPE, headers={"ETag": etag, **headers})
+
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: int, db: Session = Depends(get_db)):
+    """
+    Reports the status of a background job, the phase it is in and the durations of its phases, and once
+    it finished, the HTTP status and response body of its operation.
+
+    :param job_id: ID of the job
+    :param db: Database session
+    :return: Job status
+    """
+    job = db.get(Job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job with this ID does not exist.")
+
+    progress = job_runner.progress(job_id) if job.status == "running" else None
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "project_id": job.project_id,
+        "status": job.status,
+        "phase": progress["phase"] if progress else None,
+        "phases": progress["phases"] if progress else json.loads(job.phases or "{}"),
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "duration": job.finished_at - job.started_at if job.finished_at is not None else None,
+        "status_code": job.status_code,
+        "result": json.loads(job.result) if job.result is not None else None,
+    }
+
+
+@router.get("/split-cache/stats")
+def get_split_cache_stats():
+    """
+    Retrieves the hit and miss counters of the split result cache.
+
+    :return: Counters and number of cached entries
+    """
+    return split_cache.stats()
+
+
+@router.get("/metrics")
+def get_metrics():
+    """
+    Retrieves the request, phase, feature and split count histograms in the Prometheus text format.
+
+    :return: Plain text response
+    """
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,160 @@
+# app/api/formats.py
+import struct
+
+import numpy as np
+from sqlalchemy import Float
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:  # Arrow responses are only offered when pyarrow is installed
+    pyarrow = None
+
+GEOJSON_MEDIA_TYPE = "application/json"
+WKB_MEDIA_TYPE = "application/vnd.building-api.wkb"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+WKB_MAGIC = b"WKBR"
+
+# Numeric columns sent along with the geometries in the binary formats
+RECORD_COLUMNS = {
+    "building_limits": ("id", "version"),
+    "height_plateaus": ("id", "version", "elevation"),
+    "split_building_limits": ("id", "version", "elevation", "building_limit_id", "height_plateau_id"),
+}
+
+
+def negotiate_format(accept):
+    """
+    Chooses the response format of a GET request from its Accept header.
+
+    :param accept: Value of the Accept header, or None
+    :return: GEOJSON_MEDIA_TYPE, WKB_MEDIA_TYPE or ARROW_MEDIA_TYPE, or None if none of the accepted types is supported
+    """
+    if not accept:
+        return GEOJSON_MEDIA_TYPE
+
+    ranges = []
+    for position, media_range in enumerate(accept.split(",")):
+        media_type, *params = [part.strip() for part in media_range.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            ranges.append((-quality, position, media_type.lower()))
+
+    for _, _, media_type in sorted(ranges):
+        if media_type in (GEOJSON_MEDIA_TYPE, "application/geo+json", "application/*", "*/*"):
+            return GEOJSON_MEDIA_TYPE
+        if media_type == WKB_MEDIA_TYPE:
+            return WKB_MEDIA_TYPE
+        if media_type == ARROW_MEDIA_TYPE and pyarrow is not None:
+            return ARROW_MEDIA_TYPE
+    return None
+
+
+def supported_media_types():
+    """
+    Lists the media types the GET endpoints can respond with.
+
+    :return: List of media types
+    """
+    return [GEOJSON_MEDIA_TYPE, WKB_MEDIA_TYPE] + ([ARROW_MEDIA_TYPE] if pyarrow is not None else [])
+
+
+def record_dtype(model, columns):
+    """
+    Builds the little-endian NumPy dtype of the numeric columns of a model.
+
+    :param model: Mapped model class
+    :param columns: Column names
+    :return: Structured NumPy dtype
+    """
+    return np.dtype([(name, '<f8' if isinstance(model.__table__.columns[name].type, Float) else '<i8')
+                     for name in columns])
+
+
+def encode_wkb_records(rows, model, columns):
+    """
+    Encodes stored rows as length-prefixed WKB records, copying the stored WKB as is.
+
+    The body starts with WKB_MAGIC, a uint32 byte length and the schema string, e.g. "id:<i8,elevation:<f8",
+    followed by a uint64 record count. Every record holds the column values as described by the schema,
+    the uint32 byte length of the geometry and its WKB. All numbers are little-endian.
+
+    :param rows: Rows of (geometry, *columns), as returned by the database
+    :param model: Mapped model class of the rows
+    :param columns: Column names, in the order of the rows
+    :return: Response body bytes
+    """
+    dtype = record_dtype(model, columns)
+    schema = ",".join(f"{name}:{dtype[name].str}" for name in columns).encode()
+
+    fixed = np.empty(len(rows), dtype=np.dtype(dtype.descr + [("length", "<u4")]))
+    values = list(zip(*rows)) if rows else [()] * (len(columns) + 1)
+    for name, column in zip(columns, values[1:]):
+        fixed[name] = column
+    fixed["length"] = np.fromiter(map(len, values[0]), dtype=np.uint32, count=len(rows))
+
+    buffer = fixed.tobytes()
+    size = fixed.dtype.itemsize
+    parts = [WKB_MAGIC, struct.pack("<I", len(schema)), schema, struct.pack("<Q", len(rows))]
+    for position, wkb in enumerate(values[0]):
+        parts.append(buffer[position * size:(position + 1) * size])
+        parts.append(wkb)
+    return b"".join(parts)
+
+
+def decode_wkb_records(body):
+    """
+    Decodes a body written by encode_wkb_records.
+
+    :param body: Response body bytes
+    :return: Tuple of a structured NumPy array of the column values and a list of WKB geometries
+    """
+    if body[:4] != WKB_MAGIC:
+        raise ValueError("Not a WKB records body")
+    (schema_length,) = struct.unpack_from("<I", body, 4)
+    offset = 8 + schema_length
+    dtype = np.dtype([tuple(field.split(":")) for field in body[8:offset].decode().split(",")])
+    (count,) = struct.unpack_from("<Q", body, offset)
+    offset += 8
+
+    values = np.empty(count, dtype=dtype)
+    geometries = []
+    for position in range(count):
+        values[position] = np.frombuffer(body, dtype=dtype, count=1, offset=offset)[0]
+        offset += dtype.itemsize
+        (length,) = struct.unpack_from("<I", body, offset)
+        offset += 4
+        geometries.append(body[offset:offset + length])
+        offset += length
+    return values, geometries
+
+
+def encode_arrow(rows, model, columns):
+    """
+    Encodes stored rows as an Arrow IPC stream with a GeoArrow WKB geometry column.
+
+    :param rows: Rows of (geometry, *columns), as returned by the database
+    :param model: Mapped model class of the rows
+    :param columns: Column names, in the order of the rows
+    :return: Response body bytes
+    """
+    dtype = record_dtype(model, columns)
+    values = list(zip(*rows)) if rows else [()] * (len(columns) + 1)
+    arrays = [pyarrow.array(np.asarray(column, dtype=dtype[name])) for name, column in zip(columns, values[1:])]
+    arrays.append(pyarrow.array(values[0], type=pyarrow.binary()))
+    fields = [pyarrow.field(name, array.type) for name, array in zip(columns, arrays)]
+    fields.append(pyarrow.field("geometry", pyarrow.binary(), metadata={"ARROW:extension:name": "geoarrow.wkb"}))
+
+    table = pyarrow.Table.from_arrays(arrays, schema=pyarrow.schema(fields))
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
@@ -0,0 +1,341 @@
+# app/api/mvt.py
+import math
+import struct
+
+import numpy as np
+import shapely
+
+from app.tools import geometries_from_wkb
+
+MVT_MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+
+# Web Mercator stops at the latitude where the world is square
+MAX_LATITUDE = 85.0511287798066
+MAX_ZOOM = 24
+
+# Protocol buffer wire types, and the geometry type and commands of the Mapbox Vector Tile specification 2.1
+_VARINT, _FIXED64, _BYTES, _FIXED32 = 0, 1, 2, 5
+_POLYGON = 3
+_MOVE_TO, _LINE_TO, _CLOSE_PATH = 1, 2, 7
+
+
+def tile_bounds(z, x, y, margin=0.0):
+    """
+    Computes the longitude/latitude bounding box of a Web Mercator tile.
+
+    :param z: Zoom level
+    :param x: Tile column
+    :param y: Tile row, counted from the north
+    :param margin: Margin around the tile, as a fraction of the tile size
+    :return: Tuple of (minx, miny, maxx, maxy) in degrees
+    """
+    n = 2 ** z
+
+    def longitude(column):
+        return column / n * 360.0 - 180.0
+
+    def latitude(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return longitude(x - margin), latitude(y + 1 + margin), longitude(x + 1 + margin), latitude(y - margin)
+
+
+def to_tile_geometries(geometries, z, x, y, extent, buffer):
+    """
+    Projects longitude/latitude geometries to the integer coordinates of a tile, clipped to the tile and a
+    buffer around it, with the y axis pointing down. Geometries that fall outside the tile or collapse when
+    snapped to the grid become empty.
+
+    :param geometries: NumPy array of shapely geometries in longitude/latitude
+    :param z: Zoom level
+    :param x: Tile column
+    :param y: Tile row, counted from the north
+    :param extent: Size of the tile in integer coordinates
+    :param buffer: Size of the buffer around the tile in integer coordinates
+    :return: NumPy array of shapely geometries in tile coordinates
+    """
+    n = 2 ** z
+
+    def project(coordinates):
+        longitude = coordinates[:, 0]
+        latitude = np.radians(np.clip(coordinates[:, 1], -MAX_LATITUDE, MAX_LATITUDE))
+        column = (longitude + 180.0) / 360.0 * n
+        row = (1.0 - np.arcsinh(np.tan(latitude)) / np.pi) / 2.0 * n
+        return np.column_stack(((column - x) * extent, (row - y) * extent))
+
+    projected = shapely.transform(geometries, project)
+    clipped = shapely.clip_by_rect(projected, -buffer, -buffer, extent + buffer, extent + buffer)
+    return shapely.set_precision(clipped, 1.0)
+
+
+def _varint(value, out):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def _key(field, wire_type, out):
+    _varint((field << 3) | wire_type, out)
+
+
+def _bytes_field(field, data, out):
+    _key(field, _BYTES, out)
+    _varint(len(data), out)
+    out += data
+
+
+def _packed_field(field, values, out):
+    packed = bytearray()
+    for value in values:
+        _varint(value, packed)
+    _bytes_field(field, packed, out)
+
+
+def _value(value):
+    out = bytearray()
+    if isinstance(value, bool):
+        _key(7, _VARINT, out)
+        _varint(int(value), out)
+    elif isinstance(value, (int, np.integer)):
+        if value >= 0:
+            _key(5, _VARINT, out)
+            _varint(int(value), out)
+        else:
+            _key(6, _VARINT, out)
+            _varint(_zigzag(int(value)), out)
+    elif isinstance(value, (float, np.floating)):
+        _key(3, _FIXED64, out)
+        out += struct.pack("<d", value)
+    else:
+        _bytes_field(1, str(value).encode(), out)
+    return bytes(out)
+
+
+def _polygons(geometry):
+    for part in shapely.get_parts(geometry):
+        if part.geom_type == "Polygon":
+            yield part
+        elif part.geom_type in ("MultiPolygon", "GeometryCollection"):
+            yield from _polygons(part)
+
+
+def polygon_commands(geometry):
+    """
+    Encodes the polygonal parts of a geometry in tile coordinates as MVT geometry commands.
+
+    Exterior rings are written with a positive and interior rings with a negative area, as required by
+    the specification, and degenerate rings are left out.
+
+    :param geometry: Shapely geometry in integer tile coordinates
+    :return: List of command and parameter integers, empty if nothing is left to draw
+    """
+    commands = []
+    cursor = np.zeros(2, dtype=np.int64)
+    for polygon in _polygons(geometry):
+        for position, ring in enumerate([polygon.exterior, *polygon.interiors]):
+            points = np.asarray(ring.coords, dtype=np.float64)[:-1, :2].astype(np.int64)
+            area = np.sum(points[:, 0] * np.roll(points[:, 1], -1) - np.roll(points[:, 0], -1) * points[:, 1])
+            if len(points) < 3 or area == 0:
+                if position == 0:
+                    break
+                continue
+            if (area > 0) != (position == 0):
+                points = points[::-1]
+
+            deltas = np.diff(points, axis=0, prepend=cursor[np.newaxis])
+            cursor = points[-1]
+            parameters = _zigzag(deltas).tolist()
+            commands += [(1 << 3) | _MOVE_TO, *parameters[0], ((len(points) - 1) << 3) | _LINE_TO]
+            commands += [value for delta in parameters[1:] for value in delta]
+            commands.append((1 << 3) | _CLOSE_PATH)
+    return commands
+
+
+def encode_layer(name, geometries, ids, properties, extent):
+    """
+    Encodes a layer of polygon features.
+
+    :param name: Layer name
+    :param geometries: Shapely geometries in integer tile coordinates
+    :param ids: Feature IDs, positionally matching the geometries
+    :param properties: List of attribute dictionaries, positionally matching the geometries
+    :param extent: Size of the tile in integer coordinates
+    :return: Encoded layer, or None if it has no feature left to draw
+    """
+    keys, values, features = {}, {}, bytearray()
+    for geometry, feature_id, attributes in zip(geometries, ids, properties):
+        commands = polygon_commands(geometry)
+        if not commands:
+            continue
+        tags = []
+        for key, value in attributes.items():
+            if value is None:
+                continue
+            encoded = _value(value)
+            tags += [keys.setdefault(key, len(keys)), values.setdefault(encoded, len(values))]
+
+        feature = bytearray()
+        _key(1, _VARINT, feature)
+        _varint(int(feature_id), feature)
+        _packed_field(2, tags, feature)
+        _key(3, _VARINT, feature)
+        _varint(_POLYGON, feature)
+        _packed_field(4, commands, feature)
+        _bytes_field(2, feature, features)
+
+    if not features:
+        return None
+    layer = bytearray()
+    _key(15, _VARINT, layer)
+    _varint(2, layer)
+    _bytes_field(1, name.encode(), layer)
+    layer += features
+    for key in keys:
+        _bytes_field(3, key.encode(), layer)
+    for value in values:
+        _bytes_field(4, value, layer)
+    _key(5, _VARINT, layer)
+    _varint(extent, layer)
+    return bytes(layer)
+
+
+def encode_tile(layers, z, x, y, extent, buffer):
+    """
+    Builds a Mapbox Vector Tile of stored rows, clipping and quantizing their geometries to the tile.
+
+    :param layers: List of (name, rows, columns) tuples, with rows holding a WKB 'geometry', an 'id' and the
+     attribute columns
+    :param z: Zoom level
+    :param x: Tile column
+    :param y: Tile row, counted from the north
+    :param extent: Size of the tile in integer coordinates
+    :param buffer: Size of the buffer around the tile in integer coordinates
+    :return: Encoded tile, empty if no feature is drawn in it
+    """
+    tile = bytearray()
+    for name, rows, columns in layers:
+        if not rows:
+            continue
+        geometries = to_tile_geometries(geometries_from_wkb(rows), z, x, y, extent, buffer)
+        attributes = [{column: getattr(row, column) for column in columns if column != "id"} for row in rows]
+        layer = encode_layer(name, geometries, [row.id for row in rows], attributes, extent)
+        if layer is not None:
+            _bytes_field(3, layer, tile)
+    return bytes(tile)
+
+
+def _read_varint(data, position):
+    result = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        result |= (byte & 0x7F) << shift
+        shift += 7
+        if byte < 0x80:
+            return result, position
+
+
+def _read_fields(data):
+    position = 0
+    while position < len(data):
+        key, position = _read_varint(data, position)
+        field, wire_type = key >> 3, key & 0x7
+        if wire_type == _VARINT:
+            value, position = _read_varint(data, position)
+        elif wire_type == _BYTES:
+            length, position = _read_varint(data, position)
+            value, position = data[position:position + length], position + length
+        elif wire_type == _FIXED64:
+            value, position = data[position:position + 8], position + 8
+        elif wire_type == _FIXED32:
+            value, position = data[position:position + 4], position + 4
+        else:
+            raise ValueError(f"Unsupported wire type {wire_type}")
+        yield field, wire_type, value
+
+
+def _read_packed(data):
+    values, position = [], 0
+    while position < len(data):
+        value, position = _read_varint(data, position)
+        values.append(value)
+    return values
+
+
+def _read_value(data):
+    for field, _, value in _read_fields(data):
+        if field == 1:
+            return value.decode()
+        if field == 2:
+            return struct.unpack("<f", value)[0]
+        if field == 3:
+            return struct.unpack("<d", value)[0]
+        if field in (4, 5):
+            return value
+        if field == 6:
+            return (value >> 1) ^ -(value & 1)
+        if field == 7:
+            return bool(value)
+    return None
+
+
+def _read_rings(commands):
+    rings, x, y, position = [], 0, 0, 0
+    while position < len(commands):
+        command, count = commands[position] & 0x7, commands[position] >> 3
+        position += 1
+        if command == _CLOSE_PATH:
+            rings[-1].append(rings[-1][0])
+            continue
+        for _ in range(count):
+            x += (commands[position] >> 1) ^ -(commands[position] & 1)
+            y += (commands[position + 1] >> 1) ^ -(commands[position + 1] & 1)
+            position += 2
+            if command == _MOVE_TO:
+                rings.append([])
+            rings[-1].append((x, y))
+    return rings
+
+
+def decode_tile(body):
+    """
+    Decodes a tile written by encode_tile.
+
+    :param body: Tile bytes
+    :return: Dictionary of layers by name, each a dictionary of its 'extent' and 'features', with the 'id',
+     'properties' and 'rings' of every feature in tile coordinates
+    """
+    layers = {}
+    for _, _, layer_data in _read_fields(body):
+        name, extent, keys, values, features = None, 4096, [], [], []
+        for field, _, value in _read_fields(layer_data):
+            if field == 1:
+                name = value.decode()
+            elif field == 2:
+                features.append(value)
+            elif field == 3:
+                keys.append(value.decode())
+            elif field == 4:
+                values.append(_read_value(value))
+            elif field == 5:
+                extent = value
+
+        decoded = []
+        for feature_data in features:
+            feature = {"id": None, "properties": {}, "rings": []}
+            for field, _, value in _read_fields(feature_data):
+                if field == 1:
+                    feature["id"] = value
+                elif field == 2:
+                    tags = _read_packed(value)
+                    feature["properties"] = {keys[k]: values[v] for k, v in zip(tags[::2], tags[1::2])}
+                elif field == 4:
+                    feature["rings"] = _read_rings(_read_packed(value))
+            decoded.append(feature)
+        layers[name] = {"extent": extent, "features": decoded}
+    return layers
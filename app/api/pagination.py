@@ -0,0 +1,174 @@
+# app/api/pagination.py
+import base64
+import binascii
+import json
+import math
+
+import shapely
+
+from app.core.config import MAX_PAGE_SIZE
+from app.tools import geometries_from_wkb
+
+# Bounds of the feature IDs of cursors, those of signed 64-bit database integers
+MIN_ID, MAX_ID = -2 ** 63, 2 ** 63 - 1
+
+
+class FeatureWindow:
+    """
+    Part of the features of a project resource to serve: those intersecting a bounding box, after a cursor
+    and up to a limit, in ID order.
+
+    :param bbox: Tuple of (minx, miny, maxx, maxy), or None for features anywhere
+    :param after: ID after which features are served, or None to start at the first feature
+    :param limit: Maximum number of features, or None for all
+    """
+    __slots__ = ("bbox", "after", "limit")
+
+    def __init__(self, bbox=None, after=None, limit=None):
+        self.bbox = bbox
+        self.after = after
+        self.limit = limit
+
+    @property
+    def key(self):
+        """Canonical text of the window, distinguishing its responses and ETags from those of other windows."""
+        parts = []
+        if self.bbox is not None:
+            # Without commas, which separate the ETags of If-None-Match
+            parts.append("bbox=" + "/".join(repr(value) for value in self.bbox))
+        if self.limit is not None:
+            parts.append(f"limit={self.limit}")
+        if self.after is not None:
+            parts.append(f"after={self.after}")
+        return "&".join(parts)
+
+
+def parse_bbox(bbox):
+    """
+    Parses a bounding box query parameter.
+
+    :param bbox: Text of the form 'minx,miny,maxx,maxy'
+    :return: Tuple of (minx, miny, maxx, maxy), raises ValueError if malformed
+    """
+    try:
+        values = tuple(float(value) for value in bbox.split(","))
+    except ValueError:
+        raise ValueError("The bbox must be four comma-separated numbers: minx,miny,maxx,maxy.")
+    if len(values) != 4 or not all(math.isfinite(value) for value in values):
+        raise ValueError("The bbox must be four comma-separated numbers: minx,miny,maxx,maxy.")
+    minx, miny, maxx, maxy = values
+    if minx > maxx or miny > maxy:
+        raise ValueError("The bbox minimum must not exceed its maximum.")
+    return values
+
+
+def encode_cursor(last_id):
+    """
+    Encodes the opaque cursor of the page following a row.
+
+    :param last_id: ID of the last row of the page
+    :return: URL-safe cursor text
+    """
+    return base64.urlsafe_b64encode(json.dumps({"after": last_id}).encode()).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor):
+    """
+    Decodes a cursor, as encoded by encode_cursor.
+
+    :param cursor: Cursor text
+    :return: ID of the last row of the previous page, raises ValueError if the cursor is invalid
+    """
+    try:
+        after = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))["after"]
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError, TypeError, KeyError):
+        raise ValueError("Invalid cursor.")
+    # JSON true and false are ints to Python
+    if type(after) is not int or not MIN_ID <= after <= MAX_ID:
+        raise ValueError("Invalid cursor.")
+    return after
+
+
+def feature_window(bbox=None, limit=None, cursor=None):
+    """
+    Builds the window of features requested through the bbox, limit and cursor query parameters.
+
+    :param bbox: Bounding box text, see parse_bbox, or None
+    :param limit: Maximum number of features, or None
+    :param cursor: Cursor of the page to serve, or None for the first page
+    :return: FeatureWindow, or None if no parameter is given; raises ValueError if a parameter is invalid
+    """
+    if bbox is None and limit is None and cursor is None:
+        return None
+    if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"The limit must be a positive integer of at most {MAX_PAGE_SIZE}.")
+    return FeatureWindow(parse_bbox(bbox) if bbox is not None else None,
+                         decode_cursor(cursor) if cursor is not None else None, limit)
+
+
+def window_statement(statement, model, project_id, window, after=None):
+    """
+    Restricts a select statement of a project resource to the candidates of a window, whose stored bounding
+    box intersects the window bounding box, in ID order.
+
+    :param statement: Select statement of the resource rows
+    :param model: Mapped model class with project_id, id and bounding box columns
+    :param project_id: Unique project identifier
+    :param window: FeatureWindow
+    :param after: ID after which rows are selected, overriding the window cursor, or None
+    :return: Select statement
+    """
+    statement = statement.where(model.project_id == project_id)
+    if window.bbox is not None:
+        minx, miny, maxx, maxy = window.bbox
+        statement = statement.where(model.minx <= maxx, model.maxx >= minx, model.miny <= maxy, model.maxy >= miny)
+    after = window.after if after is None else after
+    if after is not None:
+        statement = statement.where(model.id > after)
+    return statement.order_by(model.id)
+
+
+def refine_bbox(rows, bbox):
+    """
+    Keeps the rows whose geometry intersects a bounding box.
+
+    :param rows: List of rows or stored objects with a WKB 'geometry'
+    :param bbox: Tuple of (minx, miny, maxx, maxy), or None to keep every row
+    :return: List of rows
+    """
+    if bbox is None or not rows:
+        return rows
+    intersects = shapely.intersects(geometries_from_wkb(rows), shapely.box(*bbox))
+    return [row for row, keep in zip(rows, intersects) if keep]
+
+
+def load_window(fetch, statement, model, project_id, window):
+    """
+    Loads the rows of a window.
+
+    Candidates are prefiltered by their stored bounding box in the database and refined with an exact
+    intersects check. Limited windows are read by keyset on ID, in batches of the page size until the page
+    is full, so deep pages cost as much as the first one.
+
+    :param fetch: Function running a select statement and returning its rows, e.g. db.scalars
+    :param statement: Select statement of the resource rows, with an 'id' in every row
+    :param model: Mapped model class of the resource
+    :param project_id: Unique project identifier
+    :param window: FeatureWindow
+    :return: Tuple of the list of rows, and the cursor of the next page or None if there is none
+    """
+    if window.limit is None:
+        return refine_bbox(fetch(window_statement(statement, model, project_id, window)).all(), window.bbox), None
+
+    rows, after, batch_size = [], None, window.limit + 1
+    while len(rows) <= window.limit:
+        batch = fetch(window_statement(statement, model, project_id, window, after).limit(batch_size)).all()
+        rows += refine_bbox(batch, window.bbox)
+        if len(batch) < batch_size:
+            break
+        after = batch[-1].id
+
+    if len(rows) > window.limit:
+        rows = rows[:window.limit]
+        return rows, encode_cursor(rows[-1].id)
+    return rows, None
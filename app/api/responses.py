@@ -0,0 +1,79 @@
+# app/api/responses.py
+import json
+
+from fastapi.responses import JSONResponse
+
+from app.tools import geometries_to_geojson
+
+try:
+    import orjson
+except ImportError:  # Falls back to the standard library encoder
+    orjson = None
+
+
+def dumps(content):
+    """
+    Encodes content as compact JSON, with orjson when it is installed.
+
+    :param content: JSON-serializable content
+    :return: UTF-8 encoded JSON
+    """
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response that encodes its content directly with dumps(), for content that is already made of
+    plain dicts, lists, strings and numbers and does not need to pass through jsonable_encoder.
+    """
+
+    def render(self, content):
+        return dumps(content)
+
+
+def feature_fragments(rows, to_feature):
+    """
+    Encodes stored rows as GeoJSON features, splicing the GeoJSON text of their geometries, as encoded
+    by GEOS, into the encoded feature members instead of building and walking coordinate lists.
+
+    :param rows: List of stored BuildingLimit, HeightPlateau or SplitBuildingLimit objects
+    :param to_feature: Function building the feature members of a row, other than its type and geometry
+    :return: List of UTF-8 encoded GeoJSON features
+    """
+    return [b'{"type":"Feature","geometry":' + geometry + b"," + dumps(to_feature(row))[1:]
+            for row, geometry in zip(rows, geometries_to_geojson(rows))]
+
+
+def feature_collection_prefix(key):
+    """
+    Encodes the start of a response holding a FeatureCollection under a key, up to its first feature.
+
+    :param key: Key of the FeatureCollection in the response
+    :return: UTF-8 encoded JSON fragment
+    """
+    return b'{' + dumps(key) + b':{"type":"FeatureCollection","features":['
+
+
+FEATURE_COLLECTION_SUFFIX = b"]}}"
+
+NO_DATA_BODY = dumps({"message": "No data found"})
+
+
+def feature_collection_body(key, rows, to_feature, next_cursor=None):
+    """
+    Encodes the response body of a FeatureCollection of stored rows.
+
+    :param key: Key of the FeatureCollection in the response
+    :param rows: List of stored BuildingLimit, HeightPlateau or SplitBuildingLimit objects
+    :param to_feature: Function building the feature members of a row, other than its type and geometry
+    :param next_cursor: Cursor of the next page, added to the response as 'next_cursor' if given
+    :return: UTF-8 encoded JSON, or the no data message if there are no rows
+    """
+    if not rows:
+        return NO_DATA_BODY
+    body = feature_collection_prefix(key) + b",".join(feature_fragments(rows, to_feature)) + FEATURE_COLLECTION_SUFFIX
+    if next_cursor is not None:
+        body = body[:-1] + b',"next_cursor":' + dumps(next_cursor) + b"}"
+    return body
@@ -0,0 +1,120 @@
+# app/core/cache.py
+from collections import OrderedDict
+from threading import Lock
+
+from app.core.config import RESPONSE_CACHE_ENTRIES, RESPONSE_CACHE_BYTES
+
+
+def project_revision(project):
+    """
+    Identifies the stored state of a project, to be read before loading the project data.
+
+    The revision is made of the generation of the project, which is new whenever its ID is created, and its
+    version, which every write increments. Every worker reads it from the database, so the responses and
+    ETags keyed by it change in all workers as soon as a write commits.
+
+    :param project: Project row, or None if the project does not exist
+    :return: Revision text
+    """
+    if project is None:
+        return "none"
+    return f"{project.generation}.{project.version}"
+
+
+class ResponseCache:
+    """
+    In-process LRU cache of rendered GET responses, keyed by project ID, resource type and project revision.
+
+    Revisions are read from the database, see project_revision, so a worker never serves the responses of a
+    revision that another worker has since written over. ETags are derived from the revision and are the same
+    in every worker.
+
+    :param max_entries: Maximum number of cached responses
+    :param max_bytes: Maximum total size of the cached response bodies
+    """
+
+    def __init__(self, max_entries=RESPONSE_CACHE_ENTRIES, max_bytes=RESPONSE_CACHE_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = Lock()
+
+    def etag(self, project_id, resource, revision):
+        """
+        Builds the strong ETag of a resource at a project revision.
+
+        :param project_id: Unique project identifier
+        :param resource: Resource type, e.g. 'building_limits'
+        :param revision: Project revision, as returned by project_revision
+        :return: Quoted ETag
+        """
+        return f'"{resource}-{project_id}-{revision}"'
+
+    def get(self, project_id, resource, revision):
+        """
+        Returns a cached response body, or None if it is not cached for this project revision.
+
+        :param project_id: Unique project identifier
+        :param resource: Resource type
+        :param revision: Project revision, as returned by project_revision
+        :return: Response body bytes or None
+        """
+        key = (project_id, resource, revision)
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, project_id, resource, revision, body):
+        """
+        Caches a response body.
+
+        :param project_id: Unique project identifier
+        :param resource: Resource type
+        :param revision: Project revision read before the data of the body was loaded
+        :param body: Response body bytes
+        :return: None
+        """
+        if len(body) > self.max_bytes:
+            return
+        key = (project_id, resource, revision)
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = body
+            self._size += len(body)
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def invalidate(self, project_id):
+        """
+        Drops the cached responses of a project, whose revision has changed. Called after every write, to free
+        the memory of responses that will not be served again.
+
+        :param project_id: Unique project identifier
+        :return: None
+        """
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == project_id]:
+                self._size -= len(self._entries.pop(key))
+
+
+def etag_matches(if_none_match, etag):
+    """
+    Checks an If-None-Match header against an ETag, using weak comparison as required for GET.
+
+    :param if_none_match: Value of the If-None-Match header, or None
+    :param etag: Current quoted ETag
+    :return: True if the client copy is current
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    return etag in (tag.strip().removeprefix('W/') for tag in if_none_match.split(','))
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,81 @@
+# app/core/coalescing.py
+import time
+from threading import Event, Lock
+
+from app.core.config import UPDATE_COALESCE_WINDOW
+
+
+class _Batch:
+    __slots__ = ("items", "keys", "outcomes", "done")
+
+    def __init__(self):
+        self.items = []
+        self.keys = set()
+        self.outcomes = None
+        self.done = Event()
+
+
+class WriteCoalescer:
+    """
+    Merges writes to the same target, e.g. a project, that arrive within a window into one batch.
+
+    The first write of a batch waits for the window to pass and then runs the whole batch in its own thread,
+    while the writes that joined it wait for their outcome. Writes touching the same keys as a pending batch,
+    e.g. the same features, are not merged into it but run on their own right away.
+
+    :param window: Seconds the first write of a batch waits for others to join, 0 to disable coalescing
+    """
+
+    def __init__(self, window=UPDATE_COALESCE_WINDOW):
+        self.window = window
+        self._pending = {}
+        self._lock = Lock()
+
+    def submit(self, target, item, keys, run_batch):
+        """
+        Submits a write and waits for its outcome.
+
+        :param target: Hashable identifier of what the write modifies, e.g. a project ID
+        :param item: Write to run, as passed to run_batch
+        :param keys: Set of hashable identifiers of what the write touches, e.g. feature IDs
+        :param run_batch: Function running a list of writes and returning a list of (result, exception) tuples,
+         positionally matching the writes
+        :return: Result of the write, raises its exception if it failed
+        """
+        leader = False
+        with self._lock:
+            batch = self._pending.get(target)
+            if batch is None:
+                batch = self._pending[target] = _Batch()
+                leader = True
+            elif not batch.keys.isdisjoint(keys):
+                batch = None
+
+            if batch is not None:
+                position = len(batch.items)
+                batch.items.append(item)
+                batch.keys.update(keys)
+
+        if batch is None:
+            result, error = run_batch([item])[0]
+        elif leader:
+            time.sleep(self.window)
+            with self._lock:
+                del self._pending[target]
+            try:
+                batch.outcomes = run_batch(batch.items)
+            except Exception as e:
+                batch.outcomes = [(None, e)] * len(batch.items)
+            finally:
+                batch.done.set()
+            result, error = batch.outcomes[position]
+        else:
+            batch.done.wait()
+            result, error = batch.outcomes[position]
+
+        if error is not None:
+            raise error
+        return result
+
+
+update_coalescer = WriteCoalescer()
@@ -1,21 +1,87 @@
 # app/core/config.py
 from os import environ
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from app.models import Base
+from app.core.database import create_database_engine
 
 # Database connection setup
 DATABASE_URL = environ.get("conn_str", 'sqlite:///./test.db')
 
-engine = create_engine(DATABASE_URL)
+# Engine settings profile, 'sqlite' or 'postgresql', chosen by the database URL unless set
+DATABASE_PROFILE = environ.get("db_profile")
+DB_POOL_SIZE = int(environ.get("db_pool_size", 10))
+DB_MAX_OVERFLOW = int(environ.get("db_max_overflow", 20))
+DB_POOL_RECYCLE = int(environ.get("db_pool_recycle", 1800))
+DB_STATEMENT_TIMEOUT = int(environ.get("db_statement_timeout", 30000))  # Milliseconds
+DB_BUSY_TIMEOUT = int(environ.get("db_busy_timeout", 5000))  # Milliseconds
+
+# Per-phase timings, Server-Timing headers and the histograms served at /metrics
+METRICS_ENABLED = environ.get("metrics_enabled", "true").lower() == "true"
+
+# Bounds of the in-process cache of GET responses
+RESPONSE_CACHE_ENTRIES = int(environ.get("response_cache_entries", 256))
+RESPONSE_CACHE_BYTES = int(environ.get("response_cache_bytes", 64 * 1024 * 1024))
+
+# GET responses of at least compression_min_size bytes are compressed with gzip, or brotli when installed,
+# if the client accepts it
+COMPRESSION_MIN_SIZE = int(environ.get("compression_min_size", 1024))
+GZIP_LEVEL = int(environ.get("gzip_level", 6))
+BROTLI_QUALITY = int(environ.get("brotli_quality", 5))
+
+# GET responses of projects with more features than the threshold are streamed, in batches of rows
+STREAM_THRESHOLD = int(environ.get("stream_threshold", 10000))
+STREAM_BATCH_SIZE = int(environ.get("stream_batch_size", 1000))
+
+# Largest number of features of a page of the GET endpoints, requested with their limit parameter
+MAX_PAGE_SIZE = int(environ.get("max_page_size", 10000))
+
+# Split computations run in a pool of worker processes (0 runs them in the request thread), and requests beyond
+# the workers and queue are rejected with 503 and a Retry-After of SPLIT_RETRY_AFTER seconds
+SPLIT_WORKERS = int(environ.get("split_workers", 0))
+SPLIT_QUEUE_SIZE = int(environ.get("split_queue_size", 8))
+SPLIT_RETRY_AFTER = int(environ.get("split_retry_after", 5))
+
+# Records of a bulk import are split and stored in batches of this size
+IMPORT_BATCH_SIZE = int(environ.get("import_batch_size", 100))
+
+# Updates of the same project arriving within update_coalesce_window seconds of each other are merged into one,
+# unless they edit the same features (0 disables coalescing)
+UPDATE_COALESCE_WINDOW = float(environ.get("update_coalesce_window", 0))
+
+# Creates and updates with more features than job_threshold (0 to never) run as background jobs in a pool of
+# job_workers threads (0 runs them before answering). Running jobs refresh a heartbeat every
+# job_heartbeat_interval seconds, and those without a heartbeat for job_stale_after seconds are considered
+# interrupted and are run again
+JOB_THRESHOLD = int(environ.get("job_threshold", 10000))
+JOB_WORKERS = int(environ.get("job_workers", 2))
+JOB_HEARTBEAT_INTERVAL = float(environ.get("job_heartbeat_interval", 10))
+JOB_STALE_AFTER = float(environ.get("job_stale_after", 60))
+
+# Split results are cached by the content of their input geometries, snapped to a grid of SPLIT_CACHE_GRID,
+# in memory and, if split_cache_path is set, in a SQLite database at that path
+SPLIT_CACHE_ENTRIES = int(environ.get("split_cache_entries", 128))
+SPLIT_CACHE_PATH = environ.get("split_cache_path")
+SPLIT_CACHE_GRID = float(environ.get("split_cache_grid", 1e-9))
+
+# Vector tiles are drawn on a grid of tile_extent units per side, clipped tile_buffer units outside the tile, and
+# cached by project revision in memory and, if tile_cache_path is set, in a SQLite database at that path
+TILE_EXTENT = int(environ.get("tile_extent", 4096))
+TILE_BUFFER = int(environ.get("tile_buffer", 64))
+TILE_CACHE_ENTRIES = int(environ.get("tile_cache_entries", 1024))
+TILE_CACHE_PATH = environ.get("tile_cache_path")
+
+# Run the split, serialization and compression paths once at startup, and start the split workers, so the
+# first requests after a cold start do not pay for it
+WARMUP = environ.get("warmup", "false").lower() == "true"
+
+engine = create_database_engine(DATABASE_URL, DATABASE_PROFILE, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                                pool_recycle=DB_POOL_RECYCLE, statement_timeout=DB_STATEMENT_TIMEOUT,
+                                busy_timeout=DB_BUSY_TIMEOUT)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base.metadata.create_all(bind=engine)
+
 
 def get_db():
     db = SessionLocal()
     try:
-        if 'sqlite' in DATABASE_URL:
-            Base.metadata.create_all(bind=engine)
         yield db
     finally:
         db.close()
@@ -0,0 +1,55 @@
+# app/core/database.py
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+
+DATABASE_PROFILES = ("sqlite", "postgresql")
+
+
+def configure_sqlite_connection(dbapi_connection, busy_timeout):
+    """
+    Applies the SQLite profile settings to a new connection.
+
+    WAL mode lets readers proceed while a write is in progress, synchronous=NORMAL only syncs at WAL
+    checkpoints, which is safe in WAL mode, and the busy timeout makes concurrent writers wait for
+    the write lock instead of failing with 'database is locked'.
+
+    :param dbapi_connection: sqlite3 connection
+    :param busy_timeout: Busy timeout in milliseconds
+    :return: None
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(busy_timeout)}")
+    cursor.close()
+
+
+def create_database_engine(url, profile=None, pool_size=10, max_overflow=20, pool_recycle=1800,
+                           statement_timeout=30000, busy_timeout=5000):
+    """
+    Creates the engine of a database URL with the settings of a database profile.
+
+    The 'sqlite' profile is meant for development and tests, the 'postgresql' profile for production:
+    it sizes the connection pool, checks connections before use, recycles them before servers or
+    proxies drop them, and bounds the run time of every statement.
+
+    :param url: Database URL
+    :param profile: Name of the profile, one of DATABASE_PROFILES, or None to choose it by the URL backend
+    :param pool_size: Number of pooled connections kept open (postgresql)
+    :param max_overflow: Number of connections opened beyond the pool size under load (postgresql)
+    :param pool_recycle: Age in seconds after which pooled connections are replaced (postgresql)
+    :param statement_timeout: Maximum run time of a statement in milliseconds (postgresql)
+    :param busy_timeout: Time in milliseconds to wait for a lock held by another connection (sqlite)
+    :return: SQLAlchemy engine
+    """
+    profile = profile or make_url(url).get_backend_name()
+    if profile == "sqlite":
+        engine = create_engine(url)
+        event.listen(engine, "connect",
+                     lambda dbapi_connection, _: configure_sqlite_connection(dbapi_connection, busy_timeout))
+        return engine
+    if profile == "postgresql":
+        return create_engine(url, pool_size=pool_size, max_overflow=max_overflow, pool_pre_ping=True,
+                             pool_recycle=pool_recycle,
+                             connect_args={"options": f"-c statement_timeout={int(statement_timeout)}"})
+    raise ValueError(f"Unknown database profile '{profile}', expected one of {', '.join(DATABASE_PROFILES)}")
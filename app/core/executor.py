@@ -0,0 +1,121 @@
+# app/core/executor.py
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from threading import BoundedSemaphore, Lock
+
+from app.core.config import METRICS_ENABLED, SPLIT_WORKERS, SPLIT_QUEUE_SIZE
+from app.core.metrics import merge_phases, track_phases
+
+
+class SplitQueueFull(Exception):
+    """Raised when a split computation is submitted while all workers are busy and the queue is full."""
+
+
+def _tracked_call(fn, *args):
+    """
+    Runs a function in a worker process, collecting the phases it times, which would otherwise stay in the
+    metrics of the worker.
+
+    :param fn: Module-level function to run
+    :param args: Picklable arguments
+    :return: Tuple of the collected phases and counts, the result of the function, and its exception or None
+    """
+    with track_phases() as collected:
+        try:
+            return collected, fn(*args), None
+        except Exception as e:
+            return collected, None, e
+
+
+def _merged(outcome):
+    collected, result, error = outcome
+    merge_phases(collected)
+    if error is not None:
+        raise error
+    return result
+
+
+class SplitExecutor:
+    """
+    Runs CPU-heavy split computations with admission control.
+
+    With workers > 0 computations run in a process pool, so they neither hold the GIL of the API process nor
+    tie up the threads serving cheap requests for longer than it takes to wait for the result. With
+    workers = 0 they run in the calling thread. Either way, at most max(workers, 1) + max_pending
+    computations are admitted at a time, and further submissions fail fast with SplitQueueFull. The phases
+    timed in the workers are reported as phases of the submitting request.
+
+    :param workers: Number of worker processes, 0 to run in the calling thread
+    :param max_pending: Number of computations that may wait for a free worker
+    """
+
+    def __init__(self, workers=SPLIT_WORKERS, max_pending=SPLIT_QUEUE_SIZE):
+        self.workers = workers
+        self._slots = BoundedSemaphore(max(workers, 1) + max_pending)
+        self._pool = None
+        self._lock = Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # Workers are spawned rather than forked, since the API process runs threads
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+
+    @contextmanager
+    def _admitted(self):
+        if not self._slots.acquire(blocking=False):
+            raise SplitQueueFull("Too many split computations in progress. Please retry later.")
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    def run(self, fn, *args):
+        """
+        Runs a picklable function, waiting for its result.
+
+        :param fn: Module-level function to run
+        :param args: Picklable arguments
+        :return: Result of the function, raises its exception if it fails, or SplitQueueFull if not admitted
+        """
+        with self._admitted():
+            if self.workers:
+                if METRICS_ENABLED:
+                    return _merged(self._get_pool().submit(_tracked_call, fn, *args).result())
+                return self._get_pool().submit(fn, *args).result()
+            return fn(*args)
+
+    def map(self, fn, items):
+        """
+        Runs a picklable function over a batch of items, spread over the workers, as one admitted computation.
+
+        :param fn: Module-level function to run
+        :param items: List of picklable arguments
+        :return: List of results, raises the first exception of fn, or SplitQueueFull if not admitted
+        """
+        with self._admitted():
+            if self.workers:
+                chunksize = max(1, len(items) // (4 * self.workers))
+                if METRICS_ENABLED:
+                    outcomes = list(self._get_pool().map(partial(_tracked_call, fn), items, chunksize=chunksize))
+                    return [_merged(outcome) for outcome in outcomes]
+                return list(self._get_pool().map(fn, items, chunksize=chunksize))
+            return [fn(item) for item in items]
+
+    def shutdown(self):
+        """
+        Shuts down the worker processes, if they were started.
+
+        :return: None
+        """
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+
+split_executor = SplitExecutor()
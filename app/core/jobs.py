@@ -0,0 +1,221 @@
+# app/core/jobs.py
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock, Thread
+
+from sqlalchemy import func, select, update
+
+from app.core.config import JOB_HEARTBEAT_INTERVAL, JOB_STALE_AFTER, JOB_WORKERS, SessionLocal
+from app.core.metrics import track_phases
+from app.models import Job
+
+
+class JobRunner:
+    """
+    Runs create and update operations as background jobs, whose state is kept in the jobs table.
+
+    Jobs are claimed with a conditional UPDATE of their status before they run, so a job is only run once
+    even when several processes share the database. While jobs run, a monitor thread refreshes their
+    heartbeat and requeues the running jobs of any process whose heartbeat stopped, e.g. because it crashed,
+    so interrupted jobs are run again whether or not the application restarts. Jobs that are still queued
+    when the application starts are run by resume().
+
+    :param workers: Number of threads running jobs, 0 to run jobs in the thread that enqueues them
+    :param session_factory: Factory of the database sessions jobs run in
+    :param heartbeat_interval: Seconds between the heartbeats of running jobs and the checks for stale ones
+    :param stale_after: Seconds without a heartbeat after which a running job is considered interrupted
+    """
+
+    def __init__(self, workers=JOB_WORKERS, session_factory=SessionLocal, heartbeat_interval=JOB_HEARTBEAT_INTERVAL,
+                 stale_after=JOB_STALE_AFTER):
+        self.workers = workers
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        self._session_factory = session_factory
+        self._handlers = {}
+        self._progress = {}
+        self._running = set()
+        self._pool = None
+        self._monitor = None
+        self._stopped = Event()
+        self._lock = Lock()
+
+    def handler(self, kind):
+        """
+        Decorates the function running the jobs of a kind. It is called with a database session, the project
+        ID and the payload of the job, and returns the HTTP status code and response body of the operation.
+
+        :param kind: Kind of job, e.g. 'create'
+        :return: Decorator
+        """
+        def decorator(fn):
+            self._handlers[kind] = fn
+            return fn
+        return decorator
+
+    def enqueue(self, db, kind, project_id, payload):
+        """
+        Stores a new job and submits it to the workers.
+
+        :param db: Database session, which is committed
+        :param kind: Kind of job, with a registered handler
+        :param project_id: Project ID the job operates on
+        :param payload: JSON-serializable data of the job
+        :return: ID of the job
+        """
+        job = Job(kind=kind, project_id=project_id, status="queued", payload=json.dumps(payload),
+                  created_at=time.time())
+        db.add(job)
+        db.commit()
+        self._submit(job.id)
+        return job.id
+
+    def _submit(self, job_id):
+        if not self.workers:
+            self.run(job_id)
+            return
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+            self._pool.submit(self.run, job_id)
+
+    def run(self, job_id):
+        """
+        Claims and runs a queued job, and stores its outcome.
+
+        :param job_id: ID of the job
+        :return: True if the job was run, False if it was not queued
+        """
+        self._start_monitor()
+        with self._session_factory() as db:
+            now = time.time()
+            claimed = db.execute(update(Job).where(Job.id == job_id, Job.status == "queued")
+                                 .values(status="running", started_at=now, heartbeat_at=now)).rowcount == 1
+            db.commit()
+            if not claimed:
+                return False
+            with self._lock:
+                self._running.add(job_id)
+            job = db.get(Job, job_id)
+
+            def on_phase(name):
+                with self._lock:
+                    self._progress[job_id] = {"phase": name, "phases": dict(current["phases"])}
+
+            with track_phases(on_phase) as current:
+                try:
+                    status_code, body = self._handlers[job.kind](db, job.project_id, json.loads(job.payload))
+                except Exception as e:
+                    db.rollback()
+                    status_code, body = 500, {"detail": str(e)}
+
+            db.execute(update(Job).where(Job.id == job_id).values(
+                status="succeeded" if status_code < 400 else "failed", phases=json.dumps(current["phases"]),
+                status_code=status_code, result=json.dumps(body), finished_at=time.time()))
+            db.commit()
+        with self._lock:
+            self._progress.pop(job_id, None)
+            self._running.discard(job_id)
+        return True
+
+    def progress(self, job_id):
+        """
+        Returns the progress of a job running in this process.
+
+        :param job_id: ID of the job
+        :return: Dictionary of the current 'phase' and the durations of the completed 'phases', or None
+        """
+        with self._lock:
+            return self._progress.get(job_id)
+
+    def heartbeat(self):
+        """
+        Refreshes the heartbeat of the jobs running in this process.
+
+        :return: None
+        """
+        with self._lock:
+            job_ids = list(self._running)
+        if job_ids:
+            with self._session_factory() as db:
+                db.execute(update(Job).where(Job.id.in_(job_ids), Job.status == "running")
+                           .values(heartbeat_at=time.time()))
+                db.commit()
+
+    def _requeue_stale(self, db):
+        # Jobs claimed before heartbeats were recorded only have a start time
+        last_seen = func.coalesce(Job.heartbeat_at, Job.started_at)
+        stale = (Job.status == "running", last_seen < time.time() - self.stale_after)
+        job_ids = db.scalars(select(Job.id).where(*stale).order_by(Job.id)).all()
+        # Requeued one by one with a conditional UPDATE, so each stale job is taken over by a single process
+        requeued = [job_id for job_id in job_ids
+                    if db.execute(update(Job).where(Job.id == job_id, *stale)
+                                  .values(status="queued", started_at=None, heartbeat_at=None)).rowcount == 1]
+        db.commit()
+        return requeued
+
+    def reap(self):
+        """
+        Requeues and submits the running jobs without a heartbeat for stale_after seconds, which were
+        interrupted by a crash or a restart.
+
+        :return: Number of submitted jobs
+        """
+        with self._session_factory() as db:
+            job_ids = self._requeue_stale(db)
+        for job_id in job_ids:
+            self._submit(job_id)
+        return len(job_ids)
+
+    def resume(self):
+        """
+        Submits the queued jobs and the interrupted running jobs, see reap(), and starts the monitor thread
+        that keeps doing so.
+
+        :return: Number of submitted jobs
+        """
+        with self._session_factory() as db:
+            self._requeue_stale(db)
+            job_ids = db.scalars(select(Job.id).where(Job.status == "queued").order_by(Job.id)).all()
+        self._start_monitor()
+        for job_id in job_ids:
+            self._submit(job_id)
+        return len(job_ids)
+
+    def _start_monitor(self):
+        with self._lock:
+            if self._monitor is not None:
+                return
+            self._monitor = Thread(target=self._monitor_jobs, name="job-monitor", daemon=True)
+            self._monitor.start()
+
+    def _monitor_jobs(self):
+        while not self._stopped.wait(self.heartbeat_interval):
+            try:
+                self.heartbeat()
+                self.reap()
+            except Exception:
+                # Retried at the next interval, e.g. when the database is briefly unavailable
+                continue
+
+    def shutdown(self):
+        """
+        Waits for the running jobs to finish. Jobs that have not started stay queued until the next resume().
+
+        :return: None
+        """
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        # Stopped once the running jobs are done, so their heartbeat lasts as long as they do
+        self._stopped.set()
+        with self._lock:
+            monitor, self._monitor = self._monitor, None
+        if monitor is not None:
+            monitor.join()
+        self._stopped.clear()
+
+
+job_runner = JobRunner()
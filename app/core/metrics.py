@@ -0,0 +1,270 @@
+# app/core/metrics.py
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from threading import Lock
+
+from app.core.config import METRICS_ENABLED
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (1, 10, 100, 1000, 10000, 100000, 1000000)
+
+# Phase durations and counts of the request being handled, shared with the threads it runs in
+_request = ContextVar("request_metrics", default=None)
+
+
+class Histogram:
+    """
+    Prometheus-style histogram with a fixed set of label names.
+
+    :param name: Metric name
+    :param documentation: Help text of the metric
+    :param label_names: Names of the labels of every observation
+    :param buckets: Sorted upper bounds of the buckets, without +Inf
+    """
+
+    def __init__(self, name, documentation, label_names, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = Lock()
+
+    def observe(self, value, *labels):
+        """
+        Records an observation.
+
+        :param value: Observed value
+        :param labels: Label values, in the order of the label names
+        :return: None
+        """
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        """
+        Renders the histogram in the Prometheus text exposition format.
+
+        :return: List of lines
+        """
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, [list(counts), total, count])
+                            for labels, (counts, total, count) in self._series.items())
+        for labels, (counts, total, count) in series:
+            label_text = ",".join(f'{name}="{escape_label(value)}"' for name, value in zip(self.label_names, labels))
+            separator = "," if label_text else ""
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(f'{self.name}_bucket{{{label_text}{separator}le="{le}"}} {cumulative}')
+            suffix = f"{{{label_text}}}" if label_text else ""
+            lines.append(f"{self.name}_sum{suffix} {total!r}")
+            lines.append(f"{self.name}_count{suffix} {count}")
+        return lines
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+request_duration = Histogram("buildingapi_request_duration_seconds", "Duration of HTTP requests.",
+                             ("method", "endpoint", "status"), LATENCY_BUCKETS)
+phase_duration = Histogram("buildingapi_phase_duration_seconds", "Duration of the phases of request handling.",
+                           ("phase",), LATENCY_BUCKETS)
+request_features = Histogram("buildingapi_request_features", "Number of features submitted per request.",
+                             ("endpoint",), COUNT_BUCKETS)
+request_splits = Histogram("buildingapi_request_splits", "Number of split building limits computed per request.",
+                           ("endpoint",), COUNT_BUCKETS)
+HISTOGRAMS = (request_duration, phase_duration, request_features, request_splits)
+
+
+class _Phase:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        current = _request.get()
+        if current is not None and "on_phase" in current:
+            current["on_phase"](self.name)
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        duration = time.perf_counter() - self.start
+        phase_duration.observe(duration, self.name)
+        current = _request.get()
+        if current is not None:
+            current["phases"][self.name] = current["phases"].get(self.name, 0.0) + duration
+
+
+class _NoPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NO_PHASE = _NoPhase()
+
+
+def phase(name):
+    """
+    Times a named phase of request handling, e.g. with phase("overlay"): ...
+
+    The duration is recorded in the phase histogram and, within a request, in its Server-Timing header.
+    Does nothing when metrics are disabled.
+
+    :param name: Phase name
+    :return: Context manager
+    """
+    if not METRICS_ENABLED:
+        return _NO_PHASE
+    return _Phase(name)
+
+
+def timed(name):
+    """
+    Decorates a function to time its calls as a named phase, see phase(). Functions are left undecorated
+    when metrics are disabled.
+
+    :param name: Phase name
+    :return: Decorator
+    """
+    def decorator(fn):
+        if not METRICS_ENABLED:
+            return fn
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Phase(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_counts(features=None, splits=None):
+    """
+    Records the number of features and splits handled by the current request, observed when it completes.
+
+    :param features: Number of submitted features
+    :param splits: Number of computed splits
+    :return: None
+    """
+    current = _request.get()
+    if current is None:
+        return
+    if features is not None:
+        current["features"] = current.get("features", 0) + features
+    if splits is not None:
+        current["splits"] = current.get("splits", 0) + splits
+
+
+@contextmanager
+def track_phases(on_phase=None):
+    """
+    Collects the phase durations and counts of work done outside of a request, e.g. in a background job,
+    as the middleware does for requests.
+
+    :param on_phase: Function called with the name of every phase as it starts, or None
+    :return: Context manager yielding the dictionary the 'phases' durations and counts are collected in
+    """
+    current = {"phases": {}}
+    if on_phase is not None:
+        current["on_phase"] = on_phase
+    token = _request.set(current)
+    try:
+        yield current
+    finally:
+        _request.reset(token)
+
+
+def merge_phases(collected):
+    """
+    Adds the phase durations and counts collected with track_phases in another process, e.g. a split worker,
+    to the phase histogram and to the current request.
+
+    :param collected: Dictionary of 'phases' durations and counts, as yielded by track_phases
+    :return: None
+    """
+    current = _request.get()
+    for name, duration in collected["phases"].items():
+        phase_duration.observe(duration, name)
+        if current is not None:
+            current["phases"][name] = current["phases"].get(name, 0.0) + duration
+    record_counts(collected.get("features"), collected.get("splits"))
+
+def render_metrics():
+    """
+    Renders every metric in the Prometheus text exposition format.
+
+    :return: Metrics text
+    """
+    return "\n".join(line for histogram in HISTOGRAMS for line in histogram.render()) + "\n"
+
+
+def server_timing(phases, total):
+    """
+    Builds a Server-Timing header value.
+
+    :param phases: Dictionary of phase durations in seconds
+    :param total: Total duration in seconds
+    :return: Header value
+    """
+    return ", ".join(f"{name};dur={duration * 1000:.2f}"
+                     for name, duration in list(phases.items()) + [("total", total)])
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording the duration, phases and counts of every HTTP request, and reporting
+    the phases that completed before the response started in a Server-Timing header.
+
+    :param app: ASGI application
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        current = {"phases": {}}
+        token = _request.set(current)
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                header = server_timing(current["phases"], time.perf_counter() - start)
+                message = {**message, "headers": list(message.get("headers", [])) +
+                           [(b"server-timing", header.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request.reset(token)
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "unmatched"
+            request_duration.observe(time.perf_counter() - start, scope["method"], endpoint, status[0])
+            if "features" in current:
+                request_features.observe(current["features"], endpoint)
+            if "splits" in current:
+                request_splits.observe(current["splits"], endpoint)
@@ -0,0 +1,138 @@
+# app/core/migrations.py
+import json
+import uuid
+
+import shapely
+from sqlalchemy import inspect, text, LargeBinary
+
+from app.models import Base
+from app.tools import geometry_columns
+
+GEOMETRY_TABLES = ('building_limits', 'height_plateaus', 'split_building_limits')
+
+
+def migrate_geometry_to_wkb(engine):
+    """
+    Migrates tables that store geometries as GeoJSON to WKB geometries with bounding box columns.
+
+    Each table is altered in place: the new columns are added, filled from the GeoJSON column,
+    which is then dropped and replaced by the WKB column. Tables that are already migrated are skipped.
+
+    :param engine: SQLAlchemy engine of the database to migrate
+    :return: List of migrated table names
+    """
+    binary_type = LargeBinary().compile(dialect=engine.dialect)
+    migrated = []
+
+    for table in GEOMETRY_TABLES:
+        inspector = inspect(engine)
+        if not inspector.has_table(table):
+            continue
+        if 'minx' in {column['name'] for column in inspector.get_columns(table)}:
+            continue
+
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN geometry_wkb {binary_type}"))
+            for column in ('minx', 'miny', 'maxx', 'maxy'):
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} FLOAT"))
+
+            rows = conn.execute(text(f"SELECT id, geometry FROM {table}")).all()
+            if rows:
+                geometries = shapely.from_geojson([
+                    geometry if isinstance(geometry, str) else json.dumps(geometry) for _, geometry in rows
+                ])
+                conn.execute(
+                    text(f"UPDATE {table} SET geometry_wkb = :geometry, "
+                         f"minx = :minx, miny = :miny, maxx = :maxx, maxy = :maxy WHERE id = :id"),
+                    [{"id": row_id, **columns} for (row_id, _), columns in zip(rows, geometry_columns(geometries))]
+                )
+
+            conn.execute(text(f"ALTER TABLE {table} DROP COLUMN geometry"))
+            conn.execute(text(f"ALTER TABLE {table} RENAME COLUMN geometry_wkb TO geometry"))
+            conn.execute(text(f"CREATE INDEX ix_{table}_bbox ON {table} (project_id, minx, maxx, miny, maxy)"))
+        migrated.append(table)
+
+    # Create any missing tables with the current schema
+    Base.metadata.create_all(bind=engine)
+    return migrated
+
+
+def backfill_projects(engine):
+    """
+    Creates the missing project rows of projects that only have building limits, height plateaus or splits,
+    as stored by versions without a projects table.
+
+    :param engine: SQLAlchemy engine of the database to migrate
+    :return: Number of created projects
+    """
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        return conn.execute(text(
+            "INSERT INTO projects (id, version, building_limit_count, height_plateau_count, split_count) "
+            "SELECT ids.project_id, 1, "
+            "(SELECT COUNT(*) FROM building_limits WHERE project_id = ids.project_id), "
+            "(SELECT COUNT(*) FROM height_plateaus WHERE project_id = ids.project_id), "
+            "(SELECT COUNT(*) FROM split_building_limits WHERE project_id = ids.project_id) "
+            "FROM (SELECT project_id FROM building_limits UNION SELECT project_id FROM height_plateaus) ids "
+            "WHERE ids.project_id NOT IN (SELECT id FROM projects)"
+        )).rowcount
+
+
+def add_job_heartbeats(engine):
+    """
+    Adds the heartbeat column to a jobs table created by versions without it.
+
+    :param engine: SQLAlchemy engine of the database to migrate
+    :return: Whether the column was added
+    """
+    inspector = inspect(engine)
+    if not inspector.has_table('jobs'):
+        return False
+    if 'heartbeat_at' in {column['name'] for column in inspector.get_columns('jobs')}:
+        return False
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE jobs ADD COLUMN heartbeat_at FLOAT"))
+    return True
+
+
+def add_project_generations(engine):
+    """
+    Adds the generation column to a projects table created by versions without it, and gives a generation to
+    the projects without one, such as those created by backfill_projects.
+
+    :param engine: SQLAlchemy engine of the database to migrate
+    :return: Number of projects given a generation
+    """
+    if 'generation' not in {column['name'] for column in inspect(engine).get_columns('projects')}:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE projects ADD COLUMN generation VARCHAR(32)"))
+    with engine.begin() as conn:
+        project_ids = conn.execute(text("SELECT id FROM projects WHERE generation IS NULL")).scalars().all()
+        if project_ids:
+            conn.execute(text("UPDATE projects SET generation = :generation WHERE id = :id"),
+                         [{"id": project_id, "generation": uuid.uuid4().hex} for project_id in project_ids])
+    return len(project_ids)
+
+
+def init_database(engine):
+    """
+    Creates the schema and applies the migrations. Runs once at application startup, so that request
+    handling never has to check the schema.
+
+    :param engine: SQLAlchemy engine of the database
+    :return: Tuple of the migrated table names and the number of created projects
+    """
+    migrated = migrate_geometry_to_wkb(engine)
+    add_job_heartbeats(engine)
+    created = backfill_projects(engine)
+    add_project_generations(engine)
+    return migrated, created
+
+
+if __name__ == "__main__":
+    from app.core.config import engine
+
+    migrated, created = init_database(engine)
+    for table in migrated:
+        print(f"Migrated {table} to WKB geometries")
+    print(f"Created {created} missing projects")
@@ -0,0 +1,117 @@
+# app/core/split_cache.py
+import json
+import sqlite3
+from collections import OrderedDict
+from threading import Lock
+
+import numpy as np
+import shapely
+
+from app.core.config import SPLIT_CACHE_ENTRIES, SPLIT_CACHE_PATH
+from app.tools import Splits
+
+
+class SplitCache:
+    """
+    Content-addressed cache of split computations, shared by all projects.
+
+    Entries are keyed by split_cache_key, so the same building limits and height plateaus hit the cache
+    whatever their order or project. The lineage of the cached splits is stored against the canonical
+    feature order of the key and mapped back to the order of the caller on every hit. Entries are kept
+    in an in-process LRU and, if a path is given, in a SQLite database that survives restarts and is
+    shared by the workers of a deployment.
+
+    :param max_entries: Maximum number of entries kept in memory
+    :param path: Path of the SQLite database of the on-disk tier, or None to keep entries in memory only
+    """
+
+    def __init__(self, max_entries=SPLIT_CACHE_ENTRIES, path=SPLIT_CACHE_PATH):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS split_cache (key TEXT PRIMARY KEY, geometries BLOB, "
+                             "building_limit_index TEXT, height_plateau_index TEXT)")
+            self._db.commit()
+
+    def _load(self, key):
+        if self._db is None:
+            return None
+        row = self._db.execute("SELECT geometries, building_limit_index, height_plateau_index FROM split_cache "
+                               "WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return (shapely.get_parts(shapely.from_wkb(row[0])),
+                np.array(json.loads(row[1]), dtype=np.int64), np.array(json.loads(row[2]), dtype=np.int64))
+
+    def _store(self, key, entry):
+        if self._db is not None:
+            geometries, limit_index, plateau_index = entry
+            self._db.execute("INSERT OR REPLACE INTO split_cache VALUES (?, ?, ?, ?)",
+                             (key, shapely.to_wkb(shapely.geometrycollections(geometries)),
+                              json.dumps(limit_index.tolist()), json.dumps(plateau_index.tolist())))
+            self._db.commit()
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key, limit_order, plateau_order):
+        """
+        Returns the cached splits of a computation, or None on a miss.
+
+        :param key: Digest, as returned by split_cache_key
+        :param limit_order: Positions of the building limits in canonical order, as returned by split_cache_key
+        :param plateau_order: Positions of the height plateaus in canonical order, as returned by split_cache_key
+        :return: Splits, as returned by split_geometries, or None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            else:
+                entry = self._load(key)
+                if entry is not None:
+                    self._store(key, entry)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        geometries, limit_index, plateau_index = entry
+        return Splits(geometries, limit_order[limit_index], plateau_order[plateau_index])
+
+    def put(self, key, limit_order, plateau_order, split_gdf):
+        """
+        Caches the splits of a computation.
+
+        :param key: Digest, as returned by split_cache_key
+        :param limit_order: Positions of the building limits in canonical order, as returned by split_cache_key
+        :param plateau_order: Positions of the height plateaus in canonical order, as returned by split_cache_key
+        :param split_gdf: Splits, as returned by split_geometries, or GeoDataFrame of splits as returned by split_features
+        :return: None
+        """
+        # Map the lineage from the positions of the caller to canonical positions
+        limit_rank = np.argsort(limit_order)
+        plateau_rank = np.argsort(plateau_order)
+        entry = (np.asarray(split_gdf.geometry),
+                 limit_rank[np.asarray(split_gdf.building_limit_index)],
+                 plateau_rank[np.asarray(split_gdf.height_plateau_index)])
+        with self._lock:
+            self._store(key, entry)
+
+    def stats(self):
+        """
+        Returns the hit and miss counters of the cache.
+
+        :return: Dictionary of counters and the number of entries in memory
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+split_cache = SplitCache()
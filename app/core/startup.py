@@ -0,0 +1,47 @@
+# app/core/startup.py
+from contextlib import asynccontextmanager
+
+import shapely
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.config import WARMUP, engine
+from app.core.executor import split_executor
+from app.core.jobs import job_runner
+from app.core.migrations import init_database
+
+
+def warmup():
+    """
+    Runs the hot paths of request handling once on a small project, so that their modules are loaded and the
+    split workers are started before the first request.
+
+    :return: Number of splits computed, which is 2
+    """
+    from app.api.compression import compress
+    from app.api.responses import dumps
+    from app.tools import Features, geometry_columns, split_geometries
+
+    limits = Features([shapely.box(0, 0, 2, 1)])
+    plateaus = Features([shapely.box(0, 0, 1, 1), shapely.box(1, 0, 2, 1)])
+    splits = split_executor.run(split_geometries, limits, plateaus)
+    geometry_columns(splits.geometry)
+    compress(dumps({"geometries": shapely.to_geojson(splits.geometry).tolist()}), "gzip")
+    return len(splits)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """
+    Prepares the database, resumes the pending background jobs, and optionally warms up, before the application
+    serves requests, and waits for the running jobs and stops the split workers on shutdown.
+
+    :param app: FastAPI application
+    :return: Async context manager
+    """
+    await run_in_threadpool(init_database, engine)
+    await run_in_threadpool(job_runner.resume)
+    if WARMUP:
+        await run_in_threadpool(warmup)
+    yield
+    await run_in_threadpool(job_runner.shutdown)
+    split_executor.shutdown()
@@ -0,0 +1,115 @@
+# app/core/tile_cache.py
+import sqlite3
+from collections import OrderedDict
+from threading import Lock
+
+from app.core.config import TILE_CACHE_ENTRIES, TILE_CACHE_PATH
+
+
+class TileCache:
+    """
+    Cache of encoded vector tiles, keyed by project ID, project revision and tile coordinates.
+
+    Tiles are kept in an in-process LRU and, if a path is given, in a SQLite database that survives restarts
+    and is shared by the workers of a deployment. Writes to a project change its revision, so tiles of older
+    revisions are never served, and invalidate() drops them from both tiers.
+
+    :param max_entries: Maximum number of tiles kept in memory
+    :param path: Path of the SQLite database of the on-disk tier, or None to keep tiles in memory only
+    """
+
+    def __init__(self, max_entries=TILE_CACHE_ENTRIES, path=TILE_CACHE_PATH):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            # Caches written before tiles were keyed by revision are dropped, they cannot be told apart by project
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(tile_cache)")]
+            if columns and "revision" not in columns:
+                self._db.execute("DROP TABLE tile_cache")
+            self._db.execute("CREATE TABLE IF NOT EXISTS tile_cache (project_id INTEGER, revision TEXT, "
+                             "z INTEGER, x INTEGER, y INTEGER, body BLOB, PRIMARY KEY (project_id, revision, z, x, y))")
+            self._db.commit()
+
+    def _remember(self, key, body):
+        self._entries[key] = body
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, project_id, revision, z, x, y):
+        """
+        Returns a cached tile, or None on a miss.
+
+        :param project_id: Unique project identifier
+        :param revision: Stored project revision, as returned by project_revision
+        :param z: Zoom level
+        :param x: Tile column
+        :param y: Tile row
+        :return: Encoded tile bytes, possibly empty, or None
+        """
+        key = (project_id, revision, z, x, y)
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            elif self._db is not None:
+                row = self._db.execute("SELECT body FROM tile_cache WHERE project_id = ? AND revision = ? AND z = ? "
+                                       "AND x = ? AND y = ?", key).fetchone()
+                if row is not None:
+                    body = bytes(row[0])
+                    self._remember(key, body)
+            if body is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return body
+
+    def put(self, project_id, revision, z, x, y, body):
+        """
+        Caches a tile.
+
+        :param project_id: Unique project identifier
+        :param revision: Stored project revision the tile was built from
+        :param z: Zoom level
+        :param x: Tile column
+        :param y: Tile row
+        :param body: Encoded tile bytes
+        :return: None
+        """
+        key = (project_id, revision, z, x, y)
+        with self._lock:
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO tile_cache VALUES (?, ?, ?, ?, ?, ?)", (*key, body))
+                self._db.commit()
+            self._remember(key, body)
+
+    def invalidate(self, project_id):
+        """
+        Drops the cached tiles of a project, to be called after every write to it.
+
+        :param project_id: Unique project identifier
+        :return: None
+        """
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == project_id]:
+                del self._entries[key]
+            if self._db is not None:
+                self._db.execute("DELETE FROM tile_cache WHERE project_id = ?", (project_id,))
+                self._db.commit()
+
+    def stats(self):
+        """
+        Returns the hit and miss counters of the cache.
+
+        :return: Dictionary of counters and the number of tiles in memory
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+tile_cache = TileCache()
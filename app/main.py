@@ -2,11 +2,25 @@
 import uvicorn
 from fastapi import FastAPI
 from app.api.endpoints import router
+from app.core.metrics import MetricsMiddleware
+from app.core.startup import lifespan
 
-app = FastAPI()
 
-# Include API routes
-app.include_router(router)
+def create_app():
+    """
+    Builds the application, with its lifespan, middleware and API routes.
+
+    :return: FastAPI application
+    """
+    application = FastAPI(lifespan=lifespan)
+    application.add_middleware(MetricsMiddleware)
+
+    # Include API routes
+    application.include_router(router)
+    return application
+
+
+app = create_app()
 
 if __name__ == "__main__":
     uvicorn.run('main:app', host='localhost', port=8000, reload=True)
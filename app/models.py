@@ -1,20 +1,37 @@
 # app/models.py
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, UniqueConstraint
+import uuid
+
+from sqlalchemy import Column, Integer, String, Float, LargeBinary, ForeignKey, UniqueConstraint, Index, Text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.dialects.postgresql import JSON
 from sqlalchemy.orm import relationship
 
 Base = declarative_base()
 
+class Project(Base):
+    __tablename__ = 'projects'
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    version = Column(Integer, nullable=False, default=1)  # Incremented by every write to the project
+    # Random token of this incarnation of the project, which changes when a deleted project ID is created again
+    generation = Column(String(32), nullable=True, default=lambda: uuid.uuid4().hex)
+    building_limit_count = Column(Integer, nullable=False, default=0)
+    height_plateau_count = Column(Integer, nullable=False, default=0)
+    split_count = Column(Integer, nullable=False, default=0)
+
 class BuildingLimit(Base):
     __tablename__ = 'building_limits'
     id = Column(Integer, primary_key=True, autoincrement=True)
     version = Column(Integer, nullable=False, default=1)
     project_id = Column(Integer, nullable=False)  # Project ID to associate data with a specific project
-    geometry = Column(JSON, nullable=False)
+    geometry = Column(LargeBinary, nullable=False)  # WKB
+    # Bounding box of the geometry, for spatial filtering
+    minx = Column(Float, nullable=False)
+    miny = Column(Float, nullable=False)
+    maxx = Column(Float, nullable=False)
+    maxy = Column(Float, nullable=False)
     name = Column(String, nullable=True, default=f'limit-0')
 
-    __table_args__ = (UniqueConstraint('project_id', 'id', name='_building_limit_uc'),)
+    __table_args__ = (UniqueConstraint('project_id', 'id', name='_building_limit_uc'),
+                      Index('ix_building_limits_bbox', 'project_id', 'minx', 'maxx', 'miny', 'maxy'))
 
 class HeightPlateau(Base):
     __tablename__ = 'height_plateaus'
@@ -22,10 +39,15 @@ class HeightPlateau(Base):
     version = Column(Integer, nullable=False, default=1)
     project_id = Column(Integer, nullable=False)
     elevation = Column(Float, nullable=False)
-    geometry = Column(JSON, nullable=False)
+    geometry = Column(LargeBinary, nullable=False)
+    minx = Column(Float, nullable=False)
+    miny = Column(Float, nullable=False)
+    maxx = Column(Float, nullable=False)
+    maxy = Column(Float, nullable=False)
     name = Column(String, nullable=True, default=f'plat-0')
 
-    __table_args__ = (UniqueConstraint('project_id', 'id', name='_height_plateau_uc'),)
+    __table_args__ = (UniqueConstraint('project_id', 'id', name='_height_plateau_uc'),
+                      Index('ix_height_plateaus_bbox', 'project_id', 'minx', 'maxx', 'miny', 'maxy'))
 
 class SplitBuildingLimit(Base):
     __tablename__ = 'split_building_limits'
@@ -33,11 +55,34 @@ class SplitBuildingLimit(Base):
     version = Column(Integer, nullable=False, default=1)
     project_id = Column(Integer, nullable=False)
     elevation = Column(Float, nullable=False)
-    geometry = Column(JSON, nullable=False)
+    geometry = Column(LargeBinary, nullable=False)
+    minx = Column(Float, nullable=False)
+    miny = Column(Float, nullable=False)
+    maxx = Column(Float, nullable=False)
+    maxy = Column(Float, nullable=False)
     building_limit_id = Column(Integer, ForeignKey('building_limits.id'), nullable=False)
     height_plateau_id = Column(Integer, ForeignKey('height_plateaus.id'), nullable=False)
 
     building_limit = relationship('BuildingLimit')
     height_plateau = relationship('HeightPlateau')
 
-    __table_args__ = (UniqueConstraint('project_id', 'id', name='_split_building_limit_uc'),)
+    __table_args__ = (UniqueConstraint('project_id', 'id', name='_split_building_limit_uc'),
+                      Index('ix_split_building_limits_bbox', 'project_id', 'minx', 'maxx', 'miny', 'maxy'))
+
+class Job(Base):
+    __tablename__ = 'jobs'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    kind = Column(String, nullable=False)  # 'create' or 'update'
+    project_id = Column(Integer, nullable=False)
+    status = Column(String, nullable=False, default='queued')  # 'queued', 'running', 'succeeded' or 'failed'
+    payload = Column(Text, nullable=False)  # JSON of the submitted data
+    phases = Column(Text, nullable=True)  # JSON of the phase durations in seconds, once finished
+    status_code = Column(Integer, nullable=True)  # HTTP status of the synchronous equivalent, once finished
+    result = Column(Text, nullable=True)  # JSON response body of the synchronous equivalent, once finished
+    # Unix timestamps
+    created_at = Column(Float, nullable=False)
+    started_at = Column(Float, nullable=True)
+    finished_at = Column(Float, nullable=True)
+    heartbeat_at = Column(Float, nullable=True)  # Refreshed while the job runs, to tell interrupted jobs apart
+
+    __table_args__ = (Index('ix_jobs_status', 'status'),)
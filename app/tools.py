@@ -1,34 +1,257 @@
 # app/tools.py
-import geopandas as gpd
-from shapely.geometry import shape, mapping
-from shapely.geometry.base import BaseGeometry
+import hashlib
+import json
 
-from app.models import SplitBuildingLimit
+import numpy as np
+import shapely
+from shapely import STRtree
+from shapely.errors import GEOSException
+from shapely.geometry import mapping
+from sqlalchemy import insert, update
+
+from app.core.metrics import phase, timed
+from app.models import BuildingLimit, HeightPlateau, Project, SplitBuildingLimit
+
+# Minimal buffer allowed when checking that height plateaus cover building limits
+COVERAGE_TOLERANCE = 1e-6
+
+# Geometry types kept as splits, other intersections (shared edges or vertices) are dropped
+POLYGONAL_TYPES = (shapely.GeometryType.POLYGON, shapely.GeometryType.MULTIPOLYGON)
+
+
+class Features:
+    """
+    Geometries of features with their labels, the shapely/NumPy counterpart of a GeoDataFrame used by the
+    split path. Like a GeoDataFrame it has 'geometry' and 'index' attributes, so the split functions accept
+    either.
+
+    :param geometry: NumPy array of shapely geometries
+    :param index: List of feature labels, positionally matching the geometries
+    """
+    __slots__ = ("geometry", "index")
+
+    def __init__(self, geometry, index=None):
+        self.geometry = np.asarray(geometry, dtype=object)
+        self.index = list(range(len(self.geometry))) if index is None else list(index)
+
+    def __len__(self):
+        return len(self.geometry)
+
+
+class Splits:
+    """
+    Split building limits with their lineage, as computed by split_geometries.
+
+    :param geometry: NumPy array of the split geometries
+    :param building_limit_index: Positions of the source building limit of each split
+    :param height_plateau_index: Positions of the source height plateau of each split
+    """
+    __slots__ = ("geometry", "building_limit_index", "height_plateau_index")
+
+    def __init__(self, geometry, building_limit_index, height_plateau_index):
+        self.geometry = np.asarray(geometry, dtype=object)
+        self.building_limit_index = np.asarray(building_limit_index, dtype=np.int64)
+        self.height_plateau_index = np.asarray(height_plateau_index, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.geometry)
+
+
+class CoverageError(ValueError):
+    """
+    Raised when height plateaus leave parts of the building limits uncovered.
+
+    :param message: Error message
+    :param gaps: GeoJSON FeatureCollection of the uncovered areas, one feature per affected building limit
+    """
+
+    def __init__(self, message, gaps):
+        super().__init__(message)
+        self.gaps = gaps
+
+    def __reduce__(self):
+        # Keep the gaps when the error is sent back from a worker process
+        return type(self), (str(self), self.gaps)
+
+
+class VersionConflict(Exception):
+    """Raised when a submitted feature was modified since its caller last read it."""
+
+
+def find_overlapping_plateaus(height_plateaus_gdf):
+    """
+    Finds pairs of height plateaus whose interiors overlap.
+
+    Candidate pairs are found by bounding box through an STRtree, and only those are tested for a true
+    interior intersection, so plateaus that merely share an edge or a vertex are not reported.
+
+    :param height_plateaus_gdf: Features or GeoDataFrame of height plateaus
+    :return: List of (id, id) tuples of overlapping plateaus, labelled by their index
+    """
+    geometries = np.asarray(height_plateaus_gdf.geometry)
+    tree = STRtree(geometries)
+    left, right = tree.query(geometries, predicate='intersects')
+
+    # Each pair is reported by the tree in both directions, and every plateau intersects itself
+    candidates = left < right
+    left, right = left[candidates], right[candidates]
+    interiors_overlap = shapely.relate_pattern(geometries[left], geometries[right], 'T********')
+
+    labels = height_plateaus_gdf.index
+    return [(labels[i], labels[j]) for i, j in zip(left[interiors_overlap], right[interiors_overlap])]
+
+
+def geometry_columns(geometries):
+    """
+    Encodes geometries into the stored WKB and bounding box column values.
+
+    :param geometries: Sequence of shapely geometries
+    :return: List of dictionaries with 'geometry', 'minx', 'miny', 'maxx' and 'maxy' values
+    """
+    wkbs = shapely.to_wkb(geometries)
+    bounds = shapely.bounds(geometries).tolist()
+    return [{"geometry": wkb, "minx": minx, "miny": miny, "maxx": maxx, "maxy": maxy}
+            for wkb, (minx, miny, maxx, maxy) in zip(wkbs, bounds)]
+
+
+def geometries_from_wkb(rows):
+    """
+    Decodes the stored WKB geometries of rows into a shapely geometry array.
+
+    :param rows: List of stored BuildingLimit, HeightPlateau or SplitBuildingLimit objects
+    :return: NumPy array of shapely geometries
+    """
+    return shapely.from_wkb([row.geometry for row in rows])
+
+
+def geometries_to_geojson(rows):
+    """
+    Encodes the stored WKB geometries of rows as GeoJSON text, ready to be embedded in a response.
+
+    :param rows: List of stored BuildingLimit, HeightPlateau or SplitBuildingLimit objects
+    :return: List of UTF-8 encoded GeoJSON geometries
+    """
+    return [geometry.encode() for geometry in shapely.to_geojson(geometries_from_wkb(rows))]
+
+
+def stored_features(rows):
+    """
+    Builds the Features of stored rows, labelled by their IDs.
+
+    :param rows: List of stored BuildingLimit or HeightPlateau objects
+    :return: Features of the stored rows
+    """
+    return Features(geometries_from_wkb(rows), [row.id for row in rows])
+
+
+def find_bbox_neighbours(geometries, targets):
+    """
+    Finds the geometries whose bounding box intersects the bounding box of any of the targets.
+
+    :param geometries: Sequence of shapely geometries to search
+    :param targets: Sequence of shapely geometries to search around
+    :return: Sorted list of positions in geometries
+    """
+    if len(geometries) == 0 or len(targets) == 0:
+        return []
+    _, positions = STRtree(geometries).query(targets)
+    return np.unique(positions).tolist()
+
+
+def query_bbox_neighbours(db, model, project_id, geometries):
+    """
+    Loads the features of a project whose bounding box intersects the bounding box of any of the geometries.
+
+    Candidates are filtered in the database by the stored bounding box columns against the overall
+    envelope of the geometries, and refined against each geometry with an STRtree.
+
+    :param db: Database session
+    :param model: Mapped model class with bounding box columns
+    :param project_id: Project ID to search in
+    :param geometries: Sequence of shapely geometries to search around
+    :return: List of stored objects, ordered by ID
+    """
+    if len(geometries) == 0:
+        return []
+    minx, miny, maxx, maxy = shapely.total_bounds(geometries)
+    candidates = db.query(model).filter(
+        model.project_id == project_id,
+        model.minx <= maxx, model.maxx >= minx,
+        model.miny <= maxy, model.maxy >= miny
+    ).order_by(model.id).populate_existing().all()
+
+    boxes = shapely.box([row.minx for row in candidates], [row.miny for row in candidates],
+                        [row.maxx for row in candidates], [row.maxy for row in candidates])
+    return [candidates[i] for i in find_bbox_neighbours(boxes, geometries)]
+
+
+@timed("overlap_check")
+def validate_plateaus(height_plateaus_gdf):
+    """
+    Validates that height plateaus do not overlap. Their geometries are expected to be valid, as checked
+    when they are parsed or split.
+
+    :param height_plateaus_gdf: Features or GeoDataFrame of height plateaus
+    :return: None if valid, raises ValueError if invalid
+    """
+    overlaps = find_overlapping_plateaus(height_plateaus_gdf)
+    if overlaps:
+        pairs = ", ".join(f"{a} and {b}" for a, b in overlaps)
+        raise ValueError(f"Height plateaus overlap, which is not allowed. Overlapping plateaus: {pairs}.")
 
 
 def validate_coverage(building_limits_gdf, height_plateaus_gdf):
     """
     Validates that height plateaus completely cover building limits.
 
-    :param building_limits_gdf: GeoDataFrame of building limits
-    :param height_plateaus_gdf: GeoDataFrame of height plateaus
+    :param building_limits_gdf: Features or GeoDataFrame of building limits
+    :param height_plateaus_gdf: Features or GeoDataFrame of height plateaus
     :return: None if valid, raises ValueError if invalid
     """
     # Check if any height plateaus overlap
-    if not height_plateaus_gdf.geometry.is_valid.all():
-        raise ValueError("Some height plateau geometries are invalid.")
-
-    overlaps = height_plateaus_gdf.overlay(height_plateaus_gdf, how='intersection')
-    if len(overlaps) > len(height_plateaus_gdf):
-        raise ValueError("Height plateaus overlap, which is not allowed.")
+    validate_plateaus(height_plateaus_gdf)
 
     # Check if height plateaus completely cover building limits
-    combined_plateaus = height_plateaus_gdf.unary_union
-    for _, row in building_limits_gdf.iterrows():
-        limit_geom = row.geometry
-        # Allow minimal buffer
-        if not combined_plateaus.buffer(1e-6).contains(limit_geom):
-            raise ValueError("Height plateaus do not completely cover the building limits.")
+    gaps = find_coverage_gaps(building_limits_gdf, height_plateaus_gdf)
+    if gaps:
+        raise CoverageError("Height plateaus do not completely cover the building limits.", {
+            "type": "FeatureCollection",
+            "features": [
+                {"type": "Feature", "geometry": mapping(gap), "properties": {"building_limit": label}}
+                for label, gap in gaps
+            ]
+        })
+
+
+@timed("coverage_check")
+def find_coverage_gaps(building_limits_gdf, height_plateaus_gdf, tolerance=COVERAGE_TOLERANCE):
+    """
+    Finds the parts of the building limits that are not covered by the height plateaus.
+
+    Plateaus are expected to be already checked for overlaps, so they are merged with a coverage union. It
+    only dissolves edges that are noded identically: with a plateau edge partly shared with several
+    neighbours, it fails or, with recent GEOS versions, leaves the edge in place and returns an invalid
+    MultiPolygon without an error. Such unions are redone with a full union.
+
+    :param building_limits_gdf: Features or GeoDataFrame of building limits
+    :param height_plateaus_gdf: Features or GeoDataFrame of non-overlapping height plateaus
+    :param tolerance: Minimal buffer around the plateaus that still counts as covered
+    :return: List of (id, gap geometry) tuples of uncovered building limits, labelled by their index
+    """
+    plateaus = np.asarray(height_plateaus_gdf.geometry)
+    try:
+        combined_plateaus = shapely.coverage_union_all(plateaus)
+    except GEOSException:
+        combined_plateaus = None
+    if combined_plateaus is None or not combined_plateaus.is_valid:
+        combined_plateaus = shapely.union_all(plateaus)
+
+    limits = np.asarray(building_limits_gdf.geometry)
+    uncovered = ~shapely.covers(combined_plateaus.buffer(tolerance), limits)
+    gaps = shapely.difference(limits[uncovered], combined_plateaus)
+
+    labels = building_limits_gdf.index
+    return [(labels[i], gap) for i, gap in zip(np.flatnonzero(uncovered), gaps)]
 
 
 def split_limits(building_limits_geojson, height_plateaus_geojson):
@@ -37,111 +260,410 @@ def split_limits(building_limits_geojson, height_plateaus_geojson):
 
     :param building_limits_geojson: GeoJSON data for building limits
     :param height_plateaus_geojson: GeoJSON data for height plateaus
-    :return: Tuple containing split limits, building limits, and height plateaus GeoDataFrames
+    :return: Tuple containing split limits, building limits, and height plateaus GeoDataFrames.
+     Each split row carries the positional index of its source building limit and height plateau
+     in the 'building_limit_index' and 'height_plateau_index' columns.
     """
     building_limits_gdf = validate_geojson(building_limits_geojson)
     height_plateaus_gdf = validate_geojson(height_plateaus_geojson)
 
-    # Ensure building limits and height plateaus have valid geometries
-    if not building_limits_gdf.is_valid.all() or not height_plateaus_gdf.is_valid.all():
-        raise ValueError("Invalid geometries in input data")
+    return split_features(building_limits_gdf, height_plateaus_gdf)
+
+
+def split_features(building_limits_gdf, height_plateaus_gdf):
+    """
+    Splits building limits according to height plateaus, for features that are already loaded.
+
+    :param building_limits_gdf: GeoDataFrame of building limits
+    :param height_plateaus_gdf: GeoDataFrame of height plateaus
+    :return: Tuple containing split limits, building limits, and height plateaus GeoDataFrames, as in split_limits.
+     The split limits also carry the properties of their sources, suffixed with _1 and _2 where both have them.
+    """
+    import geopandas as gpd
+
+    splits = split_geometries(building_limits_gdf, height_plateaus_gdf)
+    limit_columns = building_limits_gdf.drop(columns=building_limits_gdf.geometry.name) \
+        .iloc[splits.building_limit_index].reset_index(drop=True)
+    plateau_columns = height_plateaus_gdf.drop(columns=height_plateaus_gdf.geometry.name) \
+        .iloc[splits.height_plateau_index].reset_index(drop=True)
+    columns = limit_columns.join(plateau_columns, lsuffix="_1", rsuffix="_2")
+    split_gdf = gpd.GeoDataFrame(columns.assign(building_limit_index=splits.building_limit_index,
+                                                height_plateau_index=splits.height_plateau_index),
+                                 geometry=splits.geometry, crs=building_limits_gdf.crs)
+
+    return split_gdf, building_limits_gdf, height_plateaus_gdf
+
+
+def split_geometries(building_limits, height_plateaus):
+    """
+    Splits building limits according to height plateaus with shapely alone.
+
+    :param building_limits: Features or GeoDataFrame of building limits
+    :param height_plateaus: Features or GeoDataFrame of height plateaus
+    :return: Splits, ordered by building limit and then height plateau
+    """
+    limits = np.asarray(building_limits.geometry)
+    plateaus = np.asarray(height_plateaus.geometry)
+
+    # Ensure building limits and height plateaus have valid geometries, checked once for both
+    for name, features, geometries in (("building limit", building_limits, limits),
+                                       ("height plateau", height_plateaus, plateaus)):
+        invalid = find_invalid_geometry(geometries)
+        if invalid is not None:
+            raise ValueError(f"Invalid geometries in input data: {name} {features.index[invalid[0]]} is invalid, "
+                             f"{invalid[1]}")
 
     # Validate that height plateaus cover building limits and do not overlap
-    validate_coverage(building_limits_gdf, height_plateaus_gdf)
+    validate_coverage(building_limits, height_plateaus)
 
     # Perform intersection to split building limits by height plateaus
-    splits = gpd.overlay(building_limits_gdf, height_plateaus_gdf, how='intersection')
+    with phase("overlay"):
+        return intersect_polygons(limits, plateaus)
+
+
+def intersect_polygons(left, right):
+    """
+    Intersects every pair of polygons of two arrays whose interiors meet, keeping the positions of the
+    pair, like an intersection overlay that only keeps polygonal results.
+
+    :param left: NumPy array of shapely polygons
+    :param right: NumPy array of shapely polygons
+    :return: Splits of the polygonal intersections, labelled by their positions in left and right
+    """
+    if len(left) == 0 or len(right) == 0:
+        return Splits([], [], [])
+    left_index, right_index = STRtree(right).query(left, predicate='intersects')
+    order = np.lexsort((right_index, left_index))
+    left_index, right_index = left_index[order], right_index[order]
+    pieces = shapely.intersection(left[left_index], right[right_index])
 
-    return splits, building_limits_gdf, height_plateaus_gdf
+    # Pairs that meet along an edge as well as an area give collections, reduced to their polygonal parts
+    collections = np.flatnonzero(shapely.get_type_id(pieces) == shapely.GeometryType.GEOMETRYCOLLECTION)
+    for i in collections:
+        parts = shapely.get_parts(pieces[i])
+        pieces[i] = shapely.union_all(parts[np.isin(shapely.get_type_id(parts), POLYGONAL_TYPES)])
 
+    polygonal = np.isin(shapely.get_type_id(pieces), POLYGONAL_TYPES) & ~shapely.is_empty(pieces)
+    return Splits(pieces[polygonal], left_index[polygonal], right_index[polygonal])
 
-def store_processed_splits(db, split_gdf, project_id, stored_limits, stored_plateaus):
+
+def split_cache_key(building_limits_gdf, height_plateaus_gdf, grid_size):
+    """
+    Computes the content address of a split computation, independent of the order of the features.
+
+    Geometries are snapped to a precision grid and normalized, and the WKB of each side is sorted, so
+    inputs that only differ in feature order or below the grid size share the same key.
+
+    :param building_limits_gdf: Features or GeoDataFrame of building limits
+    :param height_plateaus_gdf: Features or GeoDataFrame of height plateaus
+    :param grid_size: Size of the precision grid
+    :return: Tuple of the hex digest, and the positions of the building limits and height plateaus in
+     canonical (sorted) order
+    """
+    digest = hashlib.sha256()
+    orders = []
+    for gdf in (building_limits_gdf, height_plateaus_gdf):
+        wkbs = shapely.to_wkb(shapely.normalize(shapely.set_precision(np.asarray(gdf.geometry), grid_size)))
+        order = np.array(sorted(range(len(wkbs)), key=wkbs.__getitem__), dtype=np.int64)
+        digest.update(len(wkbs).to_bytes(8, 'little'))
+        for wkb in wkbs[order]:
+            digest.update(len(wkb).to_bytes(8, 'little'))
+            digest.update(wkb)
+        orders.append(order)
+    return digest.hexdigest(), orders[0], orders[1]
+
+
+def split_record(line):
+    """
+    Parses a bulk import record and splits its building limits according to its height plateaus.
+
+    Errors are returned rather than raised, so that a bad record does not fail the rest of its batch.
+
+    :param line: JSON text of a {project_id, building_limits, height_plateaus} record
+    :return: Tuple of the project ID (None if unknown), the project tuple as expected by store_new_projects
+     (None if the record failed) and the error message (None if the record succeeded)
+    """
+    project_id = None
+    try:
+        record = json.loads(line)
+        # JSON true and false are ints to Python, and would be stored as projects 1 and 0
+        if type(record['project_id']) is not int:
+            raise ValueError("The project_id must be an integer.")
+        project_id = record['project_id']
+
+        building_limits = features_from_geojson(record['building_limits'])
+        height_plateaus = features_from_geojson(record['height_plateaus'])
+        splits = split_geometries(building_limits, height_plateaus)
+        plateau_elevations = [feature['properties']['elevation'] for feature in record['height_plateaus']['features']]
+        return project_id, (project_id, splits, building_limits, height_plateaus, plateau_elevations), None
+    except KeyError as e:
+        return project_id, None, f"Missing key in record: {e}"
+    except Exception as e:
+        return project_id, None, str(e)
+
+
+@timed("db_insert")
+def insert_returning_ids(db, model, rows):
+    """
+    Inserts rows for a model in bulk and returns their generated IDs in the order of the rows.
+
+    Uses a multi-row INSERT ... RETURNING where the dialect can guarantee the order of the returned IDs,
+    and falls back to one INSERT per row otherwise. Nothing is committed.
+
+    :param db: Database session
+    :param model: Mapped model class with an 'id' primary key
+    :param rows: List of column value dictionaries
+    :return: List of generated IDs, positionally matching rows
+    """
+    if not rows:
+        return []
+
+    if db.get_bind().dialect.insert_executemany_returning_sort_by_parameter_order:
+        return list(db.scalars(insert(model).returning(model.id, sort_by_parameter_order=True), rows))
+
+    return [db.execute(insert(model).values(**row)).inserted_primary_key[0] for row in rows]
+
+
+def update_versioned(db, model, feature_id, version, values):
+    """
+    Updates a row only if it is still at the given version, and increments its version.
+
+    :param db: Database session
+    :param model: Mapped model class with 'id' and 'version' columns
+    :param feature_id: ID of the row to update
+    :param version: Version the caller last read
+    :param values: Dictionary of column values to set
+    :return: True if the row was updated, False if it was modified in the meantime
+    """
+    statement = (update(model)
+                 .where(model.id == feature_id, model.version == version)
+                 .values(version=model.version + 1, **values)
+                 .execution_options(synchronize_session=False))
+    return db.execute(statement).rowcount == 1
+
+
+def claim_versions(db, model, name, versions):
+    """
+    Increments the versions of submitted features that are still at the version their caller last read, with
+    one conditional UPDATE per feature. Once claimed, the rows stay locked by the current transaction, so
+    concurrent updates of the same features fail here instead of after their split computation.
+
+    :param db: Database session
+    :param model: Mapped model class with 'id' and 'version' columns
+    :param name: Name of the features in the error message, e.g. 'building limit'
+    :param versions: List of (feature ID, version) tuples
+    :return: None, raises VersionConflict naming the first feature modified in the meantime
+    """
+    for feature_id, version in versions:
+        if not update_versioned(db, model, feature_id, version, {}):
+            raise VersionConflict(f"Conflict detected: The {name} with ID {feature_id} has been modified by "
+                                  f"another user.")
+
+
+@timed("split_matching")
+def split_rows(split_gdf, project_id, limit_ids, plateau_ids, plateau_elevations):
+    """
+    Builds the rows of split geometries, linked to the original building limits and height plateaus.
+
+    :param split_gdf: Splits, or GeoDataFrame containing split geometries as returned by split_limits
+    :param project_id: Project ID for which splits are processed
+    :param limit_ids: Stored building limit IDs, in the same order as the split input features
+    :param plateau_ids: Stored height plateau IDs, in the same order as the split input features
+    :param plateau_elevations: Height plateau elevations, in the same order as the split input features
+    :return: List of SplitBuildingLimit column value dictionaries
+    """
+    # Link splits to the original limits and plateaus using the lineage from the intersection
+    rows = []
+    for columns, limit_index, plateau_index in zip(geometry_columns(np.asarray(split_gdf.geometry)),
+                                                   np.asarray(split_gdf.building_limit_index),
+                                                   np.asarray(split_gdf.height_plateau_index)):
+        try:
+            limit_id = limit_ids[limit_index]
+            plateau_id = plateau_ids[plateau_index]
+            elevation = plateau_elevations[plateau_index]
+        except IndexError:
+            raise ValueError("Failed to match split polygon to original building limit or height plateau")
+
+        rows.append({
+            "project_id": project_id,
+            "version": 1,
+            "elevation": elevation,
+            "building_limit_id": limit_id,
+            "height_plateau_id": plateau_id,
+            **columns
+        })
+    return rows
+
+
+def store_processed_splits(db, split_gdf, project_id, limit_ids, plateau_ids, plateau_elevations):
     """
     Processes and stores split geometries and links them to the original building limits and height plateaus.
+    Splits are inserted in bulk within the current transaction, which is left for the caller to commit.
 
     :param db: Database session
-    :param split_gdf: GeoDataFrame containing split geometries
+    :param split_gdf: Splits, or GeoDataFrame containing split geometries as returned by split_limits
     :param project_id: Project ID for which splits are processed
-    :param stored_limits: List of stored BuildingLimit objects
-    :param stored_plateaus: List of stored HeightPlateau objects
+    :param limit_ids: Stored building limit IDs, in the same order as the split input features
+    :param plateau_ids: Stored height plateau IDs, in the same order as the split input features
+    :param plateau_elevations: Height plateau elevations, in the same order as the split input features
     :return: None
     """
-    # Create a mapping from geometry to ID
-    limit_geometry_to_id = {shape(limit.geometry): limit.id for limit in stored_limits}
-    plateau_geometry_to_id = {shape(plateau.geometry): plateau.id for plateau in stored_plateaus}
-
-    # Link splits to the original limits and plateaus
-    for _, row in split_gdf.iterrows():
-        split_geom = row.geometry
-        matching_limit_id = None
-        matching_plateau_id = None
-
-        for limit_geom, limit_id in limit_geometry_to_id.items():
-            if limit_geom.contains(split_geom):
-                matching_limit_id = limit_id
-                break
-            elif limit_geom.buffer(1e-9).contains(split_geom):
-                matching_limit_id = limit_id
-                break
-
-        for plateau_geom, plateau_id in plateau_geometry_to_id.items():
-            if plateau_geom.contains(split_geom):
-                matching_plateau_id = plateau_id
-                break
-            elif plateau_geom.buffer(1e-9).contains(split_geom):
-                matching_plateau_id = plateau_id
-                break
-
-        if matching_limit_id is None or matching_plateau_id is None:
-            raise ValueError("Failed to match split polygon to original building limit or height plateau")
+    rows = split_rows(split_gdf, project_id, limit_ids, plateau_ids, plateau_elevations)
+    if rows:
+        db.execute(insert(SplitBuildingLimit), rows)
 
-        split_elevation = next(plateau.elevation for plateau in stored_plateaus if plateau.id == matching_plateau_id)
-        new_split = SplitBuildingLimit(
-            project_id=project_id,
-            version=1,
-            elevation=split_elevation,
-            geometry=mapping(split_geom),
-            building_limit_id=matching_limit_id,
-            height_plateau_id=matching_plateau_id
-        )
-        db.add(new_split)
 
-    db.commit()
+def store_new_projects(db, projects):
+    """
+    Stores new projects with their building limits, height plateaus and splits, with one bulk insert per table.
+    Nothing is committed.
+
+    :param db: Database session
+    :param projects: List of (project_id, splits, building_limits, height_plateaus, plateau_elevations) tuples,
+     with Splits and Features or the GeoDataFrames as returned by split_limits
+    :return: None
+    """
+    limit_ids = insert_returning_ids(db, BuildingLimit, [
+        {"project_id": project_id, **columns}
+        for project_id, _, building_limits_gdf, _, _ in projects
+        for columns in geometry_columns(np.asarray(building_limits_gdf.geometry))
+    ])
+    plateau_ids = insert_returning_ids(db, HeightPlateau, [
+        {"project_id": project_id, "elevation": elevation, **columns}
+        for project_id, _, _, height_plateaus_gdf, plateau_elevations in projects
+        for columns, elevation in zip(geometry_columns(np.asarray(height_plateaus_gdf.geometry)), plateau_elevations)
+    ])
+
+    # Hand each project its slice of the generated IDs
+    splits, limit_start, plateau_start = [], 0, 0
+    for project_id, split_gdf, building_limits_gdf, height_plateaus_gdf, plateau_elevations in projects:
+        limit_end = limit_start + len(building_limits_gdf)
+        plateau_end = plateau_start + len(height_plateaus_gdf)
+        splits += split_rows(split_gdf, project_id, limit_ids[limit_start:limit_end],
+                             plateau_ids[plateau_start:plateau_end], plateau_elevations)
+        limit_start, plateau_start = limit_end, plateau_end
+
+    if splits:
+        db.execute(insert(SplitBuildingLimit), splits)
+    db.execute(insert(Project), [
+        {"id": project_id, "version": 1, "building_limit_count": len(building_limits_gdf),
+         "height_plateau_count": len(height_plateaus_gdf), "split_count": len(split_gdf)}
+        for project_id, split_gdf, building_limits_gdf, height_plateaus_gdf, _ in projects
+    ])
 
 
-def validate_geojson(geojson):
+def parse_polygons(features):
     """
-    Validates that the provided GeoJSON has a valid structure and geometry.
+    Parses the Polygon geometries of GeoJSON features into a shapely geometry array, by gathering their
+    coordinates into ragged arrays that are turned into geometries in one vectorized call.
 
-    :param geojson: GeoJSON data to validate
-    :return: GeoDataFrame with validated geometry
+    :param features: List of GeoJSON features
+    :return: NumPy array of shapely Polygons, raises ValueError naming the first feature that is not a Polygon
+     or has malformed coordinates
     """
+    types = np.array([(feature.get("geometry") or {}).get("type") for feature in features], dtype=object)
+    not_polygons = np.flatnonzero(types != "Polygon")
+    if len(not_polygons):
+        index = not_polygons[0]
+        raise ValueError(f"All geometries must be of type 'Polygon', but feature {index} is {types[index]!r}.")
+
     try:
-        if "features" not in geojson:
-            raise ValueError("Invalid GeoJSON format.")
-        gdf = gpd.GeoDataFrame.from_features(geojson["features"])
-        if not isinstance(gdf, gpd.GeoDataFrame):
-            raise ValueError("Invalid GeoJSON format.")
+        coordinates, ring_offsets, polygon_offsets = [], [0], [0]
+        for feature in features:
+            rings = feature["geometry"]["coordinates"]
+            for ring in rings:
+                coordinates.extend(ring)
+                ring_offsets.append(ring_offsets[-1] + len(ring))
+            polygon_offsets.append(polygon_offsets[-1] + len(rings))
+        coordinates = np.asarray(coordinates, dtype=float).reshape(len(coordinates), -1) if coordinates else \
+            np.empty((0, 2))
+        if coordinates.shape[1] not in (2, 3):
+            raise ValueError("Coordinates must have 2 or 3 dimensions.")
+        return shapely.from_ragged_array(shapely.GeometryType.POLYGON, coordinates,
+                                         (np.asarray(ring_offsets), np.asarray(polygon_offsets)))
+    except (ValueError, TypeError, GEOSException) as e:
+        # Parse feature by feature to find the offending one
+        for index, feature in enumerate(features):
+            try:
+                coordinates = np.asarray([point for ring in feature["geometry"]["coordinates"] for point in ring],
+                                         dtype=float)
+                if coordinates.size and (coordinates.ndim != 2 or coordinates.shape[1] not in (2, 3)):
+                    raise ValueError("Coordinates must have 2 or 3 dimensions.")
+                shapely.geometry.shape(feature["geometry"])
+            except Exception as feature_error:
+                raise ValueError(f"Malformed coordinates in feature {index}: {feature_error}")
+        raise ValueError(f"Malformed coordinates: {e}")
 
-        # Ensure there's a valid geometry column
-        if 'geometry' not in gdf.columns:
-            raise ValueError("GeoJSON does not contain a 'geometry' column.")
 
-        # Set the active geometry column
-        gdf = gdf.set_geometry('geometry')
+def find_invalid_geometry(geometries):
+    """
+    Finds the first invalid geometry, e.g. a self-intersecting polygon.
+
+    :param geometries: Sequence of shapely geometries
+    :return: Tuple of the position of the first invalid geometry and the reason it is invalid, or None
+    """
+    invalid = np.flatnonzero(~shapely.is_valid(geometries))
+    if not len(invalid):
+        return None
+    return invalid[0], shapely.is_valid_reason(geometries[invalid[0]])
+
+
+@timed("parse_geojson")
+def parse_geojson(geojson, check_validity=True):
+    """
+    Parses and validates the geometries of a GeoJSON FeatureCollection of Polygons, without building a GeoDataFrame.
 
-        # Ensure all geometries are valid and of correct type (Polygon)
-        for geom in gdf.geometry:
-            if not isinstance(geom, BaseGeometry):
-                raise ValueError("Invalid geometry in GeoJSON.")
-            if geom.geom_type != "Polygon":
-                raise ValueError("All geometries must be of type 'Polygon'.")
+    :param geojson: GeoJSON data to parse
+    :param check_validity: Whether to check the geometries for self-intersections and the like, which can be
+     left to split_geometries
+    :return: NumPy array of shapely Polygons, positionally matching the features
+    """
+    try:
+        if not isinstance(geojson, dict) or not isinstance(geojson.get("features"), list):
+            raise ValueError("Invalid GeoJSON format.")
+        if not all(isinstance(feature, dict) for feature in geojson["features"]):
+            raise ValueError("Features must be objects.")
+
+        geometries = parse_polygons(geojson["features"])
 
         # Ensure geometries are valid (no self-intersections, etc.)
-        if not gdf.is_valid.all():
-            raise ValueError("One or more geometries are invalid.")
+        if check_validity:
+            invalid = find_invalid_geometry(geometries)
+            if invalid is not None:
+                raise ValueError(f"Feature {invalid[0]} has an invalid geometry: {invalid[1]}.")
 
-        return gdf
+        return geometries
 
     except Exception as e:
         raise ValueError(f"Invalid GeoJSON: {str(e)}")
+
+
+def features_from_geojson(geojson, check_validity=True):
+    """
+    Parses a GeoJSON FeatureCollection of Polygons into Features, labelled by feature ID where provided.
+
+    :param geojson: GeoJSON data to parse
+    :param check_validity: Whether to check the geometries for self-intersections and the like, which can be
+     left to split_geometries
+    :return: Features of the GeoJSON
+    """
+    geometries = parse_geojson(geojson, check_validity)
+    # Label features by ID where provided, so errors can point at the offending features
+    return Features(geometries, [feature.get("id", i) for i, feature in enumerate(geojson["features"])])
+
+
+def validate_geojson(geojson, check_validity=True):
+    """
+    Validates that the provided GeoJSON has a valid structure and geometry.
+
+    :param geojson: GeoJSON data to validate
+    :param check_validity: Whether to check the geometries for self-intersections and the like, which can be
+     left to split_geometries
+    :return: GeoDataFrame with validated geometry and the feature properties as columns, labelled by feature ID
+     where provided
+    """
+    import geopandas as gpd
+
+    features = features_from_geojson(geojson, check_validity)
+    return gpd.GeoDataFrame([feature.get("properties") or {} for feature in geojson["features"]],
+                            geometry=features.geometry, index=features.index)
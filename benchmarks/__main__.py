@@ -0,0 +1,57 @@
+# benchmarks/__main__.py
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+parser = argparse.ArgumentParser(prog="python -m benchmarks",
+                                 description="Runs the geometry and endpoint benchmarks on synthetic workloads.")
+parser.add_argument("--scale", nargs="+", default=["small", "medium"], help="Workload scales to run")
+parser.add_argument("--repeat", type=int, default=5, help="Timed runs of each benchmark")
+parser.add_argument("--seed", type=int, default=0, help="Seed of the workload generator")
+parser.add_argument("--output", help="Path to store the results at, e.g. to record a new baseline")
+parser.add_argument("--baseline", help="Path of baseline results to compare with")
+parser.add_argument("--threshold", type=float, default=0.25,
+                    help="Relative slowdown of the minimum beyond which a benchmark fails the comparison")
+parser.add_argument("--ignore-environment", action="store_true",
+                    help="Compare with a baseline recorded with other Python, shapely or GEOS versions")
+args = parser.parse_args()
+
+# Run against a scratch database with the caches off, so every request does its full work
+os.environ.setdefault("conn_str", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'benchmarks.db')}")
+os.environ["response_cache_entries"] = "0"
+os.environ["split_cache_entries"] = "0"
+os.environ.pop("split_cache_path", None)
+
+from benchmarks.suite import compare_results, current_environment, environment_mismatch, run_benchmarks  # noqa: E402
+from benchmarks.workload import SCALES  # noqa: E402
+
+unknown = [scale for scale in args.scale if scale not in SCALES]
+if unknown:
+    parser.error(f"unknown scales {', '.join(unknown)}, expected some of {', '.join(SCALES)}")
+
+baseline = None
+if args.baseline:
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    mismatch = environment_mismatch(baseline, current_environment())
+    if mismatch and not args.ignore_environment:
+        parser.error("the baseline was recorded in another environment ("
+                     + ", ".join(f"{name} {recorded} instead of {version}" for name, recorded, version in mismatch)
+                     + "), record a new one with --output or pass --ignore-environment")
+
+results = run_benchmarks(args.scale, args.repeat, args.seed)
+if args.output:
+    with open(args.output, "w") as output:
+        json.dump(results, output, indent=2, sort_keys=True)
+
+if baseline is not None:
+    comparison = compare_results(baseline, results, args.threshold)
+    for name, before, after, ratio, regressed in comparison:
+        print(f"{name:50} {before * 1000:10.2f} ms {after * 1000:10.2f} ms {ratio:6.2f}x"
+              f"{'  REGRESSION' if regressed else ''}")
+    sys.exit(1 if any(regressed for *_, regressed in comparison) else 0)
+
+for name, result in results["results"].items():
+    print(f"{name:50} {result['median'] * 1000:10.2f} ms (min {result['min'] * 1000:.2f} ms)")
@@ -0,0 +1,193 @@
+# benchmarks/suite.py
+import copy
+import platform
+import statistics
+import time
+
+import shapely
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.api.formats import WKB_MEDIA_TYPE
+from app.main import app
+from app.models import Base
+from app.tools import split_limits, store_processed_splits, validate_coverage, validate_geojson
+from benchmarks.workload import generate_workload
+
+# Versions that must match for durations to be compared with a baseline
+COMPARED_ENVIRONMENT = ("python", "shapely", "geos")
+
+
+def measure(fn, repeat):
+    """
+    Times repeated calls of a function, after an untimed warm-up call.
+
+    :param fn: Function without arguments
+    :param repeat: Number of timed calls
+    :return: Dictionary with the minimum and median duration in seconds
+    """
+    fn()
+    durations = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start_time)
+    return {"min": min(durations), "median": statistics.median(durations)}
+
+
+def function_benchmarks(building_limits, height_plateaus, repeat):
+    """
+    Benchmarks the validation, split and storage functions on a workload.
+
+    :param building_limits: GeoJSON FeatureCollection of building limits
+    :param height_plateaus: GeoJSON FeatureCollection of height plateaus
+    :param repeat: Number of timed runs of each benchmark
+    :return: Dictionary of results by benchmark name
+    """
+    building_limits_gdf = validate_geojson(building_limits)
+    height_plateaus_gdf = validate_geojson(height_plateaus)
+    split_gdf, _, _ = split_limits(building_limits, height_plateaus)
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    def store():
+        store_processed_splits(db, split_gdf, 1,
+                               list(range(1, len(building_limits_gdf) + 1)),
+                               list(range(1, len(height_plateaus_gdf) + 1)),
+                               height_plateaus_gdf['elevation'].tolist())
+        db.rollback()
+
+    try:
+        return {
+            "validate_geojson": measure(lambda: (validate_geojson(building_limits),
+                                                 validate_geojson(height_plateaus)), repeat),
+            "validate_coverage": measure(lambda: validate_coverage(building_limits_gdf, height_plateaus_gdf), repeat),
+            "split_limits": measure(lambda: split_limits(building_limits, height_plateaus), repeat),
+            "store_processed_splits": measure(store, repeat),
+        }
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def endpoint_benchmarks(building_limits, height_plateaus, repeat, project_id=900000):
+    """
+    Benchmarks the endpoints end to end on a workload, from creating a project to deleting it.
+
+    The caches should be disabled, or the repeated requests would measure cache hits.
+
+    :param building_limits: GeoJSON FeatureCollection of building limits
+    :param height_plateaus: GeoJSON FeatureCollection of height plateaus
+    :param repeat: Number of timed runs of each benchmark
+    :param project_id: ID of the project created by the benchmarks, deleted if it exists
+    :return: Dictionary of results by benchmark name
+    """
+    durations = {}
+
+    def timed(name, request, *args, status=200, **kwargs):
+        start_time = time.perf_counter()
+        response = request(*args, **kwargs)
+        if not warm_up:
+            durations.setdefault(name, []).append(time.perf_counter() - start_time)
+        if response.status_code != status:
+            raise RuntimeError(f"{name} failed with {response.status_code}: {response.text[:200]}")
+        return response
+
+    with TestClient(app) as client:
+        client.delete("/delete-project", params={"project_id": project_id})
+        for run in range(repeat + 1):
+            # The first run warms up the application and is not timed
+            warm_up = run == 0
+            timed("POST /create-project", client.post, "/create-project", params={"project_id": project_id},
+                  json={"building_limits": building_limits, "height_plateaus": height_plateaus})
+            timed("POST /create-project (existing)", client.post, "/create-project",
+                  params={"project_id": project_id},
+                  json={"building_limits": building_limits, "height_plateaus": height_plateaus}, status=409)
+            timed("GET /building-limits", client.get, f"/building-limits/{project_id}")
+            plateaus = timed("GET /height-plateaus", client.get,
+                             f"/height-plateaus/{project_id}").json()["height_plateaus"]
+            timed("GET /split-building-limits", client.get, f"/split-building-limits/{project_id}")
+            timed("GET /split-building-limits (WKB)", client.get, f"/split-building-limits/{project_id}",
+                  headers={"Accept": WKB_MEDIA_TYPE})
+
+            changed = copy.deepcopy(plateaus)
+            changed["features"] = changed["features"][:1]
+            changed["features"][0]["properties"]["elevation"] += 1
+            timed("PUT /update-project", client.put, "/update-project", params={"project_id": project_id},
+                  json={"height_plateaus": changed})
+            timed("DELETE /delete-project", client.delete, "/delete-project", params={"project_id": project_id})
+
+    return {name: {"min": min(values), "median": statistics.median(values)} for name, values in durations.items()}
+
+
+def current_environment():
+    """
+    Describes the interpreter, platform and geometry library versions the benchmarks run with.
+
+    :return: Dictionary of versions
+    """
+    return {"python": platform.python_version(), "platform": platform.platform(),
+            "shapely": shapely.__version__, "geos": shapely.geos_version_string}
+
+
+def environment_mismatch(baseline, environment):
+    """
+    Lists the versions that differ between the environment of a baseline and another one. Durations measured
+    with different Python, shapely or GEOS versions cannot be compared.
+
+    :param baseline: Results dictionary of the baseline
+    :param environment: Environment to compare with, as returned by current_environment
+    :return: List of (name, baseline version, version) tuples, empty if the environments match
+    """
+    recorded = baseline.get("environment", {})
+    return [(name, recorded.get(name), environment[name]) for name in COMPARED_ENVIRONMENT
+            if recorded.get(name) != environment[name]]
+
+
+def run_benchmarks(scales, repeat=5, seed=0):
+    """
+    Runs every benchmark on the workloads of the given scales.
+
+    :param scales: Names of scales of the workload generator
+    :param repeat: Number of timed runs of each benchmark
+    :param seed: Seed of the workload generator
+    :return: Results dictionary, suitable to be stored as a baseline
+    """
+    results = {}
+    for scale in scales:
+        building_limits, height_plateaus = generate_workload(scale, seed)
+        for benchmarks in (function_benchmarks, endpoint_benchmarks):
+            for name, result in benchmarks(building_limits, height_plateaus, repeat).items():
+                results[f"{scale}/{name}"] = result
+
+    return {
+        "environment": current_environment(),
+        "repeat": repeat,
+        "seed": seed,
+        "results": results,
+    }
+
+
+def compare_results(baseline, current, threshold=0.25, min_delta=0.002):
+    """
+    Compares benchmark results with a baseline by their minimum durations, which are the least affected
+    by other load on the machine.
+
+    :param baseline: Results dictionary of the baseline
+    :param current: Results dictionary to check
+    :param threshold: Relative slowdown beyond which a benchmark counts as a regression
+    :param min_delta: Slowdown in seconds below which differences are treated as noise
+    :return: List of (name, baseline minimum, current minimum, ratio, regressed) tuples of the common benchmarks
+    """
+    comparison = []
+    for name, result in current["results"].items():
+        if name not in baseline["results"]:
+            continue
+        before, after = baseline["results"][name]["min"], result["min"]
+        ratio = after / before if before else float("inf")
+        regressed = ratio > 1 + threshold and after - before > min_delta
+        comparison.append((name, before, after, ratio, regressed))
+    return comparison
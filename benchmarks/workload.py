@@ -0,0 +1,116 @@
+# benchmarks/workload.py
+import json
+import math
+from pathlib import Path
+
+import numpy as np
+import shapely
+from shapely.geometry import mapping, shape
+
+SAMPLE_PATH = Path(__file__).resolve().parent.parent / "sample.json"
+
+# Number of sites, building limit vertices and plateau cells per site of the named scales
+SCALES = {
+    "small": {"sites": 10, "limit_vertices": 64, "plateau_cells": 4},
+    "medium": {"sites": 100, "limit_vertices": 256, "plateau_cells": 8},
+    "large": {"sites": 1000, "limit_vertices": 256, "plateau_cells": 8},
+}
+
+
+def load_sample(path=SAMPLE_PATH):
+    """
+    Loads the building limit and height plateaus of the sample project.
+
+    :param path: Path of the sample JSON file
+    :return: Tuple of the building limit geometry and the list of (height plateau geometry, elevation) tuples
+    """
+    with open(path) as sample_file:
+        sample = json.load(sample_file)
+    building_limit = shape(sample["building_limits"]["features"][0]["geometry"])
+    height_plateaus = [(shape(feature["geometry"]), feature["properties"]["elevation"])
+                       for feature in sample["height_plateaus"]["features"]]
+    return building_limit, height_plateaus
+
+
+def irregular_limit(building_limit, vertices, rng):
+    """
+    Cuts an irregular, many-vertex building limit out of the sample building limit, so that it stays
+    covered by the sample height plateaus.
+
+    :param building_limit: Sample building limit geometry
+    :param vertices: Number of vertices of the star polygon the limit is cut with
+    :param rng: NumPy random generator
+    :return: Polygon
+    """
+    minx, miny, maxx, maxy = building_limit.bounds
+    center = building_limit.centroid
+    angles = np.sort(rng.uniform(0, 2 * math.pi, vertices))
+    radii = rng.uniform(0.5, 0.9, vertices)
+    star = shapely.Polygon(np.column_stack([center.x + radii * np.cos(angles) * (maxx - minx) / 2,
+                                            center.y + radii * np.sin(angles) * (maxy - miny) / 2]))
+    limit = shapely.intersection(building_limit, star.buffer(0))
+    # Keep the largest part, since input building limits must be Polygons
+    return max(shapely.get_parts(limit), key=lambda part: part.area)
+
+
+def partitioned_plateaus(height_plateaus, cells, rng):
+    """
+    Splits the sample height plateaus along the Voronoi cells of random points, keeping them free of
+    overlaps and their union unchanged.
+
+    :param height_plateaus: List of (height plateau geometry, elevation) tuples of the sample
+    :param cells: Number of Voronoi cells
+    :param rng: NumPy random generator
+    :return: List of (Polygon, elevation) tuples
+    """
+    extent = shapely.union_all([plateau for plateau, _ in height_plateaus]).envelope
+    minx, miny, maxx, maxy = extent.bounds
+    points = shapely.multipoints(np.column_stack([rng.uniform(minx, maxx, cells), rng.uniform(miny, maxy, cells)]))
+    voronoi = shapely.get_parts(shapely.voronoi_polygons(points, extend_to=extent.buffer(maxx - minx)))
+
+    pieces = []
+    for plateau, elevation in height_plateaus:
+        for part in shapely.get_parts(shapely.intersection(plateau, voronoi)):
+            if isinstance(part, shapely.Polygon) and not part.is_empty:
+                pieces.append((part, round(elevation + rng.uniform(-1, 1), 1)))
+    return pieces
+
+
+def generate_workload(scale="small", seed=0, sample_path=SAMPLE_PATH):
+    """
+    Generates deterministic building limits and height plateaus for benchmarks.
+
+    Every site is a copy of the sample project with an irregular building limit and the sample plateaus
+    split into smaller ones, laid out in a grid of sites that do not touch each other.
+
+    :param scale: Name of a scale in SCALES, or a dictionary with the same keys
+    :param seed: Seed of the random generator
+    :param sample_path: Path of the sample JSON file
+    :return: Tuple of the building limits and height plateaus GeoJSON FeatureCollections
+    """
+    parameters = SCALES[scale] if isinstance(scale, str) else scale
+    rng = np.random.default_rng(seed)
+    building_limit, height_plateaus = load_sample(sample_path)
+
+    minx, miny, maxx, maxy = shapely.union_all([building_limit] + [plateau for plateau, _ in height_plateaus]).bounds
+    step_x, step_y = 1.5 * (maxx - minx), 1.5 * (maxy - miny)
+    columns = math.ceil(math.sqrt(parameters["sites"]))
+
+    limit_features, plateau_features = [], []
+    for site in range(parameters["sites"]):
+        offset_x, offset_y = (site % columns) * step_x, (site // columns) * step_y
+        limit = irregular_limit(building_limit, parameters["limit_vertices"], rng)
+        limit_features.append({
+            "type": "Feature",
+            "geometry": mapping(shapely.transform(limit, lambda coords: coords + [offset_x, offset_y])),
+            "properties": {}
+        })
+        for plateau, elevation in partitioned_plateaus(height_plateaus, parameters["plateau_cells"], rng):
+            plateau_features.append({
+                "type": "Feature",
+                "geometry": mapping(shapely.transform(plateau, lambda coords: coords + [offset_x, offset_y])),
+                "properties": {"elevation": elevation}
+            })
+
+    return ({"type": "FeatureCollection", "features": limit_features},
+            {"type": "FeatureCollection", "features": plateau_features})
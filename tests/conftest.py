@@ -0,0 +1,10 @@
+import pytest
+
+from app.core.config import engine
+from app.core.migrations import init_database
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    # Done by the application lifespan when serving, which the module-level test clients do not run
+    init_database(engine)
@@ -0,0 +1,33 @@
+from benchmarks.suite import compare_results, current_environment, environment_mismatch
+from benchmarks.workload import generate_workload
+from app.tools import split_limits
+
+SCALE = {"sites": 4, "limit_vertices": 32, "plateau_cells": 3}
+
+
+def test_generate_workload():
+    building_limits, height_plateaus = generate_workload(SCALE, seed=1)
+    assert generate_workload(SCALE, seed=1) == (building_limits, height_plateaus)
+    assert generate_workload(SCALE, seed=2) != (building_limits, height_plateaus)
+
+    assert len(building_limits["features"]) == 4
+    assert len(height_plateaus["features"]) >= 4 * 3
+
+    # Generated projects are valid input
+    split_gdf, _, _ = split_limits(building_limits, height_plateaus)
+    assert set(split_gdf['building_limit_index']) == {0, 1, 2, 3}
+
+
+def test_compare_results():
+    baseline = {"results": {"a": {"min": 0.100}, "b": {"min": 0.100}, "c": {"min": 0.0001}, "d": {"min": 0.1}}}
+    current = {"results": {"a": {"min": 0.110}, "b": {"min": 0.200}, "c": {"min": 0.0003}, "e": {"min": 0.1}}}
+    comparison = {name: regressed for name, _, _, _, regressed in compare_results(baseline, current, 0.25)}
+    assert comparison == {"a": False, "b": True, "c": False}
+
+
+def test_environment_mismatch():
+    environment = current_environment()
+    assert environment_mismatch({"environment": dict(environment, platform="other")}, environment) == []
+    assert environment_mismatch({"environment": dict(environment, shapely="0.0")}, environment) == \
+        [("shapely", "0.0", environment["shapely"])]
+    assert len(environment_mismatch({"results": {}}, environment)) == 3
@@ -0,0 +1,48 @@
+from app.core.cache import ResponseCache, etag_matches, project_revision
+from app.models import Project
+
+
+def test_response_cache_eviction():
+    cache = ResponseCache(max_entries=2, max_bytes=1024)
+    cache.put(1, "building_limits", 0, b"a")
+    cache.put(2, "building_limits", 0, b"b")
+    assert cache.get(1, "building_limits", 0) == b"a"
+
+    # The least recently used entry is evicted first
+    cache.put(3, "building_limits", 0, b"c")
+    assert cache.get(2, "building_limits", 0) is None
+    assert cache.get(1, "building_limits", 0) == b"a"
+
+    # Bodies larger than the cache are not stored
+    cache.put(4, "building_limits", 0, b"d" * 2048)
+    assert cache.get(4, "building_limits", 0) is None
+
+
+def test_response_cache_revisions():
+    cache = ResponseCache()
+    project = Project(id=1, version=1, generation="a")
+    revision = project_revision(project)
+    etag = cache.etag(1, "height_plateaus", revision)
+    cache.put(1, "height_plateaus", revision, b"old")
+    assert cache.get(1, "height_plateaus", revision) == b"old"
+
+    # A write stored by any worker changes the revision, and so the cache key and the ETag
+    project.version += 1
+    assert cache.get(1, "height_plateaus", project_revision(project)) is None
+    assert cache.etag(1, "height_plateaus", project_revision(project)) != etag
+
+    # A project created again under a deleted ID starts a new generation, whatever its version
+    recreated = Project(id=1, version=1, generation="b")
+    assert project_revision(recreated) != revision
+    assert project_revision(None) != revision
+
+    cache.invalidate(1)
+    assert cache.get(1, "height_plateaus", revision) is None
+
+
+def test_etag_matches():
+    assert etag_matches('"a"', '"a"')
+    assert etag_matches('"b", W/"a"', '"a"')
+    assert etag_matches('*', '"a"')
+    assert not etag_matches('"b"', '"a"')
+    assert not etag_matches(None, '"a"')
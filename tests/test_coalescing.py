@@ -0,0 +1,69 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from fastapi.testclient import TestClient
+
+import app.api.endpoints as endpoints
+from app.core.coalescing import WriteCoalescer
+from app.main import app
+from .test_data import two_site_building_limits, two_site_height_plateaus
+
+client = TestClient(app)
+
+
+def test_write_coalescer_merges_disjoint_writes():
+    coalescer = WriteCoalescer(window=0.2)
+    batches, lock = [], Lock()
+
+    def run_batch(items):
+        with lock:
+            batches.append(list(items))
+        return [(item * 10, None) for item in items]
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = []
+        for item, keys in ((1, {"a"}), (2, {"b"}), (3, {"a"})):
+            futures.append(executor.submit(coalescer.submit, "project", item, keys, run_batch))
+            time.sleep(0.02)
+        results = [future.result() for future in futures]
+
+    # The write touching the same key as the pending batch runs on its own
+    assert results == [10, 20, 30]
+    assert sorted(batches) == [[1, 2], [3]]
+
+
+def test_concurrent_updates_are_coalesced(monkeypatch):
+    client.delete("/delete-project", params={"project_id": 2})
+    client.post("/create-project", params={"project_id": 2},
+                json={"building_limits": two_site_building_limits, "height_plateaus": two_site_height_plateaus})
+    height_plateaus = client.get("/height-plateaus/2").json()["height_plateaus"]
+
+    computations = []
+
+    def cached_split_features(*args):
+        computations.append(args)
+        return split_features(*args)
+
+    split_features = endpoints.cached_split_features
+    monkeypatch.setattr(endpoints, "cached_split_features", cached_split_features)
+    monkeypatch.setattr(endpoints, "update_coalescer", WriteCoalescer(window=0.3))
+
+    def edit(position, elevation):
+        feature = {**height_plateaus["features"][position]}
+        feature["properties"] = {**feature["properties"], "elevation": elevation}
+        return client.put("/update-project", params={"project_id": 2},
+                          json={"height_plateaus": {"type": "FeatureCollection", "features": [feature]}})
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        responses = list(executor.map(edit, (0, 1), (7.0, 8.0)))
+
+    # Each caller gets the new version of its own feature, and the splits are computed once
+    assert [response.status_code for response in responses] == [200, 200]
+    for response, feature in zip(responses, height_plateaus["features"]):
+        assert response.json()["coalesced"] == 2
+        assert response.json()["versions"]["height_plateaus"] == {str(feature["id"]): feature["version"] + 1}
+    assert len(computations) == 1
+
+    splits = client.get("/split-building-limits/2").json()["building_limits_splits"]["features"]
+    assert sorted(split["properties"]["elevation"] for split in splits) == [7.0, 8.0]
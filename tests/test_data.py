@@ -110,3 +110,83 @@ overlapping_plateaus = {
         }
     ]
 }
+
+two_site_building_limits = {
+    "type": "FeatureCollection",
+    "features": [
+        {
+            "type": "Feature",
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": [
+                    [
+                        [0.0, 0.0],
+                        [10.0, 0.0],
+                        [10.0, 10.0],
+                        [0.0, 10.0],
+                        [0.0, 0.0]
+                    ]
+                ]
+            },
+            "properties": {}
+        },
+        {
+            "type": "Feature",
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": [
+                    [
+                        [100.0, 100.0],
+                        [110.0, 100.0],
+                        [110.0, 110.0],
+                        [100.0, 110.0],
+                        [100.0, 100.0]
+                    ]
+                ]
+            },
+            "properties": {}
+        }
+    ]
+}
+
+two_site_height_plateaus = {
+    "type": "FeatureCollection",
+    "features": [
+        {
+            "type": "Feature",
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": [
+                    [
+                        [0.0, 0.0],
+                        [10.0, 0.0],
+                        [10.0, 10.0],
+                        [0.0, 10.0],
+                        [0.0, 0.0]
+                    ]
+                ]
+            },
+            "properties": {
+                "elevation": 5.0
+            }
+        },
+        {
+            "type": "Feature",
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": [
+                    [
+                        [100.0, 100.0],
+                        [110.0, 100.0],
+                        [110.0, 110.0],
+                        [100.0, 110.0],
+                        [100.0, 100.0]
+                    ]
+                ]
+            },
+            "properties": {
+                "elevation": 6.0
+            }
+        }
+    ]
+}
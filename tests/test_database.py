@@ -0,0 +1,80 @@
+import re
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event, text
+from sqlalchemy.dialects import postgresql
+
+from app.core.config import SessionLocal, engine
+from app.core.database import create_database_engine
+from app.main import app
+from .test_data import building_limits, height_plateaus_complete
+
+client = TestClient(app)
+
+SCHEMA_STATEMENT = re.compile(r"^\s*(CREATE|ALTER|DROP)\b|PRAGMA\s+\S*table_info|information_schema|pg_catalog",
+                              re.IGNORECASE)
+
+
+def test_requests_run_no_schema_statements():
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        client.delete("/delete-project", params={"project_id": 10})
+        response = client.post("/create-project", params={"project_id": 10},
+                               json={"building_limits": building_limits, "height_plateaus": height_plateaus_complete})
+        assert response.status_code == 200
+        height_plateaus = client.get("/height-plateaus/10").json()["height_plateaus"]
+        response = client.put("/update-project", params={"project_id": 10}, json={"height_plateaus": height_plateaus})
+        assert response.status_code == 200
+        assert client.delete("/delete-project", params={"project_id": 10}).status_code == 200
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert statements
+    assert [statement for statement in statements if SCHEMA_STATEMENT.search(statement)] == []
+
+
+def test_unknown_database_profile():
+    with pytest.raises(ValueError):
+        create_database_engine("sqlite://", profile="mysql")
+
+
+def test_database_profiles(tmp_path):
+    sqlite_engine = create_database_engine(f"sqlite:///{tmp_path / 'profile.db'}", busy_timeout=1234)
+    with sqlite_engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 1234
+
+    pytest.importorskip("psycopg2")
+    postgresql_engine = create_database_engine("postgresql+psycopg2://user@localhost/buildings", pool_size=3, max_overflow=4)
+    assert (postgresql_engine.pool.size(), postgresql_engine.pool._max_overflow) == (3, 4)
+    assert postgresql_engine.pool._pre_ping
+
+
+def test_updates_and_deletes_lock_the_project_row():
+    client.delete("/delete-project", params={"project_id": 10})
+    client.post("/create-project", params={"project_id": 10},
+                json={"building_limits": building_limits, "height_plateaus": height_plateaus_complete})
+    statements = []
+
+    def record(orm_execute_state):
+        statements.append(str(orm_execute_state.statement.compile(dialect=postgresql.dialect())))
+
+    # SQLite has no row locks and drops FOR UPDATE, so the statements are checked as PostgreSQL would run them
+    event.listen(SessionLocal, "do_orm_execute", record)
+    try:
+        height_plateaus = client.get("/height-plateaus/10").json()["height_plateaus"]
+        assert client.put("/update-project", params={"project_id": 10},
+                          json={"height_plateaus": height_plateaus}).status_code == 200
+        assert client.delete("/delete-project", params={"project_id": 10}).status_code == 200
+    finally:
+        event.remove(SessionLocal, "do_orm_execute", record)
+
+    locks = [statement for statement in statements if "FROM projects" in statement and "FOR UPDATE" in statement]
+    assert len(locks) == 2
@@ -1,6 +1,17 @@
+import json
+
+import shapely
 from fastapi.testclient import TestClient
+from sqlalchemy import update
+from shapely.geometry import shape
+import app.api.endpoints as endpoints
+from app.api.formats import WKB_MEDIA_TYPE, decode_wkb_records
+from app.core.cache import ResponseCache
+from app.core.config import SessionLocal
 from app.main import app
-from .test_data import building_limits, height_plateaus_complete
+from app.models import BuildingLimit, Project
+from .test_data import building_limits, height_plateaus_complete, two_site_building_limits, \
+    two_site_height_plateaus
 
 client = TestClient(app)
 
@@ -34,6 +45,24 @@ def test_create_project():
     assert response.status_code == 422
 
 
+def test_create_project_rejects_invalid_geometries():
+    client.delete("/delete-project", params={"project_id": 2})
+    # A self-intersecting bowtie, which cannot be snapped to the grid of the split cache key
+    bowtie = {
+        "type": "FeatureCollection",
+        "features": [{
+            "type": "Feature",
+            "geometry": {"type": "Polygon", "coordinates": [[[0, 0], [10, 10], [10, 0], [0, 10], [0, 0]]]},
+            "properties": {"elevation": 1.0}
+        }]
+    }
+    response = client.post("/create-project", params={"project_id": 2},
+                           json={"building_limits": bowtie, "height_plateaus": bowtie})
+    assert response.status_code == 422
+    assert "invalid" in response.json()["detail"]
+    assert client.get("/building-limits/2").json() == {"message": "No data found"}
+
+
 def test_update_project():
     updated_height_plateaus = {
         "type": "FeatureCollection",
@@ -65,5 +94,275 @@ def test_update_project():
         "building_limits": building_limits,
         "height_plateaus": updated_height_plateaus
     })
-    assert response.status_code == 400
-    assert response.json()["detail"] == "404: Project with this ID does not exist."
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Project with this ID does not exist."
+    assert client.delete("/delete-project", params={"project_id": 2}).status_code == 404
+
+
+def test_create_project_links_splits_to_stored_features():
+    # Initial project deletion, if already exists
+    client.delete("/delete-project",
+                  params={"project_id": 2})
+
+    response = client.post("/create-project",
+                           params={"project_id": 2},
+                           json={
+        "building_limits": building_limits,
+        "height_plateaus": height_plateaus_complete
+    })
+    assert response.status_code == 200
+
+    limit = client.get("/building-limits/2").json()["building_limits"]["features"][0]
+    plateau = client.get("/height-plateaus/2").json()["height_plateaus"]["features"][0]
+    splits = client.get("/split-building-limits/2").json()["building_limits_splits"]["features"]
+
+    assert len(splits) == 1
+    assert splits[0]["properties"] == {
+        "elevation": plateau["properties"]["elevation"],
+        "building_limit_id": limit["id"],
+        "height_plateau_id": plateau["id"]
+    }
+
+
+def test_update_project_resplits_only_changed_neighbourhood():
+    # Initial project deletion, if already exists
+    client.delete("/delete-project",
+                  params={"project_id": 2})
+
+    response = client.post("/create-project",
+                           params={"project_id": 2},
+                           json={
+        "building_limits": two_site_building_limits,
+        "height_plateaus": two_site_height_plateaus
+    })
+    assert response.status_code == 200
+
+    height_plateaus = client.get("/height-plateaus/2").json()["height_plateaus"]
+    height_plateaus["features"][1]["properties"]["elevation"] = 8.0
+
+    response = client.put("/update-project",
+                          params={"project_id": 2},
+                          json={"height_plateaus": height_plateaus})
+    assert response.status_code == 200
+    assert response.json()["splits"] == {"kept": 1, "replaced": 1, "added": 1}
+
+    splits = client.get("/split-building-limits/2").json()["building_limits_splits"]["features"]
+    assert sorted(split["properties"]["elevation"] for split in splits) == [5.0, 8.0]
+
+
+def test_update_project_rejects_stale_versions_before_parsing(monkeypatch):
+    client.delete("/delete-project", params={"project_id": 2})
+    client.post("/create-project", params={"project_id": 2},
+                json={"building_limits": two_site_building_limits, "height_plateaus": two_site_height_plateaus})
+
+    height_plateaus = client.get("/height-plateaus/2").json()["height_plateaus"]
+    height_plateaus["features"][1]["properties"]["elevation"] = 8.0
+    assert client.put("/update-project", params={"project_id": 2},
+                      json={"height_plateaus": height_plateaus}).status_code == 200
+    splits = client.get("/split-building-limits/2").json()
+
+    def parse_geojson(geojson):
+        raise AssertionError("Stale updates must be rejected before their geometries are parsed")
+
+    monkeypatch.setattr(endpoints, "parse_geojson", parse_geojson)
+    response = client.put("/update-project", params={"project_id": 2}, json={"height_plateaus": height_plateaus})
+    assert response.status_code == 409
+    plateau_id = height_plateaus["features"][0]["id"]
+    assert response.json()["detail"] == \
+        f"Conflict detected: The height plateau with ID {plateau_id} has been modified by another user."
+    assert client.get("/split-building-limits/2").json() == splits
+
+
+def test_get_building_limits_etag():
+    # Initial project deletion, if already exists
+    client.delete("/delete-project",
+                  params={"project_id": 2})
+
+    client.post("/create-project",
+                params={"project_id": 2},
+                json={
+        "building_limits": building_limits,
+        "height_plateaus": height_plateaus_complete
+    })
+
+    response = client.get("/building-limits/2")
+    etag = response.headers["etag"]
+    assert response.status_code == 200
+
+    response = client.get("/building-limits/2", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+
+    # Writes to the project change the ETag
+    client.put("/update-project",
+               params={"project_id": 2},
+               json={"building_limits": client.get("/building-limits/2").json()["building_limits"]})
+    response = client.get("/building-limits/2", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()["building_limits"]["features"][0]["version"] == 2
+
+
+def test_get_building_limits_follows_writes_of_other_workers():
+    client.delete("/delete-project", params={"project_id": 2})
+    client.post("/create-project", params={"project_id": 2},
+                json={"building_limits": building_limits, "height_plateaus": height_plateaus_complete})
+    response = client.get("/building-limits/2")
+    etag = response.headers["etag"]
+
+    # A write by another worker changes the stored project, without invalidating the caches of this process
+    with SessionLocal() as db:
+        db.execute(update(BuildingLimit).where(BuildingLimit.project_id == 2).values(name="renamed"))
+        db.execute(update(Project).where(Project.id == 2).values(version=Project.version + 1))
+        db.commit()
+    response = client.get("/building-limits/2", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["etag"] != etag
+    assert response.json()["building_limits"]["features"][0]["name"] == "renamed"
+
+
+def test_get_split_building_limits_stream():
+    # Initial project deletion, if already exists
+    client.delete("/delete-project",
+                  params={"project_id": 2})
+
+    response = client.get("/split-building-limits/2", params={"stream": True})
+    assert response.json() == {"message": "No data found"}
+
+    client.post("/create-project",
+                params={"project_id": 2},
+                json={
+        "building_limits": two_site_building_limits,
+        "height_plateaus": two_site_height_plateaus
+    })
+
+    streamed = client.get("/split-building-limits/2", params={"stream": True},
+                          headers={"Accept-Encoding": "identity"})
+    buffered = client.get("/split-building-limits/2", params={"stream": False},
+                          headers={"Accept-Encoding": "identity"})
+    assert streamed.status_code == 200
+    assert streamed.headers["etag"] == buffered.headers["etag"]
+    assert streamed.json() == buffered.json()
+    assert len(streamed.json()["building_limits_splits"]["features"]) == 2
+
+
+def test_import_projects():
+    for project_id in (5, 6):
+        client.delete("/delete-project",
+                      params={"project_id": project_id})
+
+    records = [
+        {"project_id": 5, "building_limits": building_limits, "height_plateaus": height_plateaus_complete},
+        {"project_id": 6, "building_limits": building_limits, "height_plateaus": {}},
+        {"project_id": 5, "building_limits": building_limits, "height_plateaus": height_plateaus_complete},
+    ]
+    body = "\n".join(json.dumps(record) for record in records) + "\nnot json\n"
+    response = client.post("/import-projects", content=body)
+    assert response.status_code == 200
+
+    report = response.json()
+    assert (report["created"], report["failed"]) == (1, 3)
+    assert [(r["line"], r["project_id"], r["status"]) for r in report["results"]] == [
+        (1, 5, "created"), (2, 6, "failed"), (3, 5, "failed"), (4, None, "failed")
+    ]
+    assert "Invalid GeoJSON" in report["results"][1]["detail"]
+
+    splits = client.get("/split-building-limits/5").json()["building_limits_splits"]["features"]
+    assert len(splits) == 1
+    assert client.get("/building-limits/6").json() == {"message": "No data found"}
+
+
+def test_import_projects_rejects_boolean_ids():
+    client.delete("/delete-project", params={"project_id": 1})
+    record = {"project_id": True, "building_limits": building_limits, "height_plateaus": height_plateaus_complete}
+    report = client.post("/import-projects", content=json.dumps(record) + "\n").json()
+    assert (report["created"], report["failed"]) == (0, 1)
+    assert report["results"] == [{"line": 1, "project_id": None, "status": "failed",
+                                  "detail": "The project_id must be an integer."}]
+    assert client.get("/building-limits/1").json() == {"message": "No data found"}
+
+def test_get_split_building_limits_wkb():
+    # Initial project deletion, if already exists
+    client.delete("/delete-project",
+                  params={"project_id": 2})
+
+    client.post("/create-project",
+                params={"project_id": 2},
+                json={
+        "building_limits": two_site_building_limits,
+        "height_plateaus": two_site_height_plateaus
+    })
+
+    geojson = client.get("/split-building-limits/2")
+    response = client.get("/split-building-limits/2", headers={"Accept": WKB_MEDIA_TYPE})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == WKB_MEDIA_TYPE
+    assert response.headers["etag"] != geojson.headers["etag"]
+
+    values, geometries = decode_wkb_records(response.content)
+    features = geojson.json()["building_limits_splits"]["features"]
+    assert values["id"].tolist() == [feature["id"] for feature in features]
+    assert values["elevation"].tolist() == [feature["properties"]["elevation"] for feature in features]
+    assert values["height_plateau_id"].tolist() == [feature["properties"]["height_plateau_id"]
+                                                    for feature in features]
+    assert all(shapely.from_wkb(wkb).equals(shape(feature["geometry"]))
+               for wkb, feature in zip(geometries, features))
+
+    response = client.get("/split-building-limits/2", headers={"Accept": "text/csv"})
+    assert response.status_code == 406
+
+
+def test_get_split_building_limits_compressed(monkeypatch):
+    # Initial project deletion, if already exists
+    client.delete("/delete-project",
+                  params={"project_id": 2})
+
+    client.post("/create-project",
+                params={"project_id": 2},
+                json={
+        "building_limits": two_site_building_limits,
+        "height_plateaus": two_site_height_plateaus
+    })
+    monkeypatch.setattr(endpoints, "COMPRESSION_MIN_SIZE", 0)
+
+    plain = client.get("/split-building-limits/2", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+
+    compressed = client.get("/split-building-limits/2", headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.headers["etag"] != plain.headers["etag"]
+    assert compressed.json() == plain.json()
+
+    # Repeat requests are served the cached compressed bytes, without building the body again
+    monkeypatch.setattr(endpoints, "feature_collection_body", None)
+    monkeypatch.setattr(endpoints, "compress", None)
+    repeated = client.get("/split-building-limits/2", headers={"Accept-Encoding": "gzip"})
+    assert repeated.headers["etag"] == compressed.headers["etag"]
+    assert repeated.json() == plain.json()
+
+    response = client.get("/split-building-limits/2",
+                          headers={"Accept-Encoding": "gzip", "If-None-Match": compressed.headers["etag"]})
+    assert response.status_code == 304
+
+    streamed = client.get("/split-building-limits/2", params={"stream": True}, headers={"Accept-Encoding": "gzip"})
+    assert streamed.headers["content-encoding"] == "gzip"
+    assert streamed.json() == plain.json()
+
+
+def test_get_split_building_limits_streamed_etag(monkeypatch):
+    client.delete("/delete-project", params={"project_id": 2})
+    client.post("/create-project", params={"project_id": 2},
+                json={"building_limits": two_site_building_limits, "height_plateaus": two_site_height_plateaus})
+    monkeypatch.setattr(endpoints, "COMPRESSION_MIN_SIZE", 0)
+    monkeypatch.setattr(endpoints, "response_cache", ResponseCache())
+
+    # Compressed chunk by chunk, the streamed bytes may differ from the buffered ones, so their ETag does
+    streamed = client.get("/split-building-limits/2", params={"stream": True}, headers={"Accept-Encoding": "gzip"})
+    buffered = client.get("/split-building-limits/2", params={"stream": False}, headers={"Accept-Encoding": "gzip"})
+    assert streamed.headers["content-encoding"] == buffered.headers["content-encoding"] == "gzip"
+    assert streamed.headers["etag"] != buffered.headers["etag"]
+    assert streamed.json() == buffered.json()
+
+    for etag in (streamed.headers["etag"], buffered.headers["etag"]):
+        response = client.get("/split-building-limits/2", params={"stream": True},
+                              headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+        assert response.status_code == 304
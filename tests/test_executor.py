@@ -0,0 +1,70 @@
+import json
+from threading import Event, Thread
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.api.endpoints as endpoints
+from app.core.executor import SplitExecutor, SplitQueueFull
+from app.core.split_cache import SplitCache
+from app.main import app
+from app.tools import CoverageError, split_limits, split_record
+from .test_data import building_limits, height_plateaus_complete, height_plateaus_incomplete
+
+client = TestClient(app)
+
+
+def test_split_executor_process_pool():
+    executor = SplitExecutor(workers=1, max_pending=0)
+    try:
+        split_gdf, _, _ = executor.run(split_limits, building_limits, height_plateaus_complete)
+        assert len(split_gdf) == 1
+
+        # Errors raised in the worker keep their payload
+        with pytest.raises(CoverageError) as error:
+            executor.run(split_limits, building_limits, height_plateaus_incomplete)
+        assert len(error.value.gaps["features"]) == 1
+
+        # Batches are spread over the workers, with per-record errors
+        records = executor.map(split_record, [
+            json.dumps({"project_id": 1, "building_limits": building_limits,
+                        "height_plateaus": height_plateaus_complete}),
+            json.dumps({"project_id": 2, "building_limits": building_limits}),
+        ])
+        assert records[0][0] == 1 and len(records[0][1][1]) == 1 and records[0][2] is None
+        assert records[1] == (2, None, "Missing key in record: 'height_plateaus'")
+    finally:
+        executor.shutdown()
+
+
+def test_split_executor_admission(monkeypatch):
+    executor = SplitExecutor(workers=0, max_pending=0)
+    started, release = Event(), Event()
+
+    def block():
+        started.set()
+        release.wait()
+
+    worker = Thread(target=executor.run, args=(block,))
+    worker.start()
+    started.wait()
+    try:
+        with pytest.raises(SplitQueueFull):
+            executor.run(split_limits, building_limits, height_plateaus_complete)
+
+        # Busy executors turn create requests away with 503
+        monkeypatch.setattr(endpoints, "split_executor", executor)
+        monkeypatch.setattr(endpoints, "split_cache", SplitCache())
+        client.delete("/delete-project",
+                      params={"project_id": 2})
+        response = client.post("/create-project",
+                               params={"project_id": 2},
+                               json={
+            "building_limits": building_limits,
+            "height_plateaus": height_plateaus_complete
+        })
+        assert response.status_code == 503
+        assert "Retry-After" in response.headers
+    finally:
+        release.set()
+        worker.join()
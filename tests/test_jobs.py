@@ -0,0 +1,130 @@
+import json
+import time
+
+from fastapi.testclient import TestClient
+
+import app.api.endpoints as endpoints
+from app.core.config import SessionLocal
+from app.core.jobs import JobRunner
+from app.main import app
+from app.models import Job
+from .test_data import building_limits, height_plateaus_complete
+
+client = TestClient(app)
+
+
+def wait_for_job(job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] in ("succeeded", "failed") or time.monotonic() > deadline:
+            return job
+        time.sleep(0.05)
+
+
+def test_create_and_update_as_jobs():
+    client.delete("/delete-project", params={"project_id": 11})
+
+    response = client.post("/create-project", params={"project_id": 11, "job": True},
+                           json={"building_limits": building_limits, "height_plateaus": height_plateaus_complete})
+    assert response.status_code == 202
+    assert response.headers["Location"] == f"/jobs/{response.json()['job_id']}"
+
+    job = wait_for_job(response.json()["job_id"])
+    assert job["status"] == "succeeded" and job["status_code"] == 200
+    assert job["result"] == {"message": "Successfully split and stored the results"}
+    assert {"split_cache", "db_commit"} <= set(job["phases"])
+    assert job["duration"] >= sum(job["phases"].values()) - 1e-6
+    assert len(client.get("/split-building-limits/11").json()["building_limits_splits"]["features"]) == 1
+
+    # Failures keep the status and response of the synchronous operation
+    response = client.put("/update-project", params={"project_id": 12, "job": True},
+                          json={"height_plateaus": height_plateaus_complete})
+    job = wait_for_job(response.json()["job_id"])
+    assert job["status"] == "failed" and job["status_code"] == 404
+    assert job["result"] == {"detail": "Project with this ID does not exist."}
+
+    assert client.get("/jobs/0").status_code == 404
+
+
+def test_large_submissions_run_as_jobs(monkeypatch):
+    runner = JobRunner(workers=0)
+    runner.handler("create")(endpoints.run_create_job)
+    monkeypatch.setattr(endpoints, "JOB_THRESHOLD", 1)
+    monkeypatch.setattr(endpoints, "job_runner", runner)
+    client.delete("/delete-project", params={"project_id": 11})
+
+    response = client.post("/create-project", params={"project_id": 11},
+                           json={"building_limits": building_limits, "height_plateaus": height_plateaus_complete})
+    assert response.status_code == 202
+    assert client.get(f"/jobs/{response.json()['job_id']}").json()["status"] == "succeeded"
+
+    # The threshold can be overridden per request
+    client.delete("/delete-project", params={"project_id": 11})
+    response = client.post("/create-project", params={"project_id": 11, "job": False},
+                           json={"building_limits": building_limits, "height_plateaus": height_plateaus_complete})
+    assert response.status_code == 200
+
+
+def test_resume_runs_queued_jobs_once():
+    client.delete("/delete-project", params={"project_id": 11})
+    with SessionLocal() as db:
+        job = Job(kind="create", project_id=11, status="queued", created_at=time.time(),
+                  payload=json.dumps({"building_limits": building_limits, "height_plateaus": height_plateaus_complete}))
+        db.add(job)
+        db.commit()
+        job_id = job.id
+
+    runner = JobRunner(workers=0)
+    runner.handler("create")(endpoints.run_create_job)
+    assert runner.resume() >= 1
+    assert client.get(f"/jobs/{job_id}").json()["status"] == "succeeded"
+    assert runner.run(job_id) is False
+
+
+def test_interrupted_jobs_are_requeued_by_heartbeat():
+    client.delete("/delete-project", params={"project_id": 11})
+    now = time.time()
+    payload = json.dumps({"building_limits": building_limits, "height_plateaus": height_plateaus_complete})
+    with SessionLocal() as db:
+        # Started a moment ago by a process that crashed and was restarted right away
+        interrupted = Job(kind="create", project_id=11, status="running", created_at=now - 120,
+                          started_at=now - 1, heartbeat_at=now - 120, payload=payload)
+        alive = Job(kind="create", project_id=11, status="running", created_at=now, started_at=now,
+                    heartbeat_at=now, payload=payload)
+        db.add_all([interrupted, alive])
+        db.commit()
+        interrupted_id, alive_id = interrupted.id, alive.id
+
+    runner = JobRunner(workers=0, stale_after=30)
+    runner.handler("create")(endpoints.run_create_job)
+    try:
+        runner.resume()
+        assert client.get(f"/jobs/{interrupted_id}").json()["status"] == "succeeded"
+        assert client.get(f"/jobs/{alive_id}").json()["status"] == "running"
+    finally:
+        runner.shutdown()
+        with SessionLocal() as db:
+            db.delete(db.get(Job, alive_id))
+            db.commit()
+
+
+def test_running_jobs_keep_their_heartbeat():
+    runner = JobRunner(workers=1, heartbeat_interval=0.05, stale_after=0.3)
+
+    @runner.handler("wait")
+    def wait(db, project_id, payload):
+        time.sleep(0.6)
+        return 200, {}
+
+    with SessionLocal() as db:
+        job_id = runner.enqueue(db, "wait", 0, {})
+    try:
+        # Past stale_after, the job would have been requeued had its heartbeat not been refreshed
+        time.sleep(0.45)
+        with SessionLocal() as db:
+            job = db.get(Job, job_id)
+            assert job.status == "running" and job.heartbeat_at > job.started_at + 0.2
+    finally:
+        runner.shutdown()
+    assert client.get(f"/jobs/{job_id}").json()["status"] == "succeeded"
@@ -0,0 +1,67 @@
+from fastapi.testclient import TestClient
+
+import app.api.endpoints as endpoints
+from app.core.executor import SplitExecutor
+from app.core.metrics import Histogram
+from app.core.split_cache import SplitCache
+from app.main import app
+from .test_data import two_site_building_limits, two_site_height_plateaus
+
+client = TestClient(app)
+
+
+def test_histogram_render():
+    histogram = Histogram("test_seconds", "Test durations.", ("endpoint",), (0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value, '/a"b')
+    assert histogram.render() == [
+        "# HELP test_seconds Test durations.",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{endpoint="/a\\"b",le="0.1"} 2',
+        'test_seconds_bucket{endpoint="/a\\"b",le="1.0"} 3',
+        'test_seconds_bucket{endpoint="/a\\"b",le="+Inf"} 4',
+        'test_seconds_sum{endpoint="/a\\"b"} 2.65',
+        'test_seconds_count{endpoint="/a\\"b"} 4',
+    ]
+
+
+def test_server_timing_and_metrics(monkeypatch):
+    monkeypatch.setattr(endpoints, "split_cache", SplitCache())
+    client.delete("/delete-project", params={"project_id": 11})
+
+    response = client.post("/create-project", params={"project_id": 11},
+                           json={"building_limits": two_site_building_limits,
+                                 "height_plateaus": two_site_height_plateaus})
+    assert response.status_code == 200
+    timings = dict(entry.split(";dur=") for entry in response.headers["server-timing"].split(", "))
+    assert {"parse_geojson", "overlap_check", "coverage_check", "overlay", "split_compute", "db_insert",
+            "db_commit", "total"} <= set(timings)
+    assert float(timings["total"]) >= float(timings["overlay"])
+
+    response = client.get("/split-building-limits/11", headers={"Accept-Encoding": "identity"})
+    assert "serialize" in response.headers["server-timing"]
+
+    metrics = client.get("/metrics").text
+    assert 'buildingapi_request_duration_seconds_count{method="POST",endpoint="/create-project",status="200"}' \
+        in metrics
+    assert 'buildingapi_phase_duration_seconds_bucket{phase="overlay",le="+Inf"}' in metrics
+    assert 'buildingapi_request_features_bucket{endpoint="/create-project",le="10.0"}' in metrics
+    assert 'buildingapi_request_splits_sum{endpoint="/create-project"}' in metrics
+
+
+def test_server_timing_of_split_workers(monkeypatch):
+    executor = SplitExecutor(workers=1)
+    monkeypatch.setattr(endpoints, "split_executor", executor)
+    monkeypatch.setattr(endpoints, "split_cache", SplitCache())
+    client.delete("/delete-project", params={"project_id": 11})
+    try:
+        response = client.post("/create-project", params={"project_id": 11},
+                               json={"building_limits": two_site_building_limits,
+                                     "height_plateaus": two_site_height_plateaus})
+    finally:
+        executor.shutdown()
+    assert response.status_code == 200
+
+    # Phases timed in the worker process are reported as phases of the request
+    timings = dict(entry.split(";dur=") for entry in response.headers["server-timing"].split(", "))
+    assert {"overlap_check", "coverage_check", "overlay", "split_compute", "db_insert"} <= set(timings)
@@ -0,0 +1,57 @@
+import json
+
+import shapely
+from shapely.geometry import shape
+from sqlalchemy import create_engine, text
+
+from app.core.migrations import add_job_heartbeats, add_project_generations, backfill_projects, \
+    migrate_geometry_to_wkb
+from .test_data import building_limits
+
+
+def test_migrate_geometry_to_wkb():
+    engine = create_engine("sqlite://")
+    geometry = building_limits["features"][0]["geometry"]
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE building_limits (id INTEGER PRIMARY KEY, version INTEGER NOT NULL, "
+                          "project_id INTEGER NOT NULL, geometry JSON NOT NULL, name VARCHAR)"))
+        conn.execute(text("INSERT INTO building_limits (id, version, project_id, geometry) VALUES (7, 1, 2, :geometry)"),
+                     {"geometry": json.dumps(geometry)})
+
+    assert migrate_geometry_to_wkb(engine) == ["building_limits"]
+    assert migrate_geometry_to_wkb(engine) == []
+
+    with engine.connect() as conn:
+        row = conn.execute(text("SELECT id, geometry, minx, miny, maxx, maxy FROM building_limits")).one()
+    assert row.id == 7
+    assert shapely.from_wkb(row.geometry).equals(shape(geometry))
+    assert (row.minx, row.miny, row.maxx, row.maxy) == (10.0, 10.0, 20.0, 20.0)
+
+    assert backfill_projects(engine) == 1
+    assert backfill_projects(engine) == 0
+    with engine.connect() as conn:
+        project = conn.execute(text("SELECT * FROM projects")).one()
+    assert (project.id, project.version, project.building_limit_count, project.height_plateau_count) == (2, 1, 1, 0)
+
+
+def test_add_job_heartbeats():
+    engine = create_engine("sqlite://")
+    assert add_job_heartbeats(engine) is False
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE jobs (id INTEGER PRIMARY KEY, status VARCHAR, started_at FLOAT)"))
+    assert add_job_heartbeats(engine) is True
+    assert add_job_heartbeats(engine) is False
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT heartbeat_at FROM jobs")).all() == []
+
+
+def test_add_project_generations():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE projects (id INTEGER PRIMARY KEY, version INTEGER)"))
+        conn.execute(text("INSERT INTO projects VALUES (1, 1), (2, 3)"))
+    assert add_project_generations(engine) == 2
+    assert add_project_generations(engine) == 0
+    with engine.connect() as conn:
+        generations = conn.execute(text("SELECT generation FROM projects")).scalars().all()
+    assert len(set(generations)) == 2 and all(len(generation) == 32 for generation in generations)
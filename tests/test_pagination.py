@@ -0,0 +1,125 @@
+import base64
+import json
+
+import shapely
+from fastapi.testclient import TestClient
+from sqlalchemy import event, select
+
+from app.api.formats import WKB_MEDIA_TYPE, decode_wkb_records
+from app.api.pagination import FeatureWindow, decode_cursor, encode_cursor, load_window, refine_bbox
+from app.core.config import SessionLocal, engine
+from app.main import app
+from app.models import BuildingLimit
+
+client = TestClient(app)
+
+
+def grid_geojson(size):
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "geometry": shapely.geometry.mapping(shapely.box(i, j, i + 1, j + 1)),
+                "properties": {"elevation": 1.0}
+            }
+            for i in range(size)
+            for j in range(size)
+        ]
+    }
+
+
+def create_grid_project(project_id, size):
+    client.delete("/delete-project", params={"project_id": project_id})
+    response = client.post("/create-project", params={"project_id": project_id},
+                           json={"building_limits": grid_geojson(size), "height_plateaus": grid_geojson(size)})
+    assert response.status_code == 200
+
+
+def test_bbox_filter():
+    create_grid_project(13, 5)
+
+    response = client.get("/building-limits/13", params={"bbox": "0.5,0.5,1.5,1.5"})
+    assert response.status_code == 200
+    features = response.json()["building_limits"]["features"]
+    assert sorted(shapely.geometry.shape(feature["geometry"]).bounds[:2] for feature in features) == \
+        [(0.0, 0.0), (0.0, 1.0), (1.0, 0.0), (1.0, 1.0)]
+    assert "next_cursor" not in response.json()
+
+    # Responses of a window have their own ETag
+    assert response.headers["ETag"] != client.get("/building-limits/13").headers["ETag"]
+    assert client.get("/building-limits/13", params={"bbox": "0.5,0.5,1.5,1.5"},
+                      headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+
+    assert client.get("/building-limits/13", params={"bbox": "10,10,11,11"}).json() == {"message": "No data found"}
+    assert client.get("/building-limits/13", params={"bbox": "1,2,3"}).status_code == 422
+    assert client.get("/building-limits/13", params={"bbox": "2,0,1,1"}).status_code == 422
+
+
+def test_keyset_pagination():
+    create_grid_project(13, 5)
+    all_ids = [feature["id"] for feature in
+               client.get("/split-building-limits/13").json()["building_limits_splits"]["features"]]
+
+    ids, params, pages = [], {"limit": 10}, 0
+    while True:
+        response = client.get("/split-building-limits/13", params=params)
+        body = response.json()
+        ids += [feature["id"] for feature in body["building_limits_splits"]["features"]]
+        pages += 1
+        if body.get("next_cursor") is None:
+            assert "Link" not in response.headers
+            break
+        assert f"cursor={body['next_cursor']}" in response.headers["Link"]
+        params = {"limit": 10, "cursor": body["next_cursor"]}
+    assert ids == all_ids and pages == 3
+
+    # Binary formats link to their next page in the Link header only
+    response = client.get("/split-building-limits/13", params={"limit": 20, "bbox": "0,0,2.5,2.5"},
+                          headers={"Accept": WKB_MEDIA_TYPE})
+    assert len(decode_wkb_records(response.content)[0]) == 9
+    assert "Link" not in response.headers
+
+    assert client.get("/split-building-limits/13", params={"limit": 0}).status_code == 422
+    assert client.get("/split-building-limits/13", params={"cursor": "not-a-cursor"}).status_code == 422
+    assert client.get("/split-building-limits/13", params={"limit": 10 ** 20}).status_code == 422
+    for after in (True, 10 ** 30):
+        cursor = base64.urlsafe_b64encode(json.dumps({"after": after}).encode()).decode()
+        assert client.get("/split-building-limits/13", params={"cursor": cursor}).status_code == 422
+
+
+def test_refine_bbox():
+    class Row:
+        def __init__(self, row_id, geometry):
+            self.id = row_id
+            self.geometry = shapely.to_wkb(geometry)
+
+    # The triangle's bounding box overlaps the box, but the triangle does not
+    triangle = Row(1, shapely.Polygon([(0, 0), (2, 0), (0, 2)]))
+    square = Row(2, shapely.box(1, 1, 3, 3))
+    assert refine_bbox([triangle, square], (1.5, 1.5, 2, 2)) == [square]
+
+    assert decode_cursor(encode_cursor(123)) == 123
+
+
+def test_deep_pages_read_one_batch():
+    create_grid_project(13, 5)
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with SessionLocal() as db:
+        ids = db.scalars(select(BuildingLimit.id).where(BuildingLimit.project_id == 13)
+                         .order_by(BuildingLimit.id)).all()
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            page, next_cursor = load_window(db.scalars, select(BuildingLimit), BuildingLimit, 13,
+                                            FeatureWindow(after=ids[19], limit=3))
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+    # Read by keyset on ID past the cursor, one batch of the page size and one more row to detect the next page
+    assert [row.id for row in page] == ids[20:23]
+    assert decode_cursor(next_cursor) == ids[22]
+    assert len(statements) == 1 and "building_limits.id >" in statements[0] and "LIMIT" in statements[0]
@@ -3,13 +3,21 @@ from tests.test_data import building_limits, height_plateaus_complete
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from fastapi.testclient import TestClient
+from shapely.geometry import shape
+from sqlalchemy import select
+from app.api.endpoints import split_feature
+from app.api.formats import RECORD_COLUMNS, decode_wkb_records, encode_wkb_records
+from app.api.responses import feature_collection_body
+from app.core.config import SessionLocal
 from app.main import app
+from app.models import BuildingLimit, HeightPlateau, SplitBuildingLimit
+from app.tools import split_limits, store_processed_splits
 
 client = TestClient(app)
 
 
-def test_large_input_performance():
-    large_geojson = {
+def make_grid_geojson():
+    return {
         "type": "FeatureCollection",
         "features": [
             {
@@ -33,6 +41,20 @@ def test_large_input_performance():
         ]
     }
 
+
+class RecordingSession:
+    """Minimal stand-in for a database session that keeps the inserted rows in memory."""
+
+    def __init__(self):
+        self.inserted = []
+
+    def execute(self, statement, rows):
+        self.inserted.extend(rows)
+
+
+def test_large_input_performance():
+    large_geojson = make_grid_geojson()
+
     start_time = time.time()
 
     # Initial project deletion, if already exists
@@ -52,6 +74,36 @@ def test_large_input_performance():
     assert duration < 5
 
 
+def test_split_lineage_matching_performance():
+    grid_geojson = make_grid_geojson()
+    split_gdf, _, _ = split_limits(grid_geojson, grid_geojson)
+
+    stored_limits = [BuildingLimit(id=i + 1, geometry=feature['geometry'])
+                     for i, feature in enumerate(grid_geojson['features'])]
+    stored_plateaus = [HeightPlateau(id=i + 1, geometry=feature['geometry'], elevation=float(i))
+                       for i, feature in enumerate(grid_geojson['features'])]
+    limit_ids = [limit.id for limit in stored_limits]
+    plateau_ids = [plateau.id for plateau in stored_plateaus]
+    plateau_elevations = [plateau.elevation for plateau in stored_plateaus]
+
+    # Previous approach: match every split back to its parents with geometric predicates
+    geometric_matches = []
+    limit_shapes = [(shape(limit.geometry), limit.id) for limit in stored_limits]
+    plateau_shapes = [(shape(plateau.geometry), plateau.id) for plateau in stored_plateaus]
+    for split_geom in split_gdf.geometry:
+        limit_id = next(i for g, i in limit_shapes if g.contains(split_geom) or g.buffer(1e-9).contains(split_geom))
+        plateau_id = next(i for g, i in plateau_shapes if g.contains(split_geom) or g.buffer(1e-9).contains(split_geom))
+        geometric_matches.append((limit_id, plateau_id))
+
+    # The overlay lineage gives the same parents, its cost is tracked by the store_processed_splits benchmark
+    session = RecordingSession()
+    store_processed_splits(session, split_gdf, 2, limit_ids, plateau_ids, plateau_elevations)
+
+    assert len(session.inserted) == len(split_gdf) == 100
+    assert [(s['building_limit_id'], s['height_plateau_id']) for s in session.inserted] == geometric_matches
+    assert all(s['elevation'] == s['height_plateau_id'] - 1 for s in session.inserted)
+
+
 def test_concurrent_updates():
     def send_update_request(project_id, building_limits):
         response = client.put("/update-project",
@@ -90,5 +142,80 @@ def test_concurrent_updates():
             result = future.result()
             results.append(result)
 
-    assert any(r.status_code == 200 for r in results)  # At least one should succeed
-    assert any(r.status_code == 400 for r in results)  # At least one should detect a conflict
+    # Exactly one should succeed, and the others should detect the conflict
+    assert sorted(r.status_code for r in results) == [200, 409, 409, 409, 409]
+
+
+def make_unit_grid_geojson(size):
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "geometry": {
+                    "type": "Polygon",
+                    "coordinates": [[[i, j], [i + 1, j], [i + 1, j + 1], [i, j + 1], [i, j]]]
+                },
+                "properties": {'elevation': 1.0}
+            }
+            for i in range(size)
+            for j in range(size)
+        ]
+    }
+
+
+def test_project_writes_of_small_and_large_projects():
+    # Their latency is compared with a baseline by the endpoint benchmarks, across workload scales
+    for project_id, size in ((3, 10), (4, 50)):
+        client.delete("/delete-project", params={"project_id": project_id})
+        grid_geojson = make_unit_grid_geojson(size)
+        response = client.post("/create-project",
+                               params={"project_id": project_id},
+                               json={"building_limits": grid_geojson, "height_plateaus": grid_geojson})
+        assert response.status_code == 200
+
+        # Creating an existing project is rejected without loading its features
+        response = client.post("/create-project",
+                               params={"project_id": project_id},
+                               json={"building_limits": building_limits, "height_plateaus": height_plateaus_complete})
+        assert response.status_code == 409
+
+        # Editing one plateau only touches its neighbourhood
+        height_plateaus = client.get(f"/height-plateaus/{project_id}").json()["height_plateaus"]
+        height_plateaus["features"] = height_plateaus["features"][:1]
+        height_plateaus["features"][0]["properties"]["elevation"] = 2.0
+        response = client.put("/update-project",
+                              params={"project_id": project_id},
+                              json={"height_plateaus": height_plateaus})
+        assert response.status_code == 200
+        # The splits of the edited corner plateau and of the three it touches, whatever the project size
+        assert response.json()["splits"]["replaced"] == 4
+
+        response = client.delete("/delete-project", params={"project_id": project_id})
+        assert response.status_code == 200
+
+
+def test_binary_response_size():
+    client.delete("/delete-project", params={"project_id": 9})
+    grid_geojson = make_unit_grid_geojson(50)
+    response = client.post("/create-project",
+                           params={"project_id": 9},
+                           json={"building_limits": grid_geojson, "height_plateaus": grid_geojson})
+    assert response.status_code == 200
+
+    # Encode times are compared with a baseline by the GET /split-building-limits benchmarks of each format
+    db = SessionLocal()
+    try:
+        rows = db.query(SplitBuildingLimit).filter_by(project_id=9).order_by(SplitBuildingLimit.id).all()
+        columns = RECORD_COLUMNS["split_building_limits"]
+        records = db.execute(select(SplitBuildingLimit.geometry,
+                                    *[getattr(SplitBuildingLimit, column) for column in columns])
+                             .where(SplitBuildingLimit.project_id == 9)
+                             .order_by(SplitBuildingLimit.id)).all()
+    finally:
+        db.close()
+
+    geojson = feature_collection_body("building_limits_splits", rows, split_feature)
+    wkb = encode_wkb_records(records, SplitBuildingLimit, columns)
+    assert len(decode_wkb_records(wkb)[1]) == len(rows) == 2500
+    assert len(wkb) < len(geojson)
@@ -0,0 +1,28 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+import shapely
+from shapely.geometry import mapping
+
+import app.api.responses as responses
+from app.api.endpoints import height_plateau_feature
+from app.api.responses import feature_collection_body
+
+
+@pytest.mark.parametrize("encoder", ["orjson", "json"])
+def test_feature_collection_body(monkeypatch, encoder):
+    if encoder == "json":
+        monkeypatch.setattr(responses, "orjson", None)
+
+    polygons = [shapely.box(0, 0, 0.1 + 0.2, 1 / 3), shapely.box(1e-12, 0, 123456.78901234567, 5)]
+    rows = [SimpleNamespace(id=i + 1, version=1, name="plat-0", elevation=3.5, geometry=shapely.to_wkb(polygon))
+            for i, polygon in enumerate(polygons)]
+
+    body = json.loads(feature_collection_body("height_plateaus", rows, height_plateau_feature))
+    expected = [{"type": "Feature", "geometry": json.loads(json.dumps(mapping(polygon))),
+                 **height_plateau_feature(row)} for row, polygon in zip(rows, polygons)]
+    assert body == {"height_plateaus": {"type": "FeatureCollection", "features": expected}}
+
+    assert json.loads(feature_collection_body("height_plateaus", [], height_plateau_feature)) == {
+        "message": "No data found"}
@@ -0,0 +1,60 @@
+from fastapi.testclient import TestClient
+from shapely.geometry import shape
+
+import app.api.endpoints as endpoints
+from app.core.split_cache import SplitCache
+from app.main import app
+from app.tools import split_cache_key, split_limits, validate_geojson
+from .test_data import building_limits, height_plateaus_complete, two_site_building_limits, \
+    two_site_height_plateaus
+
+client = TestClient(app)
+
+
+def reversed_features(geojson):
+    return {**geojson, "features": geojson["features"][::-1]}
+
+
+def test_split_cache_key_ignores_feature_order(tmp_path):
+    split_gdf, limits_gdf, plateaus_gdf = split_limits(building_limits, height_plateaus_complete)
+    key, limit_order, plateau_order = split_cache_key(limits_gdf, plateaus_gdf, 1e-9)
+
+    reversed_plateaus_gdf = validate_geojson(reversed_features(height_plateaus_complete))
+    reversed_key, _, reversed_plateau_order = split_cache_key(limits_gdf, reversed_plateaus_gdf, 1e-9)
+    assert reversed_key == key
+
+    # The lineage of a hit refers to the plateau order of the caller, also when read back from disk
+    SplitCache(path=str(tmp_path / "splits.db")).put(key, limit_order, plateau_order, split_gdf)
+    cache = SplitCache(path=str(tmp_path / "splits.db"))
+    cached = cache.get(reversed_key, limit_order, reversed_plateau_order)
+    assert cache.stats() == {"hits": 1, "misses": 0, "entries": 1}
+
+    elevations = reversed_plateaus_gdf['elevation'].to_numpy()
+    for geometry, plateau_index in zip(cached.geometry, cached.height_plateau_index):
+        expected = split_gdf[split_gdf.geometry.geom_equals(geometry)].iloc[0]
+        assert elevations[plateau_index] == expected['elevation']
+
+
+def test_create_reuses_cached_splits(monkeypatch):
+    monkeypatch.setattr(endpoints, "split_cache", SplitCache())
+    for project_id in (7, 8):
+        client.delete("/delete-project", params={"project_id": project_id})
+
+    response = client.post("/create-project", params={"project_id": 7},
+                           json={"building_limits": two_site_building_limits,
+                                 "height_plateaus": two_site_height_plateaus})
+    assert response.status_code == 200
+    response = client.post("/create-project", params={"project_id": 8},
+                           json={"building_limits": two_site_building_limits,
+                                 "height_plateaus": reversed_features(two_site_height_plateaus)})
+    assert response.status_code == 200
+    assert client.get("/split-cache/stats").json() == {"hits": 1, "misses": 1, "entries": 1}
+
+    # Splits served from the cache are linked to the plateaus of their own project
+    for project_id in (7, 8):
+        splits = client.get(f"/split-building-limits/{project_id}").json()["building_limits_splits"]["features"]
+        plateaus = client.get(f"/height-plateaus/{project_id}").json()["height_plateaus"]["features"]
+        plateau_shapes = {plateau["id"]: shape(plateau["geometry"]) for plateau in plateaus}
+        assert len(splits) == 2
+        assert all(plateau_shapes[split["properties"]["height_plateau_id"]].covers(shape(split["geometry"]))
+                   for split in splits)
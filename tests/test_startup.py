@@ -0,0 +1,45 @@
+import re
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+
+import app.core.startup as startup
+from app.main import app, create_app
+
+# Generous bound on the cumulative import time of the application, well above the ~1s it takes on a laptop
+IMPORT_TIME_BUDGET = 3.0  # Seconds
+HEAVY_MODULES = ("geopandas", "pandas", "pyproj", "pyogrio")
+
+
+def import_profile(module):
+    """Imports a module in a fresh interpreter, returning its cumulative import time and the loaded modules."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c",
+                             f"import sys, {module}; print(' '.join(sys.modules))"],
+                            capture_output=True, text=True, check=True)
+    timings = re.findall(r"import time:\s+\d+ \|\s+(\d+) \| (\S+)", result.stderr)
+    cumulative = next(int(microseconds) for microseconds, name in timings if name == module)
+    return cumulative / 1e6, set(result.stdout.split())
+
+
+def test_import_skips_heavy_modules():
+    for module in ("app.tools", "app.main"):
+        seconds, modules = import_profile(module)
+        assert not modules.intersection(HEAVY_MODULES), module
+        assert seconds < IMPORT_TIME_BUDGET, f"Importing {module} took {seconds:.2f}s"
+
+
+def test_create_app_builds_independent_apps():
+    other = create_app()
+    assert other is not app
+    assert other.openapi()["paths"].keys() == app.openapi()["paths"].keys()
+
+
+def test_warmup_on_startup(monkeypatch):
+    assert startup.warmup() == 2
+
+    calls = []
+    monkeypatch.setattr(startup, "WARMUP", True)
+    monkeypatch.setattr(startup, "warmup", lambda: calls.append("warmup"))
+    with TestClient(create_app()):
+        assert calls == ["warmup"]
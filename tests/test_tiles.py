@@ -0,0 +1,140 @@
+import math
+
+import numpy as np
+import shapely
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+
+import app.api.endpoints as endpoints
+from app.api.mvt import MVT_MEDIA_TYPE, decode_tile, encode_layer, tile_bounds, to_tile_geometries
+from app.core.config import SessionLocal
+from app.core.tile_cache import TileCache
+from app.main import app
+from app.models import Project
+
+client = TestClient(app)
+
+Z = 14
+
+
+def tile_of(lon, lat, z):
+    n = 2 ** z
+    return int((lon + 180) / 360 * n), int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+
+
+def grid_geojson(size, elevation):
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "geometry": shapely.geometry.mapping(
+                    shapely.box(10.701 + i * 0.001, 59.901 + j * 0.001, 10.702 + i * 0.001, 59.902 + j * 0.001)),
+                "properties": {"elevation": elevation}
+            }
+            for i in range(size)
+            for j in range(size)
+        ]
+    }
+
+
+def create_grid_project(project_id, elevation):
+    client.delete("/delete-project", params={"project_id": project_id})
+    response = client.post("/create-project", params={"project_id": project_id},
+                           json={"building_limits": grid_geojson(8, elevation),
+                                 "height_plateaus": grid_geojson(8, elevation)})
+    assert response.status_code == 200
+
+
+def signed_area(ring):
+    points = np.asarray(ring[:-1])
+    return np.sum(points[:, 0] * np.roll(points[:, 1], -1) - np.roll(points[:, 0], -1) * points[:, 1])
+
+
+def test_encode_clips_quantizes_and_orients():
+    # A lon/lat box projected into the single tile of zoom level 0
+    geometry = to_tile_geometries(np.array([shapely.box(0, 0, 90, 45)]), 0, 0, 0, 4096, 64)[0]
+    assert geometry.bounds == (2048.0, 1473.0, 3072.0, 2048.0)
+    assert np.array_equal(shapely.get_coordinates(geometry), np.round(shapely.get_coordinates(geometry)))
+
+    # Geometries are clipped to the buffer around the tile
+    clipped = to_tile_geometries(np.array([shapely.box(-180, -85, 180, 85)]), 2, 1, 1, 4096, 64)[0]
+    assert clipped.bounds == (-64.0, -64.0, 4160.0, 4160.0)
+
+    # Exterior rings get a positive and interior rings a negative area, whatever their input winding
+    polygon = shapely.Polygon([(0, 0), (0, 100), (100, 100), (100, 0)], [[(10, 10), (20, 10), (20, 20), (10, 20)]])
+    layer = encode_layer("layer", [polygon], [7], [{"elevation": 2.5, "name": "a", "missing": None}], 4096)
+    tile = decode_tile(b"\x1a" + bytes([len(layer)]) + layer)
+    feature = tile["layer"]["features"][0]
+    assert feature["id"] == 7 and feature["properties"] == {"elevation": 2.5, "name": "a"}
+    exterior, interior = feature["rings"]
+    assert signed_area(exterior) > 0 > signed_area(interior)
+    assert exterior[0] == exterior[-1] and sorted(exterior[:-1]) == [(0, 0), (0, 100), (100, 0), (100, 100)]
+
+    # Nothing is drawn for features that collapse on the grid
+    assert encode_layer("layer", [shapely.Polygon()], [1], [{}], 4096) is None
+
+
+def test_tile_endpoint(monkeypatch):
+    monkeypatch.setattr(endpoints, "tile_cache", TileCache(max_entries=8))
+    create_grid_project(15, 1.0)
+    x, y = tile_of(10.705, 59.905, Z)
+    minx, miny, maxx, maxy = tile_bounds(Z, x, y)
+    assert minx < 10.701 and maxx > 10.709 and miny < 59.901 and maxy > 59.909
+
+    response = client.get(f"/tiles/15/{Z}/{x}/{y}.mvt")
+    assert response.status_code == 200 and response.headers["content-type"] == MVT_MEDIA_TYPE
+    tile = decode_tile(response.content)
+    assert set(tile) == {"building_limits", "height_plateaus", "split_building_limits"}
+
+    splits = client.get("/split-building-limits/15").json()["building_limits_splits"]["features"]
+    assert {feature["id"]: feature["properties"] for feature in tile["split_building_limits"]["features"]} == {
+        feature["id"]: {"version": 1, "elevation": 1.0, "building_limit_id": feature["properties"]["building_limit_id"],
+                        "height_plateau_id": feature["properties"]["height_plateau_id"]}
+        for feature in splits}
+    geojson_size = sum(len(client.get(f"/{resource}/15").content)
+                       for resource in ("building-limits", "height-plateaus", "split-building-limits"))
+    assert len(response.content) < geojson_size / 4
+
+    # Tiles are served from the cache and revalidated by ETag until the project is written to
+    assert client.get(f"/tiles/15/{Z}/{x}/{y}.mvt").content == response.content
+    assert endpoints.tile_cache.stats() == {"hits": 1, "misses": 1, "entries": 1}
+    assert client.get(f"/tiles/15/{Z}/{x}/{y}.mvt",
+                      headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+
+    create_grid_project(15, 2.0)
+    tile = decode_tile(client.get(f"/tiles/15/{Z}/{x}/{y}.mvt").content)
+    assert {feature["properties"]["elevation"] for feature in tile["split_building_limits"]["features"]} == {2.0}
+
+    assert client.get(f"/tiles/15/{Z}/{x + 2}/{y}.mvt").status_code == 204
+    assert client.get(f"/tiles/15/{Z}/{2 ** Z}/{y}.mvt").status_code == 422
+    assert client.get(f"/tiles/0/{Z}/{x}/{y}.mvt").status_code == 404
+
+
+def test_tile_etag_follows_stored_version():
+    create_grid_project(15, 1.0)
+    x, y = tile_of(10.705, 59.905, Z)
+    etag = client.get(f"/tiles/15/{Z}/{x}/{y}.mvt").headers["ETag"]
+
+    # A write by another worker changes the stored version, without invalidating the caches of this process
+    with SessionLocal() as db:
+        db.execute(update(Project).where(Project.id == 15).values(version=Project.version + 1))
+        db.commit()
+    response = client.get(f"/tiles/15/{Z}/{x}/{y}.mvt", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["ETag"] != etag
+
+
+def test_tile_cache_on_disk(tmp_path):
+    path = str(tmp_path / "tiles.db")
+    cache = TileCache(path=path)
+    cache.put(1, 3, 14, 2, 5, b"tile")
+    cache.put(2, 1, 14, 2, 5, b"other")
+
+    # Tiles survive restarts, by project version
+    restarted = TileCache(path=path)
+    assert restarted.get(1, 3, 14, 2, 5) == b"tile"
+    assert restarted.get(1, 4, 14, 2, 5) is None
+
+    restarted.invalidate(1)
+    assert restarted.get(1, 3, 14, 2, 5) is None and TileCache(path=path).get(1, 3, 14, 2, 5) is None
+    assert TileCache(path=path).get(2, 1, 14, 2, 5) == b"other"
@@ -1,6 +1,9 @@
 import pytest
+import shapely
 from fastapi.testclient import TestClient
+from shapely.geometry import shape
 from app.main import app
+from app.tools import find_coverage_gaps, parse_geojson, validate_geojson
 from .test_data import building_limits, height_plateaus_incomplete, \
     overlapping_plateaus
 
@@ -21,6 +24,10 @@ def test_height_plateaus_cover_building_limits():
     assert response.status_code == 422
     assert ("Height plateaus do not completely cover the building limits"
             in response.json()["detail"])
+    gaps = response.json()["gaps"]["features"]
+    assert len(gaps) == 1
+    assert gaps[0]["properties"]["building_limit"] == 0
+    assert shape(gaps[0]["geometry"]).area == pytest.approx(75.0)
 
 
 def test_overlapping_height_plateaus():
@@ -36,6 +43,7 @@ def test_overlapping_height_plateaus():
                            })
     assert response.status_code == 422
     assert "Height plateaus overlap" in response.json()["detail"]
+    assert "Overlapping plateaus: 0 and 1" in response.json()["detail"]
 
 
 def test_valid_geojson():
@@ -51,3 +59,50 @@ def test_valid_geojson():
     })
     assert response.status_code == 422
     assert "Invalid GeoJSON" in response.json()["detail"]
+
+
+def square_feature(x, y, size=1):
+    return {"type": "Feature", "properties": {"elevation": 1.0},
+            "geometry": {"type": "Polygon",
+                         "coordinates": [[[x, y], [x + size, y], [x + size, y + size], [x, y + size], [x, y]]]}}
+
+
+@pytest.mark.parametrize("bad_feature, message", [
+    ({"type": "Feature", "geometry": {"type": "Point", "coordinates": [0, 0]}},
+     "must be of type 'Polygon', but feature 2 is 'Point'"),
+    ({"type": "Feature", "geometry": {"type": "Polygon", "coordinates": [[[0, 0], [1, 1], [1, 0], [0, 1], [0, 0]]]}},
+     "Feature 2 has an invalid geometry: Self-intersection"),
+    ({"type": "Feature", "geometry": {"type": "Polygon", "coordinates": [[[0, 0], [1, "a"], [1, 1], [0, 0]]]}},
+     "Malformed coordinates in feature 2"),
+])
+def test_parse_geojson_names_first_bad_feature(bad_feature, message):
+    features = [square_feature(0, 0), square_feature(1, 0), bad_feature, square_feature(2, 0)]
+    with pytest.raises(ValueError, match="Invalid GeoJSON") as error:
+        parse_geojson({"type": "FeatureCollection", "features": features})
+    assert message in str(error.value)
+
+
+def test_validate_geojson_keeps_ids_and_properties():
+    features = [square_feature(0, 0), {**square_feature(1, 0), "id": 7}]
+    gdf = validate_geojson({"type": "FeatureCollection", "features": features})
+    assert gdf.index.tolist() == [0, 7]
+    assert gdf["elevation"].tolist() == [1.0, 1.0]
+    assert gdf.geometry.values[1].equals(shape(features[1]["geometry"]))
+
+
+def test_coverage_gaps_of_partly_shared_edges(monkeypatch):
+    # The top edge of the first plateau is shared with two plateaus, so their coverage union fails or, with
+    # recent GEOS versions, leaves the edge in place in an invalid MultiPolygon
+    plateaus = validate_geojson({"type": "FeatureCollection", "features": [
+        {"type": "Feature", "properties": {"elevation": 1.0}, "geometry": shapely.geometry.mapping(box)}
+        for box in (shapely.box(0, 0, 2, 1), shapely.box(0, 1, 1, 2), shapely.box(1, 1, 2, 2))]})
+
+    limits = validate_geojson({"type": "FeatureCollection",
+                               "features": [square_feature(0.5, 0.5), square_feature(1.5, 1.5)]})
+    # The plateaus are merged again with a full union
+    union_all, unions = shapely.union_all, []
+    monkeypatch.setattr(shapely, "union_all", lambda geometries: unions.append(geometries) or union_all(geometries))
+    gaps = find_coverage_gaps(limits, plateaus, tolerance=0)
+    assert len(unions) == 1
+    assert len(gaps) == 1 and gaps[0][0] == 1
+    assert gaps[0][1].normalize().equals(shapely.box(1.5, 1.5, 2.5, 2.5).difference(shapely.box(0, 0, 2, 2)))